@@ -22,6 +22,8 @@ from element import element
 from utils.annotations import overrides
 
 class button(element):
+    html_tag = 'button'
+
     @overrides(element)
     def construct(self):
         self.add_classes("btn", "btn-default")
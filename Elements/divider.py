@@ -23,6 +23,8 @@ from element import element
 from utils.annotations import overrides
 
 class divider(element):
+    html_tag = 'li'
+
     @overrides(element)
     def construct(self):
         super(divider, self).construct()
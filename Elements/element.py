@@ -24,8 +24,13 @@ from ElementExceptions import *
 from Parser.BasicElements import ComplexElement
 
 class element(ComplexElement):
+    #HTML tag this element renders to, and whether that tag is a void (self-closing) one
+    html_tag = 'div'
+    html_void = False
 
     def __init__(self):
+        super(element, self).__init__()
+
         self.classes = set()
         self.properties = {}
 
@@ -24,6 +24,8 @@ from utils.annotations import overrides
 from navbar import navbar
 
 class form(element):
+    html_tag = 'form'
+
     @overrides(element)
     def construct(self):
         #add navbar-form class if form is setup inside a navbar
@@ -24,6 +24,9 @@ from utils.annotations import overrides
 
 
 class img(element):
+    html_tag = 'img'
+    html_void = True
+
     @overrides(element)
     def construct(self):
         self.add_classes("img-responsive")
@@ -23,6 +23,8 @@ from element import element
 from utils.annotations import overrides
 
 class link(element):
+    html_tag = 'a'
+
     @overrides(element)
     def construct(self):
         self.set_default_property('href')
@@ -24,6 +24,8 @@ from utils.annotations import overrides
 
 
 class menu(element):
+    html_tag = 'ul'
+
     @overrides(element)
     def construct(self):
         self.set_default_property('name')
\ No newline at end of file
@@ -23,6 +23,8 @@ from element import element
 from utils.annotations import overrides
 
 class menuitem(element):
+    html_tag = 'li'
+
     @overrides(element)
     def construct(self):
         self.set_default_property('href')
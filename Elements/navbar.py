@@ -23,4 +23,4 @@ from element import element
 
 
 class navbar(element):
-    pass
+    html_tag = 'nav'
@@ -24,6 +24,9 @@ from utils.annotations import overrides
 
 
 class textbox(element):
+    html_tag = 'input'
+    html_void = True
+
     @overrides(element)
     def construct(self):
         self.add_classes('form-control')
@@ -0,0 +1,413 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Batch compilation
+#
+# compiles many swalpa files, given as files, directories or globs, into an output
+# tree, across a pool of worker processes. every worker imports the Elements and
+# Parser packages (and so sets up the element factory and the container factory)
+# once, and keeps its Compiler warm for all the files it gets.
+#
+# content addressed builds name every output by a hash of its HTML (a.html becomes
+# a.<hash>.html), and list them in an AssetManifest. an output that hasn't changed
+# keeps its name, and its file isn't written again
+#
+
+from __future__ import print_function
+
+import os
+import io
+import sys
+import glob
+import hashlib
+import multiprocessing
+
+from Compiler import Compiler
+from Manifest import BuildManifest, AssetManifest, file_digest
+from Snapshot import SnapshotCache
+from Pipeline import Pipeline, CompileState, CompileStages
+from Parser.ElementProcessors import CollectElementTypes
+from Parser.Metrics import JsonLineWriter
+from utils.exceptions import GenericError
+
+
+SOURCE_EXTENSION = '.swalpa'
+OUTPUT_EXTENSION = '.html'
+
+#hex digits of the content hash in content addressed output names
+HASH_LENGTH = 16
+
+
+class BatchJob(object):
+    """
+    one source file to compile, and where its output goes
+    @param name: the source's name, relative to the output tree
+    @param content_addressed: output_file gets the hash of the output in its name
+    """
+    def __init__(self, source_file, output_file, name=None, content_addressed=False):
+        self.source_file = source_file
+        self.output_file = output_file
+        self.name = name if name is not None else os.path.basename(source_file)
+        self.content_addressed = content_addressed
+
+
+class BatchResult(object):
+    """
+    @param element_types: names of the element types the source was made of
+    @param includes: files the source included
+    @param skipped: True if the source was up to date, and wasn't compiled
+    @param output_file: where the output went, if not to the job's output file
+    """
+    def __init__(self, job, error=None, element_types=(), includes=(), skipped=False, output_file=None):
+        self.job = job
+        self.error = error
+        self.element_types = sorted(element_types)
+        self.includes = list(includes)
+        self.skipped = skipped
+        self.output_file = output_file or job.output_file
+
+    def succeeded(self):
+        return self.error is None
+
+    def __str__(self):
+        if self.succeeded():
+            return "%s -> %s" % (self.job.source_file, self.output_file)
+
+        return "%s: %s" % (self.job.source_file, self.error)
+
+
+def find_sources(inputs):
+    """
+    expands inputs into swalpa source files
+    @param inputs: files, directories (searched recursively for *.swalpa) or glob patterns
+    @return: sorted list of (source_file, name relative to the output tree)
+    """
+    sources = {}
+
+    for pattern in inputs:
+        for path in (glob.glob(pattern) or [pattern]):
+            if os.path.isdir(path):
+                for dirpath, dirnames, filenames in os.walk(path):
+                    dirnames.sort()
+                    for filename in filenames:
+                        if filename.endswith(SOURCE_EXTENSION):
+                            source = os.path.join(dirpath, filename)
+                            sources[source] = os.path.relpath(source, path)
+            else:
+                sources[path] = os.path.basename(path)
+
+    return sorted(sources.items())
+
+
+def make_jobs(inputs, output_dir, content_addressed=False):
+    return [BatchJob(source, os.path.join(output_dir, os.path.splitext(relative)[0] + OUTPUT_EXTENSION),
+                     relative, content_addressed)
+            for source, relative in find_sources(inputs)]
+
+
+def find_output_collisions(jobs):
+    """
+    finds jobs that would write the same output ('a/x.swalpa' and 'b/x.swalpa', given as
+    files, both go to 'x.html'); which one's output would be left is anybody's guess
+    @return: {source file: failed BatchResult} for every such job
+    """
+    by_output = {}
+    for job in jobs:
+        by_output.setdefault(os.path.normcase(os.path.abspath(job.output_file)), []).append(job)
+
+    collisions = {}
+    for colliding in by_output.values():
+        if len(colliding) < 2:
+            continue
+
+        for job in colliding:
+            others = ', '.join(other.source_file for other in colliding if other is not job)
+            collisions[job.source_file] = BatchResult(job, "output %s is that of %s too" % (job.output_file, others))
+
+    return collisions
+
+
+#the Compiler of a worker process, set up once by init_worker
+_worker_compiler = None
+
+
+def init_worker(lazy=False, snapshot_dir=None, budget=None, metrics_file=None, include_root=None,
+                allow_includes=True):
+    """
+    @param snapshot_dir: keep snapshots of the compiled trees in this directory
+                         (see SnapshotCache); no snapshots if None
+    @param budget: CompileBudget for every compile the worker does
+    @param metrics_file: append the metrics of every compile to this file, as JSON lines
+                         ('-' for stderr); no metrics if None
+    @param include_root, allow_includes: where the compiles may include files from (see Compiler)
+    """
+    global _worker_compiler
+    _worker_compiler = Compiler(lazy=lazy, snapshots=SnapshotCache(snapshot_dir) if snapshot_dir else None,
+                                budget=budget, metrics=JsonLineWriter(metrics_file) if metrics_file else None,
+                                include_root=include_root, allow_includes=allow_includes)
+
+
+def write_output(output_file, data):
+    output_dir = os.path.dirname(output_file)
+    if output_dir and not os.path.isdir(output_dir):
+        try:
+            os.makedirs(output_dir)
+        except OSError:
+            # another worker got there first
+            if not os.path.isdir(output_dir):
+                raise
+
+    with io.open(output_file, 'wb') as output:
+        output.write(data)
+
+
+def content_addressed_name(output_file, data):
+    """
+    @return: output_file, with the hash of data before its extension
+    """
+    root, extension = os.path.splitext(output_file)
+    return "%s.%s%s" % (root, hashlib.sha1(data).hexdigest()[:HASH_LENGTH], extension)
+
+
+def write_job_output(job, data):
+    """
+    writes the output of job. a content addressed output that's already there is
+    left as it is, so it keeps its mtime; a new one is written under another name first,
+    so that nobody ever finds the name with half the content behind it
+    @return: where the output went
+    """
+    if not job.content_addressed:
+        write_output(job.output_file, data)
+        return job.output_file
+
+    output_file = content_addressed_name(job.output_file, data)
+    if not os.path.isfile(output_file):
+        partial_file = "%s.%d.tmp" % (output_file, os.getpid())
+        write_output(partial_file, data)
+        os.rename(partial_file, output_file)
+
+    return output_file
+
+
+def describe_error(e):
+    #GenericError derivatives already tell their type
+    return str(e) if isinstance(e, GenericError) else "%s - %s" % (type(e).__name__, e)
+
+
+def compile_job(job):
+    """
+    compiles one job in the worker. the output file is written only if the whole
+    compile goes through, so failures never leave half written files behind
+    @return: BatchResult
+    """
+    if _worker_compiler is None:
+        init_worker()
+
+    collector = CollectElementTypes()
+
+    try:
+        sink = _worker_compiler.compile_file(job.source_file, processors=[collector])
+        output_file = write_job_output(job, sink.getvalue())
+    except Exception as e:
+        return BatchResult(job, describe_error(e))
+
+    return BatchResult(job, element_types=collector.element_types,
+                       includes=_worker_compiler.fragments.get_includes(job.source_file), output_file=output_file)
+
+
+def compile_jobs_pipelined(jobs):
+    """
+    compiles jobs in the worker, through a Pipeline of the compile stages, and a last
+    one writing the output
+    @return: list of BatchResult, in the order of jobs
+    """
+    if _worker_compiler is None:
+        init_worker()
+
+    def write(state):
+        state.output_file = write_job_output(state.job, state.output)
+        state.output = None
+
+    results = []
+    pipeline = Pipeline(CompileStages(_worker_compiler).get_stages() + [write])
+
+    for state in pipeline.run(CompileState(job) for job in jobs):
+        #a tree from a snapshot is ready before any context would have been made
+        if state.context is not None:
+            _worker_compiler.report_metrics(state.context, state.error)
+
+        if state.error is not None:
+            results.append(BatchResult(state.job, describe_error(state.error)))
+        else:
+            results.append(BatchResult(state.job, element_types=state.collector.element_types,
+                                       includes=_worker_compiler.fragments.get_includes(state.job.source_file),
+                                       output_file=state.output_file))
+
+    return results
+
+
+class BatchCompiler(object):
+    """
+    @param workers: number of worker processes; defaults to the number of CPUs.
+                    with one worker everything runs in this process
+    @param chunksize: number of jobs handed to a worker at a time; by default, the jobs
+                      are split in about four chunks per worker, so that small files
+                      don't cost an IPC round-trip each
+    @param pipelined: every worker runs the jobs it gets through a pipeline of stages
+                      (see Pipeline), instead of one job after the other
+    @param content_addressed: name the outputs by their content, and list them in an
+                              AssetManifest in the output directory
+    @param metrics_file: where the workers append the metrics of every compile (see init_worker)
+    @param budget: CompileBudget every compile is to keep within (see Parser.Budget)
+    """
+    def __init__(self, workers=None, chunksize=None, lazy=False, snapshot_dir=None, pipelined=False,
+                 content_addressed=False, metrics_file=None, budget=None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunksize = chunksize
+        self.lazy = lazy
+        self.snapshot_dir = snapshot_dir
+        self.pipelined = pipelined
+        self.content_addressed = content_addressed
+        self.metrics_file = metrics_file
+        self.budget = budget
+
+    def get_chunksize(self, jobs):
+        if self.chunksize:
+            return self.chunksize
+
+        return max(1, len(jobs) // (self.workers * 4))
+
+    def compile(self, jobs):
+        """
+        compiles all jobs
+        @return: list of BatchResult, in the order of jobs (whatever order they finished in)
+        """
+        if self.workers == 1 or len(jobs) <= 1:
+            init_worker(self.lazy, self.snapshot_dir, self.budget, self.metrics_file)
+            if self.pipelined:
+                return compile_jobs_pipelined(jobs)
+            return [compile_job(job) for job in jobs]
+
+        pool = multiprocessing.Pool(self.workers, initializer=init_worker,
+                                    initargs=(self.lazy, self.snapshot_dir, self.budget, self.metrics_file))
+        try:
+            if self.pipelined:
+                chunksize = self.get_chunksize(jobs)
+                chunks = [jobs[start:start + chunksize] for start in range(0, len(jobs), chunksize)]
+                return sum(pool.map(compile_jobs_pipelined, chunks), [])
+
+            return pool.map(compile_job, jobs, self.get_chunksize(jobs))
+        finally:
+            pool.close()
+            pool.join()
+
+    def compile_tree(self, inputs, output_dir, incremental=False):
+        """
+        compiles inputs into output_dir
+        @param incremental: keep a BuildManifest in output_dir, and compile only the
+                            sources that have changed since the last build (or whose
+                            element types have)
+        @return: list of BatchResult, in source order. sources that would write the same
+                 output fail, and aren't compiled
+        """
+        jobs = make_jobs(inputs, output_dir, self.content_addressed)
+        collisions = find_output_collisions(jobs)
+        if not collisions:
+            return self.compile_jobs(jobs, output_dir, incremental)
+
+        results = self.compile_jobs([job for job in jobs if job.source_file not in collisions], output_dir,
+                                    incremental)
+        compiled = dict((result.job.source_file, result) for result in results)
+
+        return [collisions.get(job.source_file) or compiled[job.source_file] for job in jobs]
+
+    def compile_jobs(self, jobs, output_dir, incremental=False):
+        """
+        compiles jobs into output_dir (see compile_tree)
+        """
+        if not incremental:
+            results = self.compile(jobs)
+            if self.content_addressed:
+                self.save_assets(output_dir, results)
+            return results
+
+        manifest = BuildManifest.for_output_dir(output_dir)
+        hashes = dict((job.source_file, file_digest(job.source_file)) for job in jobs)
+
+        #a content addressed output's name is only known once it's compiled; the last build's will do
+        expected_outputs = dict((job.source_file, manifest.get_outputs(job.source_file) if job.content_addressed
+                                 else [job.output_file]) for job in jobs)
+
+        stale_jobs = [job for job in jobs if not expected_outputs[job.source_file] or
+                      not manifest.is_up_to_date(job.source_file, hashes[job.source_file],
+                                                 expected_outputs[job.source_file])]
+        compiled = dict((result.job.source_file, result) for result in self.compile(stale_jobs))
+
+        #sources that are gone are dropped, the rest are kept (or updated, below)
+        manifest.retain(job.source_file for job in jobs)
+        for source_file, result in compiled.items():
+            if result.succeeded():
+                manifest.record(source_file, hashes[source_file], result.element_types,
+                                [result.output_file], result.includes)
+            else:
+                manifest.forget(source_file)
+
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+        manifest.save()
+
+        results = [compiled.get(job.source_file) or
+                   BatchResult(job, skipped=True, output_file=expected_outputs[job.source_file][0]) for job in jobs]
+        if self.content_addressed:
+            self.save_assets(output_dir, results)
+
+        return results
+
+    @staticmethod
+    def save_assets(output_dir, results):
+        """
+        updates the AssetManifest in output_dir with results. a source that failed keeps
+        the output of its last good build; sources that are gone are dropped
+        """
+        assets = AssetManifest.for_output_dir(output_dir)
+        assets.retain(result.job.name for result in results)
+
+        for result in results:
+            if result.succeeded():
+                assets.record(result.job.name, os.path.relpath(result.output_file, output_dir))
+
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+        assets.save()
+
+
+def report(results, stream=sys.stderr):
+    """
+    prints failed compiles, in job order
+    @return: number of failures
+    """
+    failures = [result for result in results if not result.succeeded()]
+
+    for result in failures:
+        print("error: %s" % result, file=stream)
+
+    return len(failures)
@@ -0,0 +1,290 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Compiler
+#
+# the library face of swalpa.py. runs a swalpa file through the whole pipeline -
+# Lexer -> SOMBuilder -> ElementTree -> VerifyParentageAndConfigure -> HtmlRenderer
+#
+# every compile gets a CompileContext of its own, and what the compiler keeps across
+# compiles (the fragment and snapshot caches) is safe to share, so a compiler can
+# be used by any number of threads at once.
+#
+# given a metrics callback, every compile keeps CompileMetrics (see Parser.Metrics),
+# and hands them to the callback when it's done, whether it went through or not.
+#
+
+from contextlib import contextmanager
+
+from Parser import HtmlRenderer, OutputSink, SubtreeSelector, FragmentCache
+from Parser import ComponentRegistry, CompactElementTree, CompileContext, IncrementalDocument
+from Parser.ElementProcessors import VerifyParentageAndConfigure
+from Parser.Budget import EnforceBudget
+from Parser.Metrics import CompileMetrics, CollectMetrics, time_stage, get_sink_size
+
+
+class Compiler(object):
+    def __init__(self, lazy=False, snapshots=None, budget=None, metrics=None, metrics_class=CompileMetrics,
+                 include_root=None, allow_includes=True):
+        """
+        @param lazy: build lazy ElementTrees (see ElementTree)
+        @param snapshots: a SnapshotCache to load verified trees from (and save them to),
+                          instead of building them every time
+        @param budget: CompileBudget every compile is to keep within (see Parser.Budget)
+        @param metrics: callable, given the metrics of every compile (CompileMetrics.to_dict());
+                        no metrics are kept if None
+        @param metrics_class: what keeps the metrics; MemoryMetrics (see Parser.MemoryProfile)
+                              to have the memory each stage takes in them too
+        @param include_root: directory includes are confined to (see FragmentCache)
+        @param allow_includes: False to refuse all includes, for sources that can't be
+                               trusted with the file system
+        """
+        self.lazy = lazy
+        self.snapshots = snapshots
+        self.budget = budget
+        self.metrics = metrics
+        self.metrics_class = metrics_class
+
+        #included files, parsed once for all the compiles this compiler does
+        self.fragments = FragmentCache(include_root, allow_includes)
+
+    def new_context(self, source_name):
+        return CompileContext(source_name, self.lazy, self.budget, self.metrics_class if self.metrics else None)
+
+    def report_metrics(self, context, error=None):
+        """
+        hands the metrics of the compile in context (if it kept any) to the metrics callback
+        @param error: the exception the compile failed with, if it did
+        """
+        if context.metrics is None:
+            return
+
+        context.metrics.finish(error)
+        self.metrics(context.metrics.to_dict())
+
+    @contextmanager
+    def reporting(self, context):
+        """
+        reports the metrics of the compile in context once the block is through
+        """
+        try:
+            yield
+        except Exception as e:
+            self.report_metrics(context, e)
+            raise
+
+        self.report_metrics(context)
+
+    def build_som(self, context, lines=None):
+        """
+        @param lines: source lines, if the source is not to be read from the context's
+                      source. the source name still decides where includes are looked up from
+        @return: root ContentContainer of the SOM, with includes and components expanded
+        """
+        return self.expand_som(context, context.build_som(lines))
+
+    def expand_som(self, context, som_root):
+        """
+        expands includes and components in the SOM, in place
+        @return: som_root
+        """
+        metrics = context.metrics
+
+        with time_stage(metrics, 'includes'):
+            self.fragments.expand(som_root.get_contents(), context.source_name, metrics=metrics,
+                                  meter=context.meter)
+        with time_stage(metrics, 'components'):
+            ComponentRegistry().expand(som_root.get_contents())
+
+        if metrics is not None:
+            metrics.count_containers(som_root.get_contents())
+
+        return som_root
+
+    def build_element_tree(self, context, items, parentage=(), processors=()):
+        """
+        builds the ElementTree for SOM items and verifies it
+        @param parentage: parent element classes, if items are a subtree
+        @param processors: more ElementProcessors to run on the verified tree
+        """
+        metrics = context.metrics
+
+        with time_stage(metrics, 'element_tree'):
+            elementTree = context.build_element_tree(items)
+
+        if context.meter is not None:
+            enforcer = EnforceBudget()
+            enforcer.set_meter(context.meter)
+            with time_stage(metrics, 'budget'):
+                elementTree.grant_visit(enforcer)
+
+        verifier = VerifyParentageAndConfigure()
+        verifier.set_parentage(parentage)
+        with time_stage(metrics, 'verify'):
+            elementTree.grant_visit(verifier)
+
+        with time_stage(metrics, 'processors'):
+            for processor in processors:
+                elementTree.grant_visit(processor)
+
+        self.collect_metrics(context, elementTree)
+        return elementTree
+
+    @staticmethod
+    def collect_metrics(context, elementTree):
+        if context.metrics is None:
+            return
+
+        collector = CollectMetrics()
+        collector.set_metrics(context.metrics)
+        elementTree.grant_visit(collector)
+
+    def load_element_tree(self, source_file, processors=(), context=None):
+        """
+        @return: verified element tree of source_file (a CompactElementTree), from its
+                 snapshot if there is an up to date one; built and snapshotted otherwise
+        """
+        context = context if context is not None else self.new_context(source_file)
+        metrics = context.metrics
+
+        with time_stage(metrics, 'snapshot_load'):
+            elementTree = self.snapshots.get(source_file)
+
+        if metrics is not None:
+            metrics.count_cache('snapshot', elementTree is not None)
+
+        if elementTree is None:
+            items = self.build_som(context).get_contents()
+            elementTree = self.build_element_tree(context, items)
+            with time_stage(metrics, 'snapshot_save'):
+                elementTree = self.snapshot_element_tree(source_file, elementTree)
+        else:
+            self.collect_metrics(context, elementTree)
+
+        with time_stage(metrics, 'processors'):
+            for processor in processors:
+                elementTree.grant_visit(processor)
+
+        return elementTree
+
+    def snapshot_element_tree(self, source_file, elementTree):
+        """
+        snapshots the verified element tree of source_file
+        @return: the tree, as a CompactElementTree
+        """
+        elementTree = CompactElementTree(elementTree.root)
+        self.snapshots.put(source_file, elementTree, self.fragments.get_includes(source_file))
+
+        return elementTree
+
+    def render(self, elementTree, sink, context=None, close=True):
+        """
+        @param context: the compile's context, to keep the output within its budget
+        @param close: False to leave the sink open, for more trees to be rendered into it
+        @return: the sink
+        """
+        renderer = HtmlRenderer()
+        renderer.set_sink(context.meter.meter_sink(sink) if context is not None and context.meter is not None
+                          else sink)
+
+        metrics = context.metrics if context is not None else None
+        if metrics is None:
+            elementTree.grant_visit(renderer)
+            renderer.finish(close)
+            return sink
+
+        output_bytes = get_sink_size(sink)
+        with metrics.stage('render'):
+            elementTree.grant_visit(renderer)
+            renderer.finish(close)
+        metrics.output_bytes += get_sink_size(sink) - output_bytes
+
+        return sink
+
+    def new_document(self, source_file, lines=None):
+        """
+        @param lines: source lines; read from source_file if None
+        @return: an IncrementalDocument of source_file, with its includes and components
+                 expanded as in compile_file
+        """
+        def expand(som_root):
+            return self.expand_som(self.new_context(source_file), som_root)
+
+        if lines is None:
+            return IncrementalDocument.from_file(source_file, self.lazy, expand)
+
+        return IncrementalDocument(lines, self.lazy, expand)
+
+    def compile_document(self, document, sink=None, processors=()):
+        """
+        verifies and renders an IncrementalDocument, as it is now
+        @param processors: more ElementProcessors to run on the verified tree before rendering
+        @return: the sink
+        """
+        verifier = VerifyParentageAndConfigure()
+        document.element_tree.grant_visit(verifier)
+
+        for processor in processors:
+            document.element_tree.grant_visit(processor)
+
+        return self.render(document.element_tree, sink if sink is not None else OutputSink())
+
+    def compile_file(self, source_file, sink=None, selector=None, processors=()):
+        """
+        compiles source_file to HTML
+        @param sink: OutputSink to render into. a fresh in-memory sink if None
+        @param selector: if given, only the subtree(s) this selects are built and
+                         rendered (see SubtreeSelector)
+        @param processors: more ElementProcessors to run on the verified tree(s) before rendering
+        @return: the sink
+        """
+        sink = sink if sink is not None else OutputSink()
+        context = self.new_context(source_file)
+
+        with self.reporting(context):
+            if selector is None and self.snapshots is not None:
+                return self.render(self.load_element_tree(source_file, processors, context), sink, context)
+
+            return self.compile_items(context, self.build_som(context).get_contents(), sink, selector, processors)
+
+    def compile_source(self, source, sink=None, selector=None, processors=(), source_name='<source>'):
+        """
+        compiles swalpa source text to HTML (see compile_file)
+        @param source_name: name to treat the source by; includes are looked up relative to it
+        """
+        sink = sink if sink is not None else OutputSink()
+        context = self.new_context(source_name)
+
+        with self.reporting(context):
+            items = self.build_som(context, source.splitlines(True)).get_contents()
+            return self.compile_items(context, items, sink, selector, processors)
+
+    def compile_items(self, context, items, sink, selector=None, processors=()):
+        if selector is None:
+            return self.render(self.build_element_tree(context, items, processors=processors), sink, context)
+
+        #all the subtrees go into the one sink; it's closed once they're through
+        for parentage, group in SubtreeSelector(selector, context.elementFactory).select(items):
+            self.render(self.build_element_tree(context, group, parentage, processors), sink, context, close=False)
+
+        sink.close()
+        return sink
@@ -0,0 +1,239 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Build manifest
+#
+# remembers, for every source compiled in batch mode, the hash of its contents,
+# the element types it was made of (along with a fingerprint of the code behind each
+# of them) and the outputs it produced. a source needs compiling again only if any
+# of those have changed, or if the compiler itself (lexer, containers, element tree,
+# includes, components, renderer, ...) has.
+#
+# content addressed builds (see Batch) also keep an asset manifest: a plain map of
+# source names to their outputs, for whatever serves or deploys them.
+#
+
+import os
+import io
+import sys
+import json
+import hashlib
+import inspect
+
+from Parser.ElementTree import elementFactory
+
+
+MANIFEST_VERSION = 2
+MANIFEST_NAME = '.swalpa-manifest.json'
+ASSET_MANIFEST_NAME = 'assets.json'
+
+#the modules whose code goes into every compile, whatever it is a compile for
+#(batch builds, snapshots, the compile server)
+COMPILER_MODULES = ['Parser.Lexer', 'Parser.SwalpaObjectModel', 'Parser.BasicElements',
+                    'Parser.ElementTree', 'Parser.CompactElementTree', 'Parser.ElementProcessors',
+                    'Parser.CompileContext', 'Parser.Includes', 'Parser.Components',
+                    'Parser.SubtreeSelector', 'Parser.Renderer']
+
+
+def write_atomically(path, data):
+    """
+    writes and renames, so that an interrupted build never leaves a broken file
+    """
+    with io.open(path + '.tmp', 'wb') as output:
+        output.write(data)
+    os.rename(path + '.tmp', path)
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+
+    with io.open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(64 * 1024), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def source_digest(module_names):
+    """
+    @return: a digest over the source files of the given modules
+    """
+    digest = hashlib.sha1()
+
+    for name in sorted(set(module_names)):
+        source_file = inspect.getsourcefile(sys.modules[name])
+        digest.update(name.encode('utf-8'))
+        digest.update(file_digest(source_file).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+_element_fingerprints = {}
+
+
+def element_fingerprint(element_name):
+    """
+    fingerprint of the code behind an element type: the modules of all the classes
+    it derives from (its templates and parent configuration live there too).
+    unknown element types get no fingerprint
+    """
+    if element_name not in _element_fingerprints:
+        elementcls = elementFactory.ElementsCache.get(element_name)
+        _element_fingerprints[element_name] = source_digest(
+            [cls.__module__ for cls in inspect.getmro(elementcls) if cls is not object]) if elementcls else None
+
+    return _element_fingerprints[element_name]
+
+
+_compiler_fingerprint = []
+
+
+def compiler_fingerprint():
+    if not _compiler_fingerprint:
+        _compiler_fingerprint.append(source_digest(COMPILER_MODULES))
+
+    return _compiler_fingerprint[0]
+
+
+_full_fingerprint = []
+
+
+def full_fingerprint():
+    """
+    fingerprint of the compiler, and of the code behind every element type it knows.
+    for what is kept without a list of the element types it was made of
+    """
+    if not _full_fingerprint:
+        element_modules = [cls.__module__ for elementcls in elementFactory.ElementsCache.values()
+                           for cls in inspect.getmro(elementcls) if cls is not object]
+        _full_fingerprint.append(source_digest(COMPILER_MODULES + element_modules))
+
+    return _full_fingerprint[0]
+
+
+class BuildManifest(object):
+    """
+    @param path: where the manifest is kept (JSON). it's fine for it not to exist yet
+    """
+    def __init__(self, path):
+        self.path = path
+        self.sources = {}
+
+        if os.path.isfile(path):
+            self.load()
+
+    @classmethod
+    def for_output_dir(cls, output_dir):
+        return cls(os.path.join(output_dir, MANIFEST_NAME))
+
+    def load(self):
+        with io.open(self.path, 'rb') as manifest_file:
+            manifest = json.loads(manifest_file.read().decode('utf-8'))
+
+        #a manifest from another version of the format, or of the compiler, is as good as none
+        if manifest.get('version') == MANIFEST_VERSION and manifest.get('compiler') == compiler_fingerprint():
+            self.sources = manifest.get('sources', {})
+
+    def save(self):
+        manifest = {'version': MANIFEST_VERSION, 'compiler': compiler_fingerprint(), 'sources': self.sources}
+        write_atomically(self.path, json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+
+    def get_outputs(self, source_file):
+        """
+        @return: outputs the source produced in the last build; None if it wasn't built
+        """
+        entry = self.sources.get(source_file)
+        return entry['outputs'] if entry is not None else None
+
+    def is_up_to_date(self, source_file, source_hash, outputs):
+        """
+        @param source_hash: file_digest of the source as it is now
+        @param outputs: outputs that the source is going to produce
+        """
+        entry = self.sources.get(source_file)
+        if entry is None:
+            return False
+
+        if entry['hash'] != source_hash or entry['outputs'] != outputs:
+            return False
+
+        if not all(os.path.isfile(output) for output in outputs):
+            return False
+
+        for path, include_hash in entry['includes'].items():
+            if not os.path.isfile(path) or file_digest(path) != include_hash:
+                return False
+
+        return all(element_fingerprint(name) == fingerprint for name, fingerprint in entry['elements'].items())
+
+    def record(self, source_file, source_hash, element_names, outputs, includes=()):
+        """
+        @param includes: files that source_file included; a change in any of them
+                         makes the source out of date
+        """
+        self.sources[source_file] = {'hash': source_hash,
+                                     'elements': dict((name, element_fingerprint(name)) for name in element_names),
+                                     'includes': dict((path, file_digest(path)) for path in includes),
+                                     'outputs': outputs}
+
+    def forget(self, source_file):
+        self.sources.pop(source_file, None)
+
+    def retain(self, source_files):
+        """
+        drops all the sources but source_files
+        """
+        source_files = set(source_files)
+        self.sources = dict((source_file, entry) for source_file, entry in self.sources.items()
+                            if source_file in source_files)
+
+
+class AssetManifest(object):
+    """
+    {source name: output path}, both relative to the output directory
+    @param path: where the manifest is kept (JSON). it's fine for it not to exist yet
+    """
+    def __init__(self, path):
+        self.path = path
+        self.assets = {}
+
+        if os.path.isfile(path):
+            with io.open(path, 'rb') as manifest_file:
+                self.assets = json.loads(manifest_file.read().decode('utf-8'))
+
+    @classmethod
+    def for_output_dir(cls, output_dir):
+        return cls(os.path.join(output_dir, ASSET_MANIFEST_NAME))
+
+    def record(self, name, output):
+        self.assets[name] = output
+
+    def retain(self, names):
+        """
+        drops all the sources but names
+        """
+        names = set(names)
+        self.assets = dict((name, output) for name, output in self.assets.items() if name in names)
+
+    def save(self):
+        #sorted and indented, so that a deploy can diff it
+        write_atomically(self.path, json.dumps(self.assets, indent=1, sort_keys=True).encode('utf-8'))
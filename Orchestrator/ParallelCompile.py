@@ -0,0 +1,201 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Parallel compilation of a single file
+#
+# a huge document is mostly a long run of sibling top level elements, each of which
+# can be lexed, built and verified without the others. the source is split into
+# top level blocks (see Parser.BlockScanner), the blocks are grouped into chunks, and
+# the chunks are compiled to verified CompactElementTrees across a pool of worker
+# processes. the compact trees (flat arrays, cheap to send back) are put together in
+# document order, and the one tree is rendered.
+#
+# component definitions are needed wherever the component is used, so the definition
+# blocks go along with every chunk. so do the top level includes: a chunk takes the
+# definitions out of those that aren't its own, and leaves the rest. blocks keep their own line numbers, so errors are
+# reported at the same lines as they would be otherwise; if more than one chunk has
+# errors, the one from the chunk that comes first in the document is raised.
+#
+
+import multiprocessing
+
+import Batch
+from Batch import init_worker
+from Compiler import Compiler
+from Parser import CompactElementTree, OutputSink
+from Parser.BlockScanner import split_top_level_blocks
+from Parser.Components import COMPONENT_DIRECTIVE
+from Parser.Includes import INCLUDE_DIRECTIVE
+from Parser.SwalpaObjectModel import TextToken
+from Parser.SubtreeSelector import SubtreeSelector
+
+
+DEFAULT_CHUNKS_PER_WORKER = 4
+
+
+class PackedError(object):
+    """
+    an error raised in a worker, packed to be sent back. errors can't be relied on to
+    pickle on their own (their __init__s take all sorts of arguments), so they are
+    sent as their type and state, and put back together without calling __init__
+    """
+    def __init__(self, error):
+        self.error_type = type(error)
+        self.args = error.args
+        self.state = error.__dict__
+
+    def unpack(self):
+        error = self.error_type.__new__(self.error_type)
+        error.args = self.args
+        error.__dict__.update(self.state)
+        return error
+
+
+def get_included_definitions(compiler, source_name, includes):
+    """
+    @param includes: top level include blocks
+    @return: SOM items of the component definitions the blocks pull in
+    """
+    context = compiler.new_context(source_name)
+
+    som_root = context.somBuilder.get_root_element()
+    for first_line_number, lines in includes:
+        som_root = context.build_som(lines, first_line_number)
+
+    items = compiler.fragments.expand(som_root.get_contents(), source_name)
+
+    definitions = []
+    for group in SubtreeSelector.split_item_groups(items):
+        if type(group[0]) is TextToken and group[0].get_contents() == COMPONENT_DIRECTIVE:
+            definitions.extend(group)
+
+    return definitions
+
+
+def compile_chunk_job(job):
+    """
+    compiles a chunk in the worker
+    @param job: (source name, definition blocks, include blocks, blocks); a block is
+                (first line number, lines). include blocks among the chunk's own blocks
+                are expanded in place, the others only lend their component definitions
+    @return: verified CompactElementTree of the chunk, or a PackedError
+    """
+    source_name, definitions, includes, blocks = job
+
+    if Batch._worker_compiler is None:
+        init_worker()
+    compiler = Batch._worker_compiler
+
+    try:
+        context = compiler.new_context(source_name)
+
+        #a document with no blocks at all (empty, or all whitespace) has an empty SOM
+        som_root = context.somBuilder.get_root_element()
+        for first_line_number, lines in definitions + blocks:
+            som_root = context.build_som(lines, first_line_number)
+
+        other_includes = [block for block in includes if block not in blocks]
+        if other_includes:
+            som_root.get_contents()[:0] = get_included_definitions(compiler, source_name, other_includes)
+
+        items = compiler.expand_som(context, som_root).get_contents()
+        return CompactElementTree(compiler.build_element_tree(context, items).root)
+    except Exception as e:
+        return PackedError(e)
+
+
+def make_chunks(blocks, count):
+    """
+    groups blocks, in order, into up to count chunks of about the same number of lines
+    """
+    total_lines = sum(len(lines) for _, lines in blocks)
+    chunk_lines = max(1, -(-total_lines // count))
+
+    chunks = [[]]
+    lines_in_chunk = 0
+
+    for block in blocks:
+        if lines_in_chunk >= chunk_lines:
+            chunks.append([])
+            lines_in_chunk = 0
+
+        chunks[-1].append(block)
+        lines_in_chunk += len(block[1])
+
+    return chunks
+
+
+class ParallelCompiler(object):
+    """
+    @param workers: worker processes; as many as CPUs if None
+    @param chunks_per_worker: chunks to split a document into, per worker. more
+                              chunks even out the load, fewer save on IPC
+    """
+    def __init__(self, workers=None, chunks_per_worker=DEFAULT_CHUNKS_PER_WORKER):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunks_per_worker = chunks_per_worker
+
+        #renders the merged trees
+        self.compiler = Compiler()
+        self.pool = multiprocessing.Pool(self.workers, initializer=init_worker)
+
+    def compile_file(self, source_file, sink=None, processors=()):
+        with open(source_file) as source:
+            return self.compile_lines(source.readlines(), source_file, sink, processors)
+
+    def compile_lines(self, lines, source_name='<source>', sink=None, processors=()):
+        """
+        compiles the lines of a swalpa document to HTML
+        @param source_name: name to treat the source by; includes are looked up relative to it
+        @param processors: more ElementProcessors to run on the verified tree before rendering
+        @return: the sink
+        """
+        definitions = []
+        includes = []
+        blocks = []
+
+        for block in split_top_level_blocks(lines):
+            leading_word = block.get_leading_word()
+            (definitions if leading_word == COMPONENT_DIRECTIVE else blocks).append(
+                (block.first_line_number, block.lines))
+            if leading_word == INCLUDE_DIRECTIVE:
+                includes.append(blocks[-1])
+
+        chunks = make_chunks(blocks, self.workers * self.chunks_per_worker)
+        jobs = [(source_name, definitions, includes, chunk) for chunk in chunks]
+
+        #a chunk or two isn't worth the trip to the workers
+        results = map(compile_chunk_job, jobs) if len(jobs) < 2 else self.pool.map(compile_chunk_job, jobs)
+
+        for result in results:
+            if isinstance(result, PackedError):
+                raise result.unpack()
+
+        tree = CompactElementTree.concatenate(results)
+        for processor in processors:
+            tree.grant_visit(processor)
+
+        return self.compiler.render(tree, sink if sink is not None else OutputSink())
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
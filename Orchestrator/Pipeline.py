@@ -0,0 +1,192 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Pipelined compilation
+#
+# runs the stages of a compile - reading the source, lexing and building the SOM,
+# building and verifying the element tree, rendering, writing the output - each on a
+# thread of its own, connected by bounded queues. while one file is being rendered, the
+# next is being built and the one after that is being read. a stage that gets ahead
+# blocks on the full queue in front of it, so no more than a few files are ever in
+# flight, however many there are to compile.
+#
+# in batch mode, every worker process runs a pipeline of its own over its share of the
+# files (see Batch.compile_jobs_pipelined): the processes make use of the CPUs, the
+# pipelines overlap I/O with compiling.
+#
+
+import threading
+from Queue import Queue, Empty
+
+from Parser import OutputSink
+from Parser.ElementProcessors import CollectElementTypes
+
+
+DEFAULT_QUEUE_SIZE = 4
+
+_END = object()
+
+
+class Pipeline(object):
+    """
+    @param stages: functions, each taking an item, to run the items through in order.
+                   if a stage raises, the error is set on the item (item.error), and the
+                   item is passed along past the rest of the stages
+    @param queue_size: most items waiting in front of a stage
+    """
+    def __init__(self, stages, queue_size=DEFAULT_QUEUE_SIZE):
+        self.stages = stages
+        self.queue_size = queue_size
+
+    def run(self, items):
+        """
+        generates the items as they come out of the last stage, in order. the pipeline
+        is torn down once the last of them is through, or once the caller stops taking
+        them (closes the generator): no more items are fed in then, and those in flight
+        are dropped without going through the rest of the stages
+        """
+        queues = [Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        stopped = threading.Event()
+
+        threads = [threading.Thread(target=self.feed, args=(items, queues[0], stopped))]
+        threads.extend(threading.Thread(target=self.run_stage,
+                                        args=(stage, queues[index], queues[index + 1], stopped))
+                       for index, stage in enumerate(self.stages))
+
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _END:
+                    break
+                yield item
+        finally:
+            stopped.set()
+
+            #every thread in turn is let go of a full queue by emptying the queue it puts to.
+            #the end of the items, if it gets emptied out, is put back for the next thread
+            for thread, queue in zip(threads, queues):
+                ended = False
+                while thread.is_alive():
+                    ended = self.drain(queue) or ended
+                    thread.join(0.01)
+                if self.drain(queue) or ended:
+                    queue.put(_END)
+
+    @staticmethod
+    def drain(queue):
+        """
+        @return: whether the end of the items was among those taken out of the queue
+        """
+        ended = False
+        while True:
+            try:
+                ended = queue.get_nowait() is _END or ended
+            except Empty:
+                return ended
+
+    @staticmethod
+    def feed(items, output, stopped):
+        try:
+            for item in items:
+                if stopped.is_set():
+                    break
+                output.put(item)
+        finally:
+            output.put(_END)
+
+    @staticmethod
+    def run_stage(stage, input, output, stopped):
+        while True:
+            item = input.get()
+
+            if item is not _END and stopped.is_set():
+                continue
+
+            if item is not _END and item.error is None:
+                try:
+                    stage(item)
+                except Exception as e:
+                    item.error = e
+
+            output.put(item)
+            if item is _END:
+                return
+
+
+class CompileState(object):
+    """
+    a compile, as it goes through the stages
+    @param job: what to compile; a BatchJob, or anything with a source_file
+    """
+    def __init__(self, job):
+        self.job = job
+        self.error = None
+
+        self.lines = None
+        self.context = None
+        self.items = None
+        self.tree = None
+        self.output = None
+        self.output_file = None     # where the output went, once it's written
+        self.collector = CollectElementTypes()
+
+
+class CompileStages(object):
+    """
+    the stages of a compile, on a Compiler. the HTML is left in state.output
+    """
+    def __init__(self, compiler):
+        self.compiler = compiler
+
+    def get_stages(self):
+        return [self.read, self.parse, self.build, self.render]
+
+    def read(self, state):
+        with open(state.job.source_file) as source:
+            state.lines = source.readlines()
+
+    def parse(self, state):
+        if self.compiler.snapshots is not None:
+            state.tree = self.compiler.snapshots.get(state.job.source_file)
+            if state.tree is not None:
+                return
+
+        state.context = self.compiler.new_context(state.job.source_file)
+        state.items = self.compiler.build_som(state.context, state.lines).get_contents()
+
+    def build(self, state):
+        if state.tree is None:
+            state.tree = self.compiler.build_element_tree(state.context, state.items)
+            state.items = None
+
+            if self.compiler.snapshots is not None:
+                state.tree = self.compiler.snapshot_element_tree(state.job.source_file, state.tree)
+
+        state.tree.grant_visit(state.collector)
+
+    def render(self, state):
+        state.output = self.compiler.render(state.tree, OutputSink(), state.context).getvalue()
+        state.tree = None
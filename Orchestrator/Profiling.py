@@ -0,0 +1,250 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# CPU profiling
+#
+#   with profile('out/run'):            # or profile('out/run', sampling=True)
+#       Compiler().compile_file('layout.swalpa')
+#
+# runs the block under cProfile, or under SamplingProfiler - a thread looking at the
+# block's stack (sys._current_frames) every interval, which costs the block far less
+# than cProfile's hooking of every call, at the price of precision. either way two
+# files come out:
+#
+#   <prefix>.pstats       for pstats / snakeviz and friends
+#   <prefix>.collapsed    'frame;frame;frame count' lines, for flamegraph.pl / speedscope
+#
+# cProfile keeps no stacks, only who called whom; its collapsed stacks share each
+# function's time out among its callers, in proportion to the time each call took.
+# the sampler keeps no call counts; its pstats count samples as calls.
+#
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+
+
+DEFAULT_INTERVAL = 0.001
+
+PSTATS_EXTENSION = '.pstats'
+COLLAPSED_EXTENSION = '.collapsed'
+
+#collapsed stacks of cProfile runs count microseconds
+COLLAPSED_UNIT = 1e-6
+
+
+def get_frame_label(function):
+    """
+    @param function: pstats function key - (file, line, name)
+    """
+    filename, line_number, name = function
+    if filename == '~':
+        return name     # builtins
+
+    return "%s (%s:%d)" % (name, os.path.basename(filename), line_number)
+
+
+class SamplingProfiler(object):
+    """
+    samples the stack of the thread that enables it (or of all threads but its own)
+    every interval seconds, till disabled. same enable / disable / create_stats as
+    cProfile.Profile, so it goes wherever one goes
+    """
+    def __init__(self, interval=DEFAULT_INTERVAL, all_threads=False):
+        self.interval = interval
+        self.all_threads = all_threads
+        self.stacks = {}        # tuple of pstats function keys, outermost first -> samples
+        self.stats = {}
+
+        self.thread_id = None
+        self.sampler = None
+        self.stopped = threading.Event()
+
+        #the sampler doesn't get to look at every interval on the dot; samples are
+        #worth what the whole run took, shared out evenly
+        self.started = None
+        self.sample_seconds = interval
+
+    def enable(self):
+        self.thread_id = threading.current_thread().ident
+        self.started = time.time()
+        self.stopped.clear()
+        self.sampler = threading.Thread(target=self.run, name='swalpa-sampler')
+        self.sampler.daemon = True
+        self.sampler.start()
+
+    def disable(self):
+        self.stopped.set()
+        self.sampler.join()
+
+        samples = sum(self.stacks.values())
+        if samples:
+            self.sample_seconds = (time.time() - self.started) / samples
+
+    def run(self):
+        own_id = threading.current_thread().ident
+
+        while not self.stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or not (self.all_threads or thread_id == self.thread_id):
+                    continue
+                self.add_sample(frame)
+
+    def add_sample(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+
+        stack.reverse()
+        stack = tuple(stack)
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def create_stats(self):
+        """
+        puts the samples in pstats form: {function: (calls, calls, own time, time, {caller: ...})}
+        """
+        stats = {}
+
+        def entry(function):
+            if function not in stats:
+                stats[function] = [0, 0, 0.0, 0.0, {}]
+            return stats[function]
+
+        for stack, samples in self.stacks.items():
+            seconds = samples * self.sample_seconds
+
+            leaf = entry(stack[-1])
+            leaf[0] += samples
+            leaf[1] += samples
+            leaf[2] += seconds
+
+            #a recursive function is on the stack more than once, but took the time once
+            for function in set(stack):
+                entry(function)[3] += seconds
+
+            for caller, callee in set(zip(stack, stack[1:])):
+                callers = entry(callee)[4]
+                own = seconds if callee == stack[-1] else 0.0
+                calls, _, tt, ct = callers.get(caller, (0, 0, 0.0, 0.0))
+                callers[caller] = (calls + samples, calls + samples, tt + own, ct + seconds)
+
+        self.stats = dict((function, tuple(values)) for function, values in stats.items())
+
+    def get_collapsed(self):
+        """
+        @return: {'frame;frame;frame': samples}
+        """
+        collapsed = {}
+        for stack, samples in self.stacks.items():
+            key = ';'.join(get_frame_label(function) for function in stack)
+            collapsed[key] = collapsed.get(key, 0) + samples
+
+        return collapsed
+
+
+def collapse_stats(stats, min_time=COLLAPSED_UNIT):
+    """
+    unfolds cProfile's caller graph into stacks: starting from the functions nobody
+    called, a function's time along a path is shared out to its callees as their calls
+    from it took, and what's left is its own
+    @param stats: pstats.Stats(...).stats
+    @return: {'frame;frame;frame': microseconds}
+    """
+    callees = {}
+    for function, (cc, nc, tt, ct, callers) in stats.items():
+        for caller, caller_stats in callers.items():
+            #older profilers keep just a call count per caller
+            caller_ct = caller_stats[3] if isinstance(caller_stats, tuple) else 0.0
+            callees.setdefault(caller, []).append((function, caller_ct))
+
+    collapsed = {}
+
+    def unfold(function, path, seconds):
+        cc, nc, tt, ct, callers = stats[function]
+        share = seconds / ct if ct else 0.0
+        path = path + (get_frame_label(function),)
+
+        own = tt * share
+        if own >= min_time:
+            key = ';'.join(path)
+            collapsed[key] = collapsed.get(key, 0) + int(round(own / COLLAPSED_UNIT))
+
+        for callee, callee_ct in callees.get(function, ()):
+            #recursion is folded into the outermost call
+            if callee in stats and get_frame_label(callee) not in path and callee_ct * share >= min_time:
+                unfold(callee, path, callee_ct * share)
+
+    for function, (cc, nc, tt, ct, callers) in stats.items():
+        if not callers:
+            unfold(function, (), ct)
+
+    return collapsed
+
+
+def write_collapsed(collapsed, path):
+    with open(path, 'w') as output:
+        for stack, count in sorted(collapsed.items()):
+            if count > 0:
+                output.write("%s %d\n" % (stack, count))
+
+
+def write_profile(profiler, prefix):
+    """
+    writes <prefix>.pstats and <prefix>.collapsed for a cProfile.Profile or SamplingProfiler
+    @return: the pstats.Stats
+    """
+    stats = pstats.Stats(profiler)
+    stats.dump_stats(prefix + PSTATS_EXTENSION)
+
+    if isinstance(profiler, SamplingProfiler):
+        collapsed = profiler.get_collapsed()
+    else:
+        collapsed = collapse_stats(stats.stats)
+    write_collapsed(collapsed, prefix + COLLAPSED_EXTENSION)
+
+    return stats
+
+
+@contextmanager
+def profile(prefix, sampling=False, interval=DEFAULT_INTERVAL):
+    """
+    profiles the block, and writes the profile out once it's through (or has failed)
+    @param prefix: path the .pstats and .collapsed files are named after
+    @param sampling: profile with a SamplingProfiler, instead of cProfile
+    @param interval: seconds between samples
+    @return: the profiler
+    """
+    output_dir = os.path.dirname(prefix)
+    if output_dir and not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    profiler = SamplingProfiler(interval) if sampling else cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        write_profile(profiler, prefix)
@@ -0,0 +1,191 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Compile result cache
+#
+# remembers what the compile server answered for a source, keyed by a hash of the
+# source (and selector) along with a fingerprint of the compiler and all the element
+# types, so that a compiler upgrade never serves stale HTML. results of sources that
+# include files are good only as long as those files stay as they were. the cache is bounded
+# both by the number of entries and by their total size, least recently used go
+# first, and entries older than the TTL are not served.
+#
+# identical requests that come in while a compile is on are coalesced - the first
+# one compiles, the rest wait for and share its result.
+#
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from Parser.Includes import FragmentCache, IncludeError
+from Manifest import full_fingerprint
+
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def result_key(source, selector=None):
+    digest = hashlib.sha1(full_fingerprint().encode('utf-8'))
+    digest.update(source)
+    digest.update(b'\0' + (selector or '').encode('utf-8'))
+    return digest.hexdigest()
+
+
+def includes_unchanged(include_stamps):
+    """
+    @param include_stamps: (path, stamp) of included files, as they were (see FragmentCache)
+    @return: True if all the files are still as they were
+    """
+    try:
+        return all(FragmentCache.get_stamp(path) == tuple(stamp) for path, stamp in include_stamps)
+    except IncludeError:
+        return False
+
+
+class PendingResult(object):
+    """
+    a compile in progress, that identical requests can wait on
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def set(self, value=None, error=None):
+        self.value, self.error = value, error
+        self.done.set()
+
+    def get(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class CompileResultCache(object):
+    """
+    LRU cache of compile results, bounded by entries and bytes, with an optional TTL
+    @param max_entries: most results to hold
+    @param max_bytes: most bytes (as told by size_of) to hold
+    @param ttl: seconds a result is good for; None for ever
+    @param size_of: size of a cached value
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, ttl=None, size_of=len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_of = size_of
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()    # key -> (value, size, time stored)
+        self.pending = {}               # key -> PendingResult
+        self.bytes_held = 0
+
+        self.hits = self.misses = self.coalesced = self.evictions = 0
+
+    def lookup(self, key, is_fresh):
+        """
+        @return: the cached value, or None. caller holds the lock
+        """
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+
+        if (self.ttl is not None and time.time() - entry[2] > self.ttl) or not is_fresh(entry[0]):
+            self.bytes_held -= entry[1]
+            return None
+
+        #put it back on top of the LRU order
+        self.entries[key] = entry
+        return entry[0]
+
+    def store(self, key, value):
+        """
+        caller holds the lock
+        """
+        size = self.size_of(value)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+
+        self.entries[key] = (value, size, time.time())
+        self.bytes_held += size
+
+        while len(self.entries) > self.max_entries or self.bytes_held > self.max_bytes:
+            _, (_, evicted_size, _) = self.entries.popitem(last=False)
+            self.bytes_held -= evicted_size
+            self.evictions += 1
+
+    def get_or_compile(self, key, compile_func, cacheable=lambda value: True, is_fresh=lambda value: True):
+        """
+        @param compile_func: called (without the lock held) to make the value if it isn't cached
+        @param cacheable: tells if a value may be kept (a timeout, say, shouldn't be)
+        @param is_fresh: tells if a cached value is still good (the files it was made from
+                         may have changed since)
+        @return: the value
+        """
+        compiling = False
+
+        with self.lock:
+            value = self.lookup(key, is_fresh)
+            if value is not None:
+                self.hits += 1
+                return value
+
+            pending = self.pending.get(key)
+            if pending is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                pending = self.pending[key] = PendingResult()
+                compiling = True
+
+        if not compiling:
+            return pending.get()
+
+        try:
+            value = compile_func()
+        except Exception as e:
+            with self.lock:
+                del self.pending[key]
+            pending.set(error=e)
+            raise
+
+        with self.lock:
+            del self.pending[key]
+            if cacheable(value):
+                self.store(key, value)
+        pending.set(value)
+
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes_held = 0
+
+    def get_stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.bytes_held, 'hits': self.hits,
+                    'misses': self.misses, 'coalesced': self.coalesced, 'evictions': self.evictions}
@@ -0,0 +1,246 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Compile server
+#
+# a long running HTTP server (on localhost, or on a unix socket) that takes swalpa
+# source and gives back HTML, or the error as JSON -
+#
+#   POST /compile[?select=#id]    body: swalpa source
+#       200 text/html             the HTML
+#       422 application/json      {"error": "InvalidParentage", "message": "..."}
+#                                 {"error": "BudgetExceeded", "budget": "max_depth", "limit": 128, ...}
+#       504 application/json      the compile didn't finish within the timeout
+#   GET /health                   200 "ok"
+#   GET /stats                    200 application/json, result cache counters
+#
+# connections are handled on threads, and the compiles are run on a pool of worker
+# processes (see WorkerPool), so that a long compile never keeps the server from
+# taking requests.
+# on SIGTERM/SIGINT the server stops taking connections, lets the requests in
+# flight finish, and shuts the pool down.
+#
+# with a result cache, a source that's been compiled before is answered from the
+# cache, and identical requests that come in together are compiled just once.
+#
+# sources can include files only from the include root the server is given, and
+# not at all without one.
+#
+
+from __future__ import print_function
+
+import os
+import json
+import signal
+import threading
+from multiprocessing import TimeoutError
+from urlparse import urlparse, parse_qs
+from SocketServer import ThreadingMixIn, UnixStreamServer
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+from Parser.Budget import CompileBudget
+from WorkerPool import CompilePool, WarmWorkerPool, DEFAULT_BATCH_SIZE
+from ResultCache import CompileResultCache, DEFAULT_MAX_ENTRIES, result_key, includes_unchanged
+
+
+DEFAULT_TIMEOUT = 10.0
+MAX_SOURCE_BYTES = 16 * 1024 * 1024
+DEFAULT_CACHE_ENTRIES = DEFAULT_MAX_ENTRIES
+
+#what a request may take, unless told otherwise (see Parser.Budget)
+DEFAULT_BUDGET = 'depth=128,tokens=1000000,line=65536,string=1048576,output=16777216'
+
+
+class CompileRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self):
+        # unix socket clients have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def send_body(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, document):
+        self.send_body(status, 'application/json', json.dumps(document).encode('utf-8'))
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/health':
+            return self.send_body(200, 'text/plain', b'ok')
+
+        if path == '/stats':
+            return self.send_json(200, self.server.cache.get_stats() if self.server.cache else {})
+
+        self.send_json(404, {'error': 'NotFound', 'message': self.path})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/compile':
+            return self.send_json(404, {'error': 'NotFound', 'message': self.path})
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_SOURCE_BYTES:
+            self.close_connection = True
+            return self.send_json(413, {'error': 'SourceTooLarge', 'message': "%d bytes" % length})
+
+        source = self.rfile.read(length)
+        selector = parse_qs(url.query).get('select', [None])[0]
+
+        status, result = self.server.compile(source, selector)
+        if status == 200:
+            self.send_body(200, 'text/html; charset=utf-8', result)
+        else:
+            self.send_json(status, result)
+
+
+class CompileServerMixIn(ThreadingMixIn):
+    """
+    what's common to the TCP and the unix socket servers
+    """
+    daemon_threads = False      # so that requests in flight get to finish on shutdown
+
+    def setup_compiler(self, pool, timeout, verbose, cache=None):
+        self.pool = pool
+        self.timeout = timeout
+        self.verbose = verbose
+        self.cache = cache
+
+    def compile(self, source, selector=None):
+        """
+        @return: (HTTP status, HTML or JSON document)
+        """
+        if self.cache is None:
+            return self.run_compile(source, selector)[:2]
+
+        #timeouts aren't the source's fault, they don't get cached
+        return self.cache.get_or_compile(result_key(source, selector),
+                                         lambda: self.run_compile(source, selector),
+                                         cacheable=lambda result: result[0] != 504,
+                                         is_fresh=lambda result: includes_unchanged(result[2]))[:2]
+
+    def run_compile(self, source, selector):
+        """
+        @return: (HTTP status, HTML or JSON document, include stamps)
+        """
+        try:
+            succeeded, result, stamps = self.pool.compile(source, selector, self.timeout)
+        except TimeoutError:
+            return 504, {'error': 'Timeout', 'message': "compile took longer than %.1fs" % self.timeout}, ()
+
+        return (200 if succeeded else 422), result, stamps
+
+
+class CompileServer(CompileServerMixIn, HTTPServer):
+    allow_reuse_address = True
+
+
+class UnixCompileServer(CompileServerMixIn, UnixStreamServer):
+    pass
+
+
+def create_result_cache(max_entries=None, ttl=None):
+    """
+    @return: a result cache for compile results, or None if max_entries is 0
+    """
+    if max_entries == 0:
+        return None
+
+    return CompileResultCache(max_entries or DEFAULT_CACHE_ENTRIES, ttl=ttl,
+                              size_of=lambda result: len(str(result[1])))
+
+
+def create_server(address, pool, timeout=DEFAULT_TIMEOUT, verbose=False, cache=None):
+    """
+    @param address: 'host:port' to listen on TCP, or the path of a unix socket
+    @param pool: a CompilePool
+    @param cache: a CompileResultCache, if results are to be cached
+    """
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        server = CompileServer((host or 'localhost', int(port)), CompileRequestHandler)
+    else:
+        if os.path.exists(address):
+            os.unlink(address)
+        server = UnixCompileServer(address, CompileRequestHandler)
+
+    server.setup_compiler(pool, timeout, verbose, cache)
+    return server
+
+
+def create_budget(spec=None, timeout=DEFAULT_TIMEOUT):
+    """
+    @param spec: budget spec (see CompileBudget.parse); DEFAULT_BUDGET if None
+    @return: the CompileBudget for the server's compiles. unless the spec has a deadline,
+             compiles have till the timeout - a compile the server has given up on
+             shouldn't keep its worker from the next one
+    """
+    budget = CompileBudget.parse(spec if spec is not None else DEFAULT_BUDGET)
+    if budget.deadline is None:
+        budget.deadline = timeout
+
+    return budget
+
+
+def serve(address, workers=None, timeout=DEFAULT_TIMEOUT, verbose=False, cache_entries=None, cache_ttl=None,
+          warm_pool=False, batch_size=None, budget=None, include_root=None):
+    """
+    runs the compile server till SIGTERM or SIGINT
+    @param cache_entries: most results to cache, 0 for no caching
+    @param cache_ttl: seconds a cached result is good for
+    @param warm_pool: compile on a WarmWorkerPool, in batches of up to batch_size
+    @param budget: CompileBudget for every compile (see create_budget)
+    @param include_root: directory the sources may include files from; no includes if None
+    """
+    budget = budget if budget is not None else create_budget(timeout=timeout)
+
+    if warm_pool:
+        pool = WarmWorkerPool(workers, batch_size or DEFAULT_BATCH_SIZE, budget=budget, include_root=include_root)
+    else:
+        pool = CompilePool(workers, budget, include_root)
+    server = create_server(address, pool, timeout, verbose, create_result_cache(cache_entries, cache_ttl))
+
+    def shutdown(signum, frame):
+        # shutdown() waits for serve_forever() to return, so it can't be called from its thread
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    print("swalpa: compile server on %s" % address)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        pool.close()
+        pool.join()
+
+        if ':' not in address and os.path.exists(address):
+            os.unlink(address)
@@ -0,0 +1,201 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Snapshots
+#
+# a verified element tree, packed as a CompactElementTree, written out in a compact,
+# versioned binary format. loading one back is a matter of reading a few tables, with
+# no lexing, no SOM and no element tree building.
+#
+# layout (little endian, except for the arrays which are in the byte order noted) -
+#   header:  magic, format version, byte order of the arrays, source digest,
+#            fingerprint of the compiler and elements, number of types, strings, includes, first root
+#   types:   element class names
+#   strings: the string table
+#   includes: (path, digest) of every file the source included
+#   arrays:  for each of CompactElementTree.ARRAY_NAMES, its length and contents
+#
+# a snapshot is good only for the exact source (and included files) it was made from,
+# and for the compiler (and element types) that made it.
+#
+
+import os
+import io
+import sys
+import struct
+import hashlib
+from array import array
+
+from Parser import CompactElementTree
+from Parser.BasicElements import StringElement
+from Parser.ElementTree import elementFactory
+from Manifest import file_digest, full_fingerprint
+
+
+SNAPSHOT_MAGIC = b'SWSN'
+SNAPSHOT_VERSION = 2
+SNAPSHOT_EXTENSION = '.swsnap'
+
+_header = struct.Struct('<4sHc40s40sIIIi')
+_length = struct.Struct('<I')
+
+_byteorder = b'L' if sys.byteorder == 'little' else b'B'
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def write_blob(stream, data):
+    stream.write(_length.pack(len(data)))
+    stream.write(data)
+
+
+def read_blob(stream):
+    length, = _length.unpack(read_exactly(stream, _length.size))
+    return read_exactly(stream, length)
+
+
+def read_exactly(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise SnapshotError("snapshot is truncated")
+
+    return data
+
+
+def dump_snapshot(tree, stream, source_digest, includes=()):
+    """
+    @param tree: CompactElementTree to snapshot
+    @param source_digest: file_digest of the source the tree was built from
+    @param includes: list of (path, file_digest) of the files the source included
+    """
+    stream.write(_header.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _byteorder,
+                              source_digest.encode('ascii'), full_fingerprint().encode('ascii'),
+                              len(tree.types), len(tree.strings), len(includes), tree.first_root))
+
+    for elementcls in tree.types:
+        write_blob(stream, elementcls.__name__.encode('utf-8'))
+
+    for string in tree.strings:
+        write_blob(stream, string.encode('utf-8') if isinstance(string, type(u'')) else string)
+
+    for path, digest in includes:
+        write_blob(stream, path.encode('utf-8'))
+        write_blob(stream, digest.encode('ascii'))
+
+    for name in CompactElementTree.ARRAY_NAMES:
+        values = getattr(tree, name)
+        write_blob(stream, values.tobytes() if hasattr(values, 'tobytes') else values.tostring())
+
+
+def load_snapshot(stream, source_digest=None):
+    """
+    @param source_digest: if given, the snapshot has to be of the source with this digest
+    @return: (CompactElementTree, includes). raises SnapshotError if the snapshot is
+             not one, or not usable by this compiler
+    """
+    magic, version, byteorder, digest, fingerprint, type_count, string_count, include_count, first_root = \
+        _header.unpack(read_exactly(stream, _header.size))
+
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise SnapshotError("not a version %d snapshot" % SNAPSHOT_VERSION)
+
+    if fingerprint.decode('ascii') != full_fingerprint():
+        raise SnapshotError("snapshot is from another version of the compiler, or of the elements")
+
+    if source_digest is not None and digest.decode('ascii') != source_digest:
+        raise SnapshotError("snapshot is of another source")
+
+    types = []
+    for _ in range(type_count):
+        name = read_blob(stream).decode('utf-8')
+        if name == StringElement.__name__:
+            types.append(StringElement)
+        elif name in elementFactory.ElementsCache:
+            types.append(elementFactory.ElementsCache[name])
+        else:
+            raise SnapshotError("snapshot has an unknown element '%s'" % name)
+
+    strings = [read_blob(stream) for _ in range(string_count)]
+    includes = [(read_blob(stream).decode('utf-8'), read_blob(stream).decode('ascii')) for _ in range(include_count)]
+
+    arrays = {}
+    for name in CompactElementTree.ARRAY_NAMES:
+        values = array('i')
+        data = read_blob(stream)
+        values.frombytes(data) if hasattr(values, 'frombytes') else values.fromstring(data)
+        if byteorder != _byteorder:
+            values.byteswap()
+        arrays[name] = values
+
+    return CompactElementTree.from_tables(types, strings, first_root, arrays), includes
+
+
+class SnapshotCache(object):
+    """
+    keeps snapshots next to their sources (source.swalpa.swsnap), or in cache_dir
+    """
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+
+    def get_snapshot_path(self, source_file):
+        if self.cache_dir is None:
+            return source_file + SNAPSHOT_EXTENSION
+
+        name = hashlib.sha1(os.path.abspath(source_file).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, name + SNAPSHOT_EXTENSION)
+
+    def get(self, source_file):
+        """
+        @return: CompactElementTree from the snapshot of source_file, or None if
+                 there isn't an up to date one
+        """
+        snapshot_path = self.get_snapshot_path(source_file)
+        if not os.path.isfile(snapshot_path):
+            return None
+
+        try:
+            with io.open(snapshot_path, 'rb') as snapshot:
+                tree, includes = load_snapshot(snapshot, file_digest(source_file))
+        except (SnapshotError, struct.error):
+            return None
+
+        for path, digest in includes:
+            if not os.path.isfile(path) or file_digest(path) != digest:
+                return None
+
+        return tree
+
+    def put(self, source_file, tree, includes=()):
+        """
+        @param tree: CompactElementTree of source_file
+        @param includes: paths of the files source_file included
+        """
+        snapshot_path = self.get_snapshot_path(source_file)
+        if self.cache_dir is not None and not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        with io.open(snapshot_path + '.tmp', 'wb') as snapshot:
+            dump_snapshot(tree, snapshot, file_digest(source_file),
+                          [(path, file_digest(path)) for path in includes])
+        os.rename(snapshot_path + '.tmp', snapshot_path)
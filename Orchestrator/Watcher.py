@@ -0,0 +1,205 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Watch mode
+#
+# one resident process, with the element factory, container factory and a Compiler
+# set up once, polling the sources for changes and compiling whatever changed.
+# a burst of saves is waited out (debounced) and compiled in one go.
+#
+# every source is kept as an IncrementalDocument, so an edit is reparsed only as far
+# as it reaches (see Parser.IncrementalParser); a source compiled again because a file
+# it includes changed is parsed whole.
+#
+# with patches on, the DOM patches from the last compile of a source to this one
+# (see Parser.TreeDiff) are written next to the output, as <output>.patch.json,
+# for live reloading clients
+#
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import json
+
+import Batch
+from Batch import make_jobs, init_worker, write_output, describe_error, BatchResult
+from Parser.ElementProcessors import CollectElementTypes
+from Parser.TreeDiff import snapshot_nodes, diff_nodes
+
+
+PATCH_SUFFIX = '.patch.json'
+
+
+class SourceWatcher(object):
+    """
+    @param inputs: files, directories and globs to watch (as in batch mode)
+    @param output_dir: where the outputs go
+    @param interval: seconds between polls
+    @param debounce: seconds the sources need to stay unchanged before compiling
+    @param patches: write DOM patches along with the outputs
+    """
+    def __init__(self, inputs, output_dir, interval=0.25, debounce=0.1, stream=sys.stderr, patches=False):
+        self.inputs = inputs
+        self.output_dir = output_dir
+        self.interval = interval
+        self.debounce = debounce
+        self.stream = stream
+        self.patches = patches
+
+        #source file -> its IncrementalDocument, and the PatchNodes of its last good compile
+        self.documents = {}
+        self.nodes = {}
+
+        init_worker()
+
+    def scan(self):
+        """
+        @return: {job's source file: (job, (mtime, size))} for all sources as they are now
+        """
+        snapshot = {}
+
+        for job in make_jobs(self.inputs, self.output_dir):
+            try:
+                stat = os.stat(job.source_file)
+            except OSError:
+                continue
+            snapshot[job.source_file] = (job, (stat.st_mtime, stat.st_size))
+
+        return snapshot
+
+    @staticmethod
+    def get_changed_jobs(before, after):
+        return [job for source_file, (job, stamp) in sorted(after.items())
+                if source_file not in before or before[source_file][1] != stamp]
+
+    def add_dependent_jobs(self, jobs, snapshot):
+        """
+        adds jobs for the sources that include any of the changed ones
+        """
+        fragments = Batch._worker_compiler.fragments
+        changed = set(os.path.abspath(job.source_file) for job in jobs)
+        dependents = set(dependent for job in jobs for dependent in fragments.get_dependents(job.source_file))
+
+        return jobs + [job for source_file, (job, stamp) in sorted(snapshot.items())
+                       if os.path.abspath(source_file) in dependents - changed]
+
+    def wait_for_quiet(self, snapshot):
+        """
+        keeps polling till nothing changes for the debounce period
+        @return: the last snapshot
+        """
+        while True:
+            time.sleep(self.debounce)
+            latest = self.scan()
+            if not self.get_changed_jobs(snapshot, latest) and len(latest) == len(snapshot):
+                return latest
+            snapshot = latest
+
+    def get_document(self, source_file):
+        """
+        @return: the IncrementalDocument of source_file, brought up to date with the file
+        """
+        with open(source_file) as source:
+            lines = source.readlines()
+
+        document = self.documents.get(source_file)
+        if document is None:
+            document = Batch._worker_compiler.new_document(source_file, lines)
+        elif document.lines == lines:
+            #unchanged itself; what it includes has changed
+            document.reparse(lines)
+        else:
+            document.update(lines)
+
+        self.documents[source_file] = document
+        return document
+
+    def compile_document_job(self, job):
+        """
+        compiles job as compile_job does, from its IncrementalDocument. with patches on,
+        writes the patches from its last compile too; a failed compile leaves the last
+        good one to patch from
+        """
+        compiler = Batch._worker_compiler
+        collector = CollectElementTypes()
+        patch_file = job.output_file + PATCH_SUFFIX
+
+        try:
+            document = self.get_document(job.source_file)
+            write_output(job.output_file, compiler.compile_document(document, processors=[collector]).getvalue())
+            nodes = snapshot_nodes(document.element_tree.root) if self.patches else None
+        except Exception as e:
+            #a document that didn't go through is parsed afresh next time
+            self.documents.pop(job.source_file, None)
+            return BatchResult(job, describe_error(e))
+
+        result = BatchResult(job, element_types=collector.element_types,
+                             includes=compiler.fragments.get_includes(job.source_file))
+        if not self.patches:
+            return result
+
+        previous = self.nodes.get(job.source_file)
+        self.nodes[job.source_file] = nodes
+
+        if previous is not None:
+            write_output(patch_file, json.dumps(diff_nodes(previous, nodes)).encode('utf-8'))
+        elif os.path.exists(patch_file):
+            #from an earlier run; the client has to load the output whole anyway
+            os.remove(patch_file)
+
+        return result
+
+    def compile(self, jobs):
+        started = time.time()
+        results = [self.compile_document_job(job) for job in jobs]
+
+        for result in results:
+            print(("compiled: %s" if result.succeeded() else "error: %s") % result, file=self.stream)
+        print("%d file(s) in %.1f ms" % (len(jobs), (time.time() - started) * 1000), file=self.stream)
+
+        return results
+
+    def run(self, cycles=None):
+        """
+        compiles everything once, and then whatever changes, till interrupted
+        @param cycles: number of polls to run for; forever if None
+        """
+        snapshot = self.scan()
+        self.compile([job for source_file, (job, stamp) in sorted(snapshot.items())])
+
+        try:
+            while cycles is None or cycles > 0:
+                time.sleep(self.interval)
+                cycles = cycles - 1 if cycles is not None else None
+
+                latest = self.scan()
+                if not self.get_changed_jobs(snapshot, latest):
+                    snapshot = latest
+                    continue
+
+                latest = self.wait_for_quiet(latest)
+                self.compile(self.add_dependent_jobs(self.get_changed_jobs(snapshot, latest), latest))
+                snapshot = latest
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,294 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Compile worker pools
+#
+# the compile server hands its compiles to one of these -
+#
+# CompilePool sends every compile to a worker on its own, source and HTML pickled
+# through the pool's pipes.
+#
+# WarmWorkerPool is for high request rates, where the layouts are small and the
+# IPC costs more than the compile. its workers are forked once the parent has
+# imported Parser and Elements and built the element factory, so they start warm.
+# sources and outputs go through slots in a shared memory map (made before the fork,
+# so that every worker has it) instead of being pickled, and the compiles that queue
+# up while the workers are busy go to the next free worker as a single batch.
+#
+
+import mmap
+import signal
+import itertools
+import struct
+import threading
+import multiprocessing
+from Queue import Queue, Empty
+from multiprocessing import TimeoutError
+
+import Batch
+from Batch import init_worker, describe_error
+from Parser.Budget import BudgetExceeded
+
+
+DEFAULT_SLOT_SIZE = 256 * 1024
+DEFAULT_BATCH_SIZE = 16
+
+
+def init_server_worker(budget=None, include_root=None):
+    """
+    leaves the shutting down to the server; a worker killed by a signal that
+    went to the whole process group (^C) can take the pool's queue lock with it
+    @param include_root: directory the sources may include files from. sources come
+                         from whoever can reach the server, so without one, they may not
+                         include anything
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    init_worker(budget=budget, include_root=include_root, allow_includes=include_root is not None)
+
+
+#every source a worker compiles gets a name of its own, so that what the fragment
+#cache keeps about its includes doesn't get mixed up with that of another
+_source_ids = itertools.count()
+
+
+def compile_source_job(source, selector=None):
+    """
+    compiles source in the worker
+    @return: (True, HTML, include stamps) or (False, {'error': error type, 'message': error message},
+             include stamps). a budget that's been exceeded is told, with its limit, in the error too.
+             include stamps are (path, stamp) of every file the source included (see FragmentCache)
+    """
+    if Batch._worker_compiler is None:
+        init_worker(allow_includes=False)
+
+    compiler = Batch._worker_compiler
+    source_name = '<source %d>' % next(_source_ids)
+
+    try:
+        sink = compiler.compile_source(source, selector=selector, source_name=source_name)
+        succeeded, result = True, sink.getvalue()
+    except BudgetExceeded as e:
+        succeeded, result = False, dict(e.params, error=type(e).__name__, message=describe_error(e))
+    except Exception as e:
+        succeeded, result = False, {'error': type(e).__name__, 'message': describe_error(e)}
+
+    stamps = compiler.fragments.get_include_stamps(source_name)
+    compiler.fragments.forget(source_name)
+
+    return succeeded, result, stamps
+
+
+class CompilePool(object):
+    """
+    compiles on a pool of worker processes, a job at a time
+    @param budget: CompileBudget for every compile
+    @param include_root: directory the sources may include files from; no includes if None
+    """
+    def __init__(self, workers=None, budget=None, include_root=None):
+        self.pool = multiprocessing.Pool(workers or multiprocessing.cpu_count(), initializer=init_server_worker,
+                                         initargs=(budget, include_root))
+
+    def compile(self, source, selector=None, timeout=None):
+        """
+        @return: (True, HTML, include stamps) or (False, error document, include stamps)
+                 (see compile_source_job). raises a TimeoutError if the compile didn't
+                 finish within timeout
+        """
+        return self.pool.apply_async(compile_source_job, (source, selector)).get(timeout)
+
+    def close(self):
+        self.pool.close()
+
+    def join(self):
+        self.pool.join()
+
+
+class SharedSlots(object):
+    """
+    fixed size slots in an anonymous shared memory map. a slot holds a 4 byte
+    length followed by that many bytes of payload
+    """
+    LENGTH = struct.Struct('<I')
+
+    def __init__(self, count, slot_size):
+        self.count = count
+        self.slot_size = slot_size
+        self.capacity = slot_size - self.LENGTH.size
+        self.buffer = mmap.mmap(-1, count * slot_size)
+
+        self.free = Queue()
+        map(self.free.put, range(count))
+
+    def acquire(self):
+        """
+        @return: a free slot, or None if all of them are in use
+        """
+        try:
+            return self.free.get_nowait()
+        except Empty:
+            return None
+
+    def release(self, slot):
+        self.free.put(slot)
+
+    def write(self, slot, data):
+        """
+        @return: False if the data doesn't fit in a slot
+        """
+        if len(data) > self.capacity:
+            return False
+
+        offset = slot * self.slot_size
+        self.LENGTH.pack_into(self.buffer, offset, len(data))
+        self.buffer[offset + self.LENGTH.size:offset + self.LENGTH.size + len(data)] = data
+        return True
+
+    def read(self, slot):
+        offset = slot * self.slot_size
+        length, = self.LENGTH.unpack_from(self.buffer, offset)
+        return self.buffer[offset + self.LENGTH.size:offset + self.LENGTH.size + length]
+
+
+#inherited by the forked workers of a WarmWorkerPool
+_shared_slots = None
+
+
+def compile_batch_job(jobs):
+    """
+    compiles a batch in the worker
+    @param jobs: (slot, source, selector) for each compile. source is None if it's in the slot
+    @return: (succeeded, in slot, result, include stamps) for each of the jobs. if the HTML
+             is in the slot (the job's slot takes the output too), result is None.
+             this never raises: the pool calls back only for batches that go through
+             (there's no error callback in python 2), and a batch that doesn't would
+             keep its slots, and its worker, taken for good
+    """
+    results = []
+
+    for slot, source, selector in jobs:
+        try:
+            if source is None:
+                source = _shared_slots.read(slot)
+
+            succeeded, result, stamps = compile_source_job(source, selector)
+
+            if succeeded and slot is not None and _shared_slots.write(slot, result):
+                results.append((True, True, None, stamps))
+            else:
+                results.append((succeeded, False, result, stamps))
+        except Exception as e:
+            results.append((False, False, {'error': type(e).__name__, 'message': describe_error(e)}, ()))
+
+    return results
+
+
+class PendingCompile(object):
+    def __init__(self, source, selector):
+        self.source = source
+        self.selector = selector
+        self.slot = None
+        self.done = threading.Event()
+        self.result = None
+
+
+class WarmWorkerPool(CompilePool):
+    """
+    pre-forked workers, shared memory payloads and micro-batching
+    @param batch_size: most compiles sent to a worker at once
+    @param slot_size: bytes in a shared memory slot; bigger sources and outputs are pickled
+    """
+    def __init__(self, workers=None, batch_size=DEFAULT_BATCH_SIZE, slot_size=DEFAULT_SLOT_SIZE, budget=None,
+                 include_root=None):
+        global _shared_slots
+
+        workers = workers or multiprocessing.cpu_count()
+        self.batch_size = batch_size
+
+        #enough slots for every worker to have a batch running, and another queued
+        self.slots = _shared_slots = SharedSlots(2 * workers * batch_size, slot_size)
+        CompilePool.__init__(self, workers, budget, include_root)
+
+        self.free_workers = threading.Semaphore(workers)
+        self.queue = Queue()
+        self.batcher = threading.Thread(target=self.run_batcher, name='swalpa-batcher')
+        self.batcher.daemon = True
+        self.batcher.start()
+
+    def compile(self, source, selector=None, timeout=None):
+        job = PendingCompile(source, selector)
+        self.queue.put(job)
+
+        #the slot is released when the batch comes back, even if we've given up on it
+        if not job.done.wait(timeout):
+            raise TimeoutError()
+
+        return job.result
+
+    def run_batcher(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+
+            #a batch goes out only once a worker is free to take it. the compiles that
+            #come in till then queue up, and go out together
+            self.free_workers.acquire()
+
+            batch = [job]
+            while len(batch) < self.batch_size:
+                try:
+                    job = self.queue.get_nowait()
+                except Empty:
+                    break
+                if job is None:
+                    self.queue.put(None)
+                    break
+                batch.append(job)
+
+            self.submit(batch)
+
+    def submit(self, batch):
+        payloads = []
+        for job in batch:
+            job.slot = self.slots.acquire()
+            if job.slot is not None and self.slots.write(job.slot, job.source):
+                payloads.append((job.slot, None, job.selector))
+            else:
+                payloads.append((job.slot, job.source, job.selector))
+
+        self.pool.apply_async(compile_batch_job, (payloads,), callback=lambda results: self.finish(batch, results))
+
+    def finish(self, batch, results):
+        try:
+            for job, (succeeded, in_slot, result, stamps) in zip(batch, results):
+                job.result = succeeded, (self.slots.read(job.slot) if in_slot else result), stamps
+                if job.slot is not None:
+                    self.slots.release(job.slot)
+                job.done.set()
+        finally:
+            self.free_workers.release()
+
+    def close(self):
+        self.queue.put(None)
+        self.batcher.join()
+        CompilePool.close(self)
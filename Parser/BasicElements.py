@@ -49,6 +49,8 @@ class UnknownElementError(GenericError):
 
 
 class BasicElement(object):
+    line_number = -1    # where in the swalpa file the element starts (set by ElementTree)
+
     @virtual
     def parse_delimiter(self, delimiter):
         accepted_delims = r";"
@@ -70,6 +72,14 @@ class BasicElement(object):
     def setup_child_element_tree(self, children):
         pass
 
+    @virtual
+    def grant_visit(self, visitor):
+        """
+        allows a visitor class to visit the node/element and do its processing
+        @param visitor: the visitor class (should be derived from ElementTreeVisitor)
+        """
+        visitor.visit(self)
+
 
 class ComplexElement(BasicElement):
     def __init__(self):
@@ -102,12 +112,40 @@ class ComplexElement(BasicElement):
             raise InvalidStructureError("element already has children elements set",
                                         element=type(self).__name__)
 
-        assert(type(etree) is list)
+        #either the list of children, or a stand-in that builds it on demand
+        assert(type(etree) is list or hasattr(etree, 'materialize'))
 
         self._child_element_tree = etree
         raise ElementTerminated(self)
 
-    @virtual
+    def replace_child_element_tree(self, etree):
+        """
+        swaps the children elements for a rebuilt set (see IncrementalDocument)
+        @param etree: list of children elements, or None if there are none
+        """
+        assert(etree is None or type(etree) is list or hasattr(etree, 'materialize'))
+
+        self._child_element_tree = etree
+
+    def get_child_element_tree(self):
+        """
+        returns the list of children elements (None if there are none).
+        if building the children was deferred, they get built now, and any
+        structural errors in them are raised now
+        """
+        if self._child_element_tree is not None and type(self._child_element_tree) is not list:
+            self._child_element_tree = self._child_element_tree.materialize()
+
+        return self._child_element_tree
+
+    def get_built_child_element_tree(self):
+        """
+        returns the list of children elements, without building them if building
+        them was deferred (None then, as it is if there are none)
+        """
+        return self._child_element_tree if type(self._child_element_tree) is list else None
+
+    @overrides(BasicElement)
     def grant_visit(self, visitor):
         """
         allows a visitor class to visit the node/element and do its processing
@@ -119,15 +157,38 @@ class ComplexElement(BasicElement):
         visitor.visit(self)
 
         #and then visit the child element tree, if there is one
-        if self._child_element_tree is not None:
+        children = self.get_child_element_tree()
+        if children is not None:
             visitor.going_deeper()
 
-            for elm in self._child_element_tree:
+            for elm in children:
                 elm.grant_visit(visitor)
 
             visitor.coming_back_up()
 
 
+class ComponentElement(ComplexElement):
+    """
+    ComponentElement is a use of a component.
+    it's transparent - visitors don't visit the ComponentElement itself, but
+    its elements, as if they were right there in its place
+    """
+    def __init__(self, instance):
+        super(ComponentElement, self).__init__()
+
+        self.instance = instance
+
+    @overrides(ComplexElement)
+    def grant_visit(self, visitor):
+        if visitor.entering_component(self):
+            return
+
+        for elm in self.get_child_element_tree() or []:
+            elm.grant_visit(visitor)
+
+        visitor.leaving_component(self)
+
+
 class StringElement(BasicElement):
     """
     StringElement is just that - a string.
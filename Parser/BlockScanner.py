@@ -0,0 +1,126 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Top level block scanner
+#
+# finds where the top level elements of a swalpa source end, without lexing it - a
+# quick look at just the quotes, brackets and semicolons on each line. strings (and
+# escaped quotes within them) are skipped over the same way the Lexer does.
+#
+# a block is a run of whole lines holding one or more complete top level elements,
+# so each block can be lexed, built and verified on its own, and its line numbers
+# are just those of its lines.
+#
+
+import re
+
+
+#quotes the way the Lexer sees them (not escaped by a lone backslash), and brackets
+_significant_regex = re.compile(r"""(?<!(?<!\\)\\)['"]|[{}()[\];]""")
+_directive_regex = re.compile(r"\s*([\w\-]+)")
+
+_OPENERS = '{(['
+_CLOSERS = '})]'
+
+
+class Block(object):
+    def __init__(self, first_line_number, lines):
+        self.first_line_number = first_line_number
+        self.lines = lines
+
+    def get_leading_word(self):
+        """
+        @return: the first word of the block (element name, or directive)
+        """
+        for line in self.lines:
+            match = _directive_regex.match(line)
+            if match:
+                return match.group(1)
+            if line.strip():
+                return None
+
+        return None
+
+
+def find_block_ends(lines):
+    """
+    generates the indexes of the lines after which everything so far is complete
+    top level elements. what's not well formed (say, an unterminated string) just
+    doesn't end, and ends up in the last block
+    """
+    quote = None
+    depth = 0
+    complete = True
+
+    for index, line in enumerate(lines):
+        position = 0
+
+        for match in _significant_regex.finditer(line):
+            char = match.group()
+
+            if quote is not None:
+                if char == quote:
+                    quote = None
+                position = match.end()
+                continue
+
+            #any text outside strings and brackets is an element that's not done with yet
+            if line[position:match.start()].strip():
+                complete = False
+            position = match.end()
+
+            if char in _OPENERS:
+                depth += 1
+                complete = False
+            elif char in _CLOSERS:
+                depth -= 1
+                complete = depth == 0 and char == '}'
+            elif char == ';':
+                complete = depth == 0
+            else:
+                quote = char
+                complete = False
+
+        if quote is None and line[position:].strip():
+            complete = False
+
+        if complete:
+            yield index
+
+
+def split_top_level_blocks(lines, first_line_number=1):
+    """
+    @param lines: source lines (with their line endings)
+    @return: list of Blocks, one for each top level element, in order
+    """
+    blocks = []
+    start = 0
+
+    for end in find_block_ends(lines):
+        if any(line.strip() for line in lines[start:end + 1]):
+            blocks.append(Block(first_line_number + start, lines[start:end + 1]))
+        start = end + 1
+
+    if start < len(lines):
+        blocks.append(Block(first_line_number + start, lines[start:]))
+
+    return blocks
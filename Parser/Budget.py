@@ -0,0 +1,310 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Compile budgets
+#
+# limits on what a single compile may take, for sources that can't be trusted:
+#
+#   max_depth           nesting of containers in the SOM, and of elements in the tree
+#   max_tokens          tokens the lexer may produce
+#   max_line_length     longest source line (checked before the line is lexed)
+#   max_string_length   longest "string"
+#   max_output_bytes    HTML the compile may produce
+#   deadline            seconds the compile may take
+#
+# a compile meters what it uses as it goes (see BudgetMeter), and stops with a
+# BudgetExceeded as soon as it goes over any of the limits. the checks ride along on
+# what the compile does anyway - the token stream, a visit of the tree, the writes to
+# the sink - and the clock is looked at only every so often.
+#
+
+import time
+
+from utils.annotations import overrides
+from utils.exceptions import GenericError
+from SwalpaObjectModel import DelimiterToken
+from ElementProcessors import ElementProcessor
+
+
+#how many tokens, elements or writes go by between two looks at the clock
+CLOCK_INTERVAL = 256
+
+#how much of a line is read at a time, when there's no limit on the line length
+READ_PIECE_SIZE = 64 * 1024
+
+_OPENERS = ('{', '(', '[')
+_CLOSERS = ('}', ')', ']')
+_QUOTES = ('"', "'")
+
+
+class BudgetExceeded(GenericError):
+    """
+    params: budget (the limit that was hit), limit, and line_number when it's known
+    """
+    pass
+
+
+class CompileBudget(object):
+    #names for the limits, as they are given on the command line
+    SPEC_NAMES = {'depth': 'max_depth', 'tokens': 'max_tokens', 'line': 'max_line_length',
+                  'string': 'max_string_length', 'output': 'max_output_bytes', 'deadline': 'deadline'}
+
+    def __init__(self, max_depth=None, max_tokens=None, max_line_length=None, max_string_length=None,
+                 max_output_bytes=None, deadline=None):
+        """
+        None for any of the limits leaves it unlimited
+        """
+        self.max_depth = max_depth
+        self.max_tokens = max_tokens
+        self.max_line_length = max_line_length
+        self.max_string_length = max_string_length
+        self.max_output_bytes = max_output_bytes
+        self.deadline = deadline
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        @param spec: 'name=value,...', with the names from SPEC_NAMES ('depth=64,deadline=2.5')
+        """
+        limits = {}
+
+        for item in filter(None, [item.strip() for item in spec.split(',')]):
+            name, _, value = item.partition('=')
+            if name.strip() not in cls.SPEC_NAMES:
+                raise ValueError("unknown budget '%s' (known: %s)" % (name, ', '.join(sorted(cls.SPEC_NAMES))))
+
+            attribute = cls.SPEC_NAMES[name.strip()]
+            limits[attribute] = float(value) if attribute == 'deadline' else int(value)
+
+        return cls(**limits)
+
+    def start(self):
+        """
+        @return: a BudgetMeter for a compile starting now
+        """
+        return BudgetMeter(self)
+
+
+class BudgetMeter(object):
+    """
+    what one compile has used of its budget
+    """
+    def __init__(self, budget):
+        self.budget = budget
+        self.expires_at = time.time() + budget.deadline if budget.deadline is not None else None
+        self.tokens_used = 0
+
+    @staticmethod
+    def exceeded(budget_name, limit, **params):
+        raise BudgetExceeded("compile budget exceeded", budget=budget_name, limit=limit, **params)
+
+    def check_clock(self, line_number=None):
+        if self.expires_at is not None and time.time() > self.expires_at:
+            params = {'line_number': line_number} if line_number is not None else {}
+            self.exceeded('deadline', self.budget.deadline, **params)
+
+    def meter_lines(self, lines, first_line_number=1):
+        """
+        generates lines, after checking their length
+        """
+        max_line_length = self.budget.max_line_length
+
+        for line_number, line in enumerate(lines, start=first_line_number):
+            if max_line_length is not None and len(line) > max_line_length:
+                self.exceeded('max_line_length', max_line_length, line_number=line_number)
+            yield line
+
+    def read_lines(self, path, first_line_number=1):
+        """
+        generates the lines of a file, like meter_lines does; a line is read only up to
+        the length limit though, so that one that never ends (say, /dev/zero) can't take
+        more than that, or more than the deadline
+        """
+        max_line_length = self.budget.max_line_length
+        piece_size = max_line_length + 1 if max_line_length is not None else READ_PIECE_SIZE
+        line_number = first_line_number
+
+        with open(path) as source:
+            pieces = []
+            length = 0
+
+            while True:
+                piece = source.readline(piece_size)
+                if not piece:
+                    break
+
+                pieces.append(piece)
+                length += len(piece)
+                if max_line_length is not None and length > max_line_length:
+                    self.exceeded('max_line_length', max_line_length, line_number=line_number)
+
+                if not piece.endswith('\n'):
+                    self.check_clock(line_number)
+                    continue
+
+                yield ''.join(pieces)
+                pieces = []
+                length = 0
+                line_number += 1
+
+            if pieces:
+                yield ''.join(pieces)
+
+    def count_tokens(self, count):
+        """
+        counts tokens that weren't lexed again (those of cached fragments) against the budget
+        """
+        self.tokens_used += count
+
+        max_tokens = self.budget.max_tokens
+        if max_tokens is not None and self.tokens_used > max_tokens:
+            self.exceeded('max_tokens', max_tokens)
+
+        self.check_clock()
+
+    def meter_tokens(self, tokens):
+        """
+        generates tokens, keeping count of them (across all the calls), of how deep the
+        containers are nested, and of how long the strings are
+        """
+        budget = self.budget
+        max_depth = budget.max_depth
+        max_tokens = budget.max_tokens
+        max_string_length = budget.max_string_length
+
+        depth = 0
+        quote = None
+        string_length = 0
+
+        for token in tokens:
+            self.tokens_used += 1
+            text = token.get_token()
+
+            if quote is not None:
+                if text == quote:
+                    quote = None
+                else:
+                    string_length += len(text)
+                    if max_string_length is not None and string_length > max_string_length:
+                        self.exceeded('max_string_length', max_string_length, line_number=token.get_line_number())
+
+            elif type(token) is DelimiterToken:
+                if text in _OPENERS:
+                    depth += 1
+                    if max_depth is not None and depth > max_depth:
+                        self.exceeded('max_depth', max_depth, line_number=token.get_line_number())
+                elif text in _CLOSERS:
+                    depth -= 1
+                elif text in _QUOTES:
+                    quote = text
+                    string_length = 0
+
+            if max_tokens is not None and self.tokens_used > max_tokens:
+                self.exceeded('max_tokens', max_tokens, line_number=token.get_line_number())
+
+            if self.tokens_used % CLOCK_INTERVAL == 0:
+                self.check_clock(token.get_line_number())
+
+            yield token
+
+    def meter_sink(self, sink):
+        """
+        @return: sink, with the output bytes metered, if there is a limit on those
+                 or on the time; sink itself otherwise
+        """
+        if self.budget.max_output_bytes is None and self.expires_at is None:
+            return sink
+
+        return MeteredSink(sink, self)
+
+
+class MeteredSink(object):
+    """
+    stands in for an OutputSink, and keeps the HTML written to it within the budget.
+    output rendered on the side (see OutputSink.spawn) goes into metered sinks too -
+    all of it ends up in the output at least once, so none of them may go over either
+    """
+    def __init__(self, sink, meter):
+        self.sink = sink
+        self.meter = meter
+        self.max_output_bytes = meter.budget.max_output_bytes
+        self.length = 0
+        self.writes = 0
+
+    def write(self, *fragments):
+        self.sink.write(*fragments)
+
+        self.length += sum(len(fragment) for fragment in fragments)
+        if self.max_output_bytes is not None and self.length > self.max_output_bytes:
+            self.meter.exceeded('max_output_bytes', self.max_output_bytes)
+
+        self.writes += 1
+        if self.writes % CLOCK_INTERVAL == 0:
+            self.meter.check_clock()
+
+    def spawn(self):
+        return MeteredSink(self.sink.spawn(), self.meter)
+
+    def flush(self):
+        self.sink.flush()
+
+    def close(self):
+        self.sink.close()
+
+    def getvalue(self):
+        return self.sink.getvalue()
+
+
+class EnforceBudget(ElementProcessor):
+    """
+    keeps the element tree within the depth budget (components add to the depth
+    of the SOM), and the visit within the deadline.
+    """
+    @overrides(ElementProcessor)
+    def initialize(self):
+        self.meter = None
+        self.depth = 0
+        self.count = 0
+        self.line_number = -1    # of the last element visited
+
+    def set_meter(self, meter):
+        self.meter = meter
+
+    @overrides(ElementProcessor)
+    def going_deeper(self):
+        self.depth += 1
+
+        max_depth = self.meter.budget.max_depth
+        if max_depth is not None and self.depth > max_depth:
+            self.meter.exceeded('max_depth', max_depth, line_number=self.line_number)
+
+    @overrides(ElementProcessor)
+    def coming_back_up(self):
+        self.depth -= 1
+
+    @overrides(ElementProcessor)
+    def process(self, elem):
+        self.line_number = elem.line_number
+
+        self.count += 1
+        if self.count % CLOCK_INTERVAL == 0:
+            self.meter.check_clock(elem.line_number)
@@ -0,0 +1,347 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Compact (struct-of-arrays) ElementTree
+#
+# keeps a whole element tree in a handful of flat arrays, instead of one
+# python object (with its own set of classes and dict of properties) per node.
+# elements are recreated as short-lived views, only while somebody looks at them
+#
+
+from array import array
+
+from BasicElements import StringElement, ComplexElement, ComponentElement, ElementTerminated
+from ElementTree import ElementTree, ElementTreeVisitor
+from ElementProcessors import VerifyParentageAndConfigure
+
+
+NO_NODE = -1
+
+
+class CompactChildren(object):
+    """
+    stands in for the child element tree of a node view; same protocol
+    as DeferredElementTree, so node views visit their children as usual
+    """
+    def __init__(self, tree, first_child):
+        self.tree = tree
+        self.first_child = first_child
+
+    def materialize(self):
+        return self.tree.get_views(self.first_child)
+
+
+class CompactElementTree(object):
+    """
+    per node (indexed in document order) -
+        node_types:     index into the types table
+        parents, first_children, next_siblings: node indexes, NO_NODE if none
+        labels:         string table index of the element ID, or of the contents for strings
+        line_numbers:   where the element starts in the swalpa file
+        class_offsets / property_offsets: where the node's classes and (key, value)
+                        properties start in class_refs and property_refs
+    all strings (IDs, classes, property names and values, contents) are interned in
+    one string table
+    """
+    def __init__(self, elements, release=False):
+        """
+        packs elements, and their child element trees, into the arrays.
+
+        views are recreated from the arrays every time, so changes made to them don't
+        stick; run VerifyParentageAndConfigure on the ElementTree before packing it
+
+        @param elements: root elements of an ElementTree (ElementTree.root)
+        @param release: let go of the child element trees as they are packed (see add_elements)
+        """
+        self.types = []
+        self.strings = []
+
+        self.node_types = array('i')
+        self.parents = array('i')
+        self.first_children = array('i')
+        self.next_siblings = array('i')
+        self.labels = array('i')
+        self.line_numbers = array('i')
+        self.class_offsets = array('i', [0])
+        self.class_refs = array('i')
+        self.property_offsets = array('i', [0])
+        self.property_refs = array('i')
+
+        self.first_root = NO_NODE
+
+        # only needed while building
+        self.__type_ids = {}
+        self.__string_ids = {}
+
+        self.add_elements(elements, NO_NODE, release)
+
+        del self.__type_ids
+        del self.__string_ids
+
+    #the arrays that make up the tree, in the order they are stored (see Orchestrator.Snapshot)
+    ARRAY_NAMES = ('node_types', 'parents', 'first_children', 'next_siblings', 'labels', 'line_numbers',
+                   'class_offsets', 'class_refs', 'property_offsets', 'property_refs')
+
+    @classmethod
+    def from_tables(cls, types, strings, first_root, arrays):
+        """
+        puts together a tree out of its tables, as they were, without building anything
+        @param arrays: {name: array('i')} for each of ARRAY_NAMES
+        """
+        tree = cls([])
+        tree.types = types
+        tree.strings = strings
+        tree.first_root = first_root
+
+        for name in cls.ARRAY_NAMES:
+            setattr(tree, name, arrays[name])
+
+        return tree
+
+    @classmethod
+    def from_som(cls, items, parentage=()):
+        """
+        builds the verified compact tree straight from the SOM. the SOM is walked with a
+        lazy ElementTree, so children are built one subtree at a time, verified, and let
+        go of as soon as they are packed; only the top level elements are alive throughout
+        @param items: list of items that are to be children of the root element
+        @param parentage: parent element classes, if items are a subtree
+        """
+        verifier = VerifyParentageAndConfigure()
+        verifier.set_parentage(parentage)
+
+        def verified(elements):
+            #views can't be configured once packed, so each subtree is before it is
+            for elem in elements:
+                elem.grant_visit(verifier)
+                yield elem
+
+        return cls(verified(ElementTree(items, lazy=True).root), release=True)
+
+    @classmethod
+    def concatenate(cls, trees):
+        """
+        puts trees together, one after the other, into one tree: the roots of each tree
+        follow those of the tree before it
+        """
+        merged = cls([])
+        type_ids = {}
+        string_ids = {}
+        last_root = NO_NODE
+
+        for tree in trees:
+            node_base = len(merged.node_types)
+            class_base = len(merged.class_refs)
+            property_base = len(merged.property_refs)
+
+            type_map = [type_ids.setdefault(elementcls, len(type_ids)) for elementcls in tree.types]
+            string_map = [string_ids.setdefault(value, len(string_ids)) for value in tree.strings]
+
+            def shift(nodes):
+                return (node if node == NO_NODE else node + node_base for node in nodes)
+
+            merged.node_types.extend(type_map[node_type] for node_type in tree.node_types)
+            merged.parents.extend(shift(tree.parents))
+            merged.first_children.extend(shift(tree.first_children))
+            merged.next_siblings.extend(shift(tree.next_siblings))
+            merged.labels.extend(label if label == NO_NODE else string_map[label] for label in tree.labels)
+            merged.line_numbers.extend(tree.line_numbers)
+            merged.class_refs.extend(string_map[ref] for ref in tree.class_refs)
+            merged.class_offsets.extend(offset + class_base for offset in tree.class_offsets[1:])
+            merged.property_refs.extend(string_map[ref] for ref in tree.property_refs)
+            merged.property_offsets.extend(offset + property_base for offset in tree.property_offsets[1:])
+
+            if tree.first_root == NO_NODE:
+                continue
+
+            #chain this tree's roots on to the last root so far
+            if last_root == NO_NODE:
+                merged.first_root = tree.first_root + node_base
+            else:
+                merged.next_siblings[last_root] = tree.first_root + node_base
+
+            last_root = tree.first_root
+            while tree.next_siblings[last_root] != NO_NODE:
+                last_root = tree.next_siblings[last_root]
+            last_root += node_base
+
+        merged.types = sorted(type_ids, key=type_ids.get)
+        merged.strings = sorted(string_ids, key=string_ids.get)
+
+        return merged
+
+    def __len__(self):
+        return len(self.node_types)
+
+    def intern_type(self, elementcls):
+        if elementcls not in self.__type_ids:
+            self.__type_ids[elementcls] = len(self.types)
+            self.types.append(elementcls)
+
+        return self.__type_ids[elementcls]
+
+    def intern_string(self, value):
+        if value is None:
+            return NO_NODE
+
+        if value not in self.__string_ids:
+            self.__string_ids[value] = len(self.strings)
+            self.strings.append(value)
+
+        return self.__string_ids[value]
+
+    def add_elements(self, elements, parent, release=False, previous=NO_NODE):
+        """
+        appends elements, and recursively their children, as nodes under parent
+        @param release: let go of the children of each element once they are packed, so that
+                        only the subtree at hand is alive (for elements that are of no use after)
+        @param previous: node that the first of the elements follows, if any
+        @return: node of the last element
+        """
+        for elem in elements:
+            if type(elem) is ComponentElement:
+                #component trees are shared by all uses of the component, so they are never let go of
+                previous = self.add_elements(elem.get_child_element_tree() or [], parent, False, previous)
+                continue
+
+            index = self.add_node(elem, parent)
+
+            if previous != NO_NODE:
+                self.next_siblings[previous] = index
+            elif parent != NO_NODE:
+                self.first_children[parent] = index
+            else:
+                self.first_root = index
+            previous = index
+
+            if isinstance(elem, ComplexElement):
+                children = elem.get_child_element_tree()
+                if children:
+                    self.add_elements(children, index, release)
+                if release:
+                    elem.replace_child_element_tree(None)
+
+        return previous
+
+    @classmethod
+    def flatten_components(cls, elements):
+        """
+        generates elements, with ComponentElements replaced by their elements
+        """
+        for elem in elements:
+            if type(elem) is ComponentElement:
+                for component_elem in cls.flatten_components(elem.get_child_element_tree() or []):
+                    yield component_elem
+            else:
+                yield elem
+
+    def add_node(self, elem, parent):
+        index = len(self.node_types)
+
+        self.node_types.append(self.intern_type(type(elem)))
+        self.parents.append(parent)
+        self.first_children.append(NO_NODE)
+        self.next_siblings.append(NO_NODE)
+        self.line_numbers.append(elem.line_number)
+
+        if type(elem) is StringElement:
+            self.labels.append(self.intern_string(elem.content))
+        else:
+            self.labels.append(self.intern_string(elem.element_id))
+            self.class_refs.extend(self.intern_string(cls) for cls in sorted(elem.classes))
+            for key in sorted(elem.properties):
+                self.property_refs.append(self.intern_string(key))
+                self.property_refs.append(self.intern_string(elem.properties[key]))
+
+        self.class_offsets.append(len(self.class_refs))
+        self.property_offsets.append(len(self.property_refs))
+
+        return index
+
+    def get_view(self, index):
+        """
+        recreates the element for node at index
+        """
+        elementcls = self.types[self.node_types[index]]
+        label = self.labels[index]
+
+        if elementcls is StringElement:
+            elem = StringElement(self.strings[label])
+            elem.line_number = self.line_numbers[index]
+            return elem
+
+        elem = elementcls()
+        elem.line_number = self.line_numbers[index]
+        elem.set_id(self.strings[label] if label != NO_NODE else None)
+        elem.classes = set(self.strings[ref] for ref in
+                           self.class_refs[self.class_offsets[index]:self.class_offsets[index + 1]])
+
+        refs = self.property_refs[self.property_offsets[index]:self.property_offsets[index + 1]]
+        elem.properties = dict((self.strings[refs[i]], self.strings[refs[i + 1]]) for i in range(0, len(refs), 2))
+
+        if self.first_children[index] != NO_NODE:
+            try:
+                elem.setup_child_element_tree(CompactChildren(self, self.first_children[index]))
+            except ElementTerminated:
+                pass
+
+        return elem
+
+    def get_views(self, first):
+        """
+        @return: list of views for node 'first' and all its next siblings
+        """
+        views = []
+        index = first
+
+        while index != NO_NODE:
+            views.append(self.get_view(index))
+            index = self.next_siblings[index]
+
+        return views
+
+    @property
+    def root(self):
+        return self.get_views(self.first_root)
+
+    def grant_visit(self, visitor):
+        """
+        grants visit to a ElementTreeVisitor class, same as ElementTree.grant_visit.
+        views are created as the visit reaches them, and dropped after
+        @param visitor: visitor class - must be derived from ElementTreeVisitor
+        """
+        assert(issubclass(type(visitor), ElementTreeVisitor))
+
+        self.visit_nodes(self.first_root, visitor)
+
+    def visit_nodes(self, first, visitor):
+        index = first
+
+        while index != NO_NODE:
+            visitor.visit(self.get_view(index))
+
+            if self.first_children[index] != NO_NODE:
+                visitor.going_deeper()
+                self.visit_nodes(self.first_children[index], visitor)
+                visitor.coming_back_up()
+
+            index = self.next_siblings[index]
@@ -0,0 +1,96 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Compile context
+#
+# everything that a single compile works with: the source it's compiling, and the
+# lexer, SOM builder and element trees it builds. none of it is shared with any other
+# compile, so compiles in different contexts can run on different threads at once.
+#
+# the container and element factories are shared, but they are registries - filled
+# in when the Parser and Elements packages are imported, and only read from after.
+#
+
+
+from Lexer import Lexer
+from SwalpaObjectModel import SOMBuilder, container_factory
+from ElementTree import ElementTree, elementFactory
+
+
+class CompileContext(object):
+    def __init__(self, source_name, lazy=False, budget=None, metrics=None, container_fac=container_factory,
+                 element_fac=elementFactory):
+        """
+        @param source_name: file the source comes from (or is to be treated as coming from)
+        @param lazy: build lazy ElementTrees (see ElementTree)
+        @param budget: CompileBudget to keep the compile within; it starts counting now
+        @param metrics: CompileMetrics class (or a subclass, like MemoryMetrics) to keep
+                        metrics of the compile in; no metrics if None
+        """
+        self.source_name = source_name
+        self.lazy = lazy
+        self.meter = budget.start() if budget is not None else None
+        self.metrics = metrics(source_name) if metrics is not None else None
+        self.containerFactory = container_fac
+        self.elementFactory = element_fac
+
+        self.lexer = Lexer()
+        self.somBuilder = SOMBuilder(container_fac)
+
+    def build_som(self, lines=None, first_line_number=1):
+        """
+        builds the SOM; or adds to it, if called again with the lines that follow
+        @param lines: source lines; read from source_name if None
+        @param first_line_number: line number of the first of the lines
+        @return: root ContentContainer of the SOM
+        """
+        if self.meter is None:
+            if lines is None:
+                tokens = self.lexer.tokenize(self.source_name)
+            else:
+                tokens = self.lexer.tokenize_lines(lines, first_line_number)
+        else:
+            #the lines are checked on their way into the lexer, the tokens on their way out
+            if lines is None:
+                lines = self.meter.read_lines(self.source_name, first_line_number)
+            else:
+                lines = self.meter.meter_lines(lines, first_line_number)
+            tokens = self.meter.meter_tokens(self.lexer.tokenize_lines(lines, first_line_number))
+
+        if self.metrics is not None:
+            #lexing runs inside SOM building otherwise; it has to be done up front to be timed
+            with self.metrics.stage('lex'):
+                tokens = list(self.metrics.meter_tokens(tokens))
+
+            with self.metrics.stage('som'):
+                for token in tokens:
+                    self.somBuilder.process_token(token)
+
+            return self.somBuilder.get_root_element()
+
+        for token in tokens:
+            self.somBuilder.process_token(token)
+
+        return self.somBuilder.get_root_element()
+
+    def build_element_tree(self, items, parent_type=None):
+        return ElementTree(items, lazy=self.lazy, parent_type=parent_type, element_fac=self.elementFactory)
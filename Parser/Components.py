@@ -0,0 +1,203 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Components
+#
+#   component [search_form] {
+#       form (navbar-left) [role: "search"] {
+#           textbox (#$id form-control) [placeholder: $placeholder];
+#           submit_button { $label }
+#       }
+#   }
+#
+#   use [search_form] [id: search, placeholder: "Search String", label: "Submit"];
+#
+# components are defined at the top level of a swalpa file (or of a file it includes),
+# and used anywhere. '$name' in the body is replaced by the argument by that name
+# ('#$name' makes an ID out of it).
+#
+# every distinct set of arguments is expanded only once. all uses with those arguments
+# share the one ComponentInstance, and through it the element tree built for it and
+# its rendered HTML
+#
+
+import re
+import copy
+
+from utils.exceptions import GenericError
+from SwalpaObjectModel import TextToken, ComponentInstance
+from SwalpaObjectModel import ClassContainer, PropertyContainer, ContentContainer, StringContainer
+from SubtreeSelector import SubtreeSelector
+
+
+COMPONENT_DIRECTIVE = 'component'
+USE_DIRECTIVE = 'use'
+
+_parameter_regex = re.compile(r"^(#?)\$(\w+)$")
+
+
+class ComponentError(GenericError):
+    pass
+
+
+class ComponentDefinition(object):
+    def __init__(self, name, items, line_number):
+        self.name = name
+        self.items = items
+        self.line_number = line_number
+
+
+class ComponentRegistry(object):
+    """
+    definitions and expanded instances of components, for one compile
+    """
+    def __init__(self):
+        self.definitions = {}
+        self.instances = {}
+
+    def expand(self, items):
+        """
+        collects the component definitions from items, and replaces every 'use'
+        in items (and the containers within) by its ComponentInstance, in place.
+        containers are never changed in place; changed ones are copied, so SOM shared
+        with others (say, included fragments) stays as it is
+        """
+        remaining = []
+
+        for group in SubtreeSelector.split_item_groups(items):
+            if type(group[0]) is TextToken and group[0].get_contents() == COMPONENT_DIRECTIVE:
+                self.define(group)
+            else:
+                remaining.extend(group)
+
+        items[:] = self.rewrite(remaining, ContentContainer, None, ())
+        return items
+
+    def define(self, group):
+        name, arguments = self.get_name_and_arguments(group)
+        contents = [item for item in group if type(item) is ContentContainer]
+
+        if name in self.definitions:
+            raise ComponentError("component is already defined", component=name,
+                                 line_number=group[0].get_line_number())
+
+        self.definitions[name] = ComponentDefinition(name, contents[0].get_contents() if contents else [],
+                                                     group[0].get_line_number())
+
+    def instantiate(self, group, expanding):
+        name, arguments = self.get_name_and_arguments(group)
+        line_number = group[0].get_line_number()
+
+        if name not in self.definitions:
+            raise ComponentError("component is not defined", component=name, line_number=line_number)
+
+        if name in expanding:
+            raise ComponentError("component uses itself", chain=' -> '.join(expanding + (name,)))
+
+        key = (name, tuple(sorted(arguments.items())))
+        if key not in self.instances:
+            items = self.rewrite(self.definitions[name].items, ContentContainer, arguments, expanding + (name,))
+            self.instances[key] = ComponentInstance(name, key[1], items, line_number)
+
+        return self.instances[key]
+
+    @staticmethod
+    def get_name_and_arguments(group):
+        """
+        @return: name (the default property) and arguments (the rest of the properties)
+                 of a component or use directive
+        """
+        name = None
+        arguments = {}
+
+        for item in group:
+            if type(item) is PropertyContainer:
+                default, properties = item.get_contents()
+                name = default if default is not None else name
+                arguments.update(properties)
+
+        if name is None:
+            raise ComponentError("%s needs a [name]" % group[0].get_contents(),
+                                 line_number=group[0].get_line_number())
+
+        return name, arguments
+
+    def rewrite(self, items, context, arguments, expanding):
+        """
+        @param context: type of the container the items are in
+        @param arguments: arguments to substitute for '$name's; None outside component bodies
+        @return: rewritten list of items (or items itself, if nothing changed)
+        """
+        rewritten = []
+
+        if context is ContentContainer:
+            for group in SubtreeSelector.split_item_groups(items):
+                if type(group[0]) is TextToken and group[0].get_contents() == USE_DIRECTIVE:
+                    rewritten.append(self.instantiate(self.rewrite(group, PropertyContainer, arguments, expanding),
+                                                      expanding))
+                else:
+                    rewritten.extend(self.rewrite_item(item, context, arguments, expanding) for item in group)
+        else:
+            rewritten.extend(self.rewrite_item(item, context, arguments, expanding) for item in items)
+
+        if len(rewritten) == len(items) and all(new is old for new, old in zip(rewritten, items)):
+            return items
+
+        return rewritten
+
+    def rewrite_item(self, item, context, arguments, expanding):
+        if type(item) is TextToken:
+            matches = _parameter_regex.match(item.get_contents())
+            if matches and arguments is not None:
+                return self.make_argument(matches.group(2), item, context, arguments, matches.group(1))
+            return item
+
+        if type(item) in (ClassContainer, PropertyContainer, ContentContainer, StringContainer):
+            children = self.rewrite(item.children, type(item), arguments, expanding)
+            if children is not item.children:
+                item = copy.copy(item)
+                item.children = children
+
+        return item
+
+    @staticmethod
+    def make_argument(name, token, context, arguments, prefix=''):
+        """
+        makes the SOM item for argument 'name', to replace token with.
+        quoted arguments become strings where strings can go; everywhere else
+        (and inside strings, and after a prefix) they go in as plain text
+        """
+        if name not in arguments:
+            raise ComponentError("no argument given for parameter", parameter=name,
+                                 line_number=token.get_line_number())
+
+        value = arguments[name]
+        quoted = len(value) > 1 and value[0] == value[-1] and value[0] in "\"'"
+
+        if quoted and not prefix and context in (ContentContainer, PropertyContainer):
+            string = StringContainer()
+            string.CONTAINER_START = value[0]
+            string.container_start_line_number = token.get_line_number()
+            string.children = [TextToken(value[1:-1], token.get_line_number())]
+            return string
+
+        return TextToken(prefix + (value[1:-1] if quoted else value), token.get_line_number())
@@ -73,6 +73,13 @@ class VerifyParentageAndConfigure(ElementProcessor):
         self.parentage = [element]  #start with a root element as a placeholder
         self.last_processed_element = None
 
+    def set_parentage(self, parent_chain):
+        """
+        starts the visit below an existing parent chain, for when only a subtree is visited
+        @param parent_chain: parent element classes of the subtree, outermost first
+        """
+        self.parentage = [element] + list(parent_chain)
+
     @overrides(ElementProcessor)
     def going_deeper(self):
         if self.last_processed_element is not None:
@@ -92,3 +99,15 @@ class VerifyParentageAndConfigure(ElementProcessor):
             elem.configure_for_parent_element(self.parentage[-1])
 
 
+class CollectElementTypes(ElementProcessor):
+    """
+    collects the names of the element types a tree is made of
+    """
+    @overrides(ElementProcessor)
+    def initialize(self):
+        self.element_types = set()
+
+    @overrides(ElementProcessor)
+    def process(self, elem):
+        if issubclass(type(elem), element):
+            self.element_types.add(type(elem).__name__)
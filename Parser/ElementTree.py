@@ -25,6 +25,7 @@ import inspect
 from BasicElements import *
 from SwalpaObjectModel import TextToken, DelimiterToken
 from SwalpaObjectModel import ClassContainer, PropertyContainer, ContentContainer, StringContainer
+from SwalpaObjectModel import ComponentInstance
 from utils.annotations import virtual
 from Elements import *
 
@@ -66,6 +67,7 @@ class ElementFactory():
         @returns:   ComplexElement if item is a TextToken and element by that name is defined.
                     raises an UnknownElementError otherwise.
                     StringElement if item is a StringContainer
+                    ComponentElement if item is a ComponentInstance
                     Raises a RuntimeError if item's type is none of these.
         """
         if type(item) is TextToken:
@@ -77,6 +79,9 @@ class ElementFactory():
         elif type(item) is StringContainer:
                 return StringElement(item.get_contents())
 
+        elif type(item) is ComponentInstance:
+                return ComponentElement(item)
+
         raise RuntimeError("ElementFactory cannot create element from '%s(%s) at %d'" % (
                     item.get_contents() if hasattr(item, 'get_content') else str(item),
                     type(item).__name__, item.get_line_number() if hasattr(item, 'get_line_number') else -1))
@@ -91,7 +96,7 @@ class ElementTree(object):
     the element tree which will be a recursive tree strcuture to represent the
     swalpa file in terms of BasicElement nodes
     """
-    def __init__(self, items):
+    def __init__(self, items, lazy=False, parent_type=None, element_fac=elementFactory):
         """
         element tree kick-off point
         this is where the element-tree buildup starts
@@ -102,15 +107,21 @@ class ElementTree(object):
         it kicks off the build and parse cycle of the element tree from SOM root
 
         @param items: list of items that are to be children of the root element
+        @param lazy: if True, only this level is built now. child element trees are
+                     built from the SOM when they are first accessed (or visited)
+        @param parent_type: type of the element whose children these are (None at the top)
+        @param element_fac: ElementFactory to source the elements from
         """
 
         assert(type(items) is list)
 
+        self.lazy = lazy
+        self.parent_type = parent_type
+        self.elementFactory = element_fac
         self.root = []  # root element
         self.__current = None
-        self.add_element(items[0])
 
-        map(self.parse, items[1:])
+        map(self.parse, items)
 
         if self.__current is not None:
             self.root.append(self.__current)
@@ -125,13 +136,14 @@ class ElementTree(object):
         if it's currently processing any BasicElement that hasn't terminated yet,
         then it's a structural integrity issue, and results into an InvalidStructureError
         """
-        element = elementFactory.get_element(item)
+        element = self.elementFactory.get_element(item)
         if self.__current is not None:
             # we are not yet done with previous element to deal with a new one
             raise InvalidStructureError("attempt to create a new element, before completing previous one.",
                                         incomplete_element=type(self.__current).__name__,
                                         new_element=type(element).__name__,
                                         line_number=item.get_line_number())
+        element.line_number = item.get_line_number()
         self.__current = element
 
     def parse(self, item):
@@ -145,6 +157,13 @@ class ElementTree(object):
             if type(item) is TextToken or type(item) is StringContainer:
                 self.add_element(item)
 
+            # a component brings its whole element tree in, in one go. the tree is shared
+            # by all uses of the component (with the same arguments, under the same parent type)
+            elif type(item) is ComponentInstance:
+                self.add_element(item)
+                self.__current.setup_child_element_tree(SharedComponentTree(item, self.parent_type, self.lazy,
+                                                                                      self.elementFactory))
+
             # a delimiter on the other hand, can be ignored, or used to terminate an element
             elif type(item) is DelimiterToken:
                 if self.__current is None:
@@ -171,8 +190,14 @@ class ElementTree(object):
             # a container represents a child element tree
             elif type(item) is ContentContainer:
                 if len(item.get_contents()) > 0:
-                    child_elem_tree = ElementTree(item.get_contents())
-                    self.__current.setup_child_element_tree(child_elem_tree.root)
+                    if self.lazy:
+                        self.__current.setup_child_element_tree(DeferredElementTree(item.get_contents(),
+                                                                                    type(self.__current),
+                                                                                    self.elementFactory))
+                    else:
+                        child_elem_tree = ElementTree(item.get_contents(), parent_type=type(self.__current),
+                                                      element_fac=self.elementFactory)
+                        self.__current.setup_child_element_tree(child_elem_tree.root)
                 raise ElementTerminated
 
         except ElementTerminated:
@@ -205,6 +230,48 @@ class ElementTree(object):
         #visitor.coming_back_up()
 
 
+class DeferredElementTree(object):
+    """
+    stands in for the child element tree of an element, in a lazy ElementTree.
+    holds on to the SOM items, and builds the (again lazy) child tree out of
+    them only when asked to
+    """
+    def __init__(self, items, parent_type=None, element_fac=elementFactory):
+        self.items = items
+        self.parent_type = parent_type
+        self.elementFactory = element_fac
+
+    def materialize(self):
+        """
+        builds the child element tree
+        @return: list of children elements
+        """
+        return ElementTree(self.items, lazy=True, parent_type=self.parent_type, element_fac=self.elementFactory).root
+
+
+class SharedComponentTree(object):
+    """
+    stands in for the element tree of a ComponentElement. the tree is built once per
+    parent element type, and kept with the ComponentInstance for all its uses.
+    (parent specific configuration only ever looks at the parent type, so all uses
+    under the same parent type can share the configured elements)
+    """
+    def __init__(self, instance, parent_type, lazy=False, element_fac=elementFactory):
+        self.instance = instance
+        self.parent_type = parent_type
+        self.lazy = lazy
+        self.elementFactory = element_fac
+
+    def materialize(self):
+        trees = self.instance.element_trees
+
+        if self.parent_type not in trees:
+            trees[self.parent_type] = ElementTree(self.instance.get_contents(), self.lazy, self.parent_type,
+                                                  self.elementFactory).root
+
+        return trees[self.parent_type]
+
+
 class ElementTreeVisitor(object):
     """
     this class defines a visitor template to the element tree
@@ -226,6 +293,22 @@ class ElementTreeVisitor(object):
         """
         pass
 
+    @virtual
+    def entering_component(self, component):
+        """
+        a ComponentElement is about to have its elements visited.
+        they are visited as if they were right where the component is used
+        @return: True to skip visiting them
+        """
+        return False
+
+    @virtual
+    def leaving_component(self, component):
+        """
+        done visiting the elements of a ComponentElement
+        """
+        pass
+
     @virtual
     def going_deeper(self):
         """
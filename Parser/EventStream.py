@@ -0,0 +1,260 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Streaming (SAX-style) event API
+#
+# turns the token stream from the Lexer straight into start-element / text /
+# end-element events, without building the SOM ContentContainer tree or an
+# ElementTree. only the element chain that is currently open, and the
+# classes/properties/string containers of the element at hand, are alive at
+# any given point; so memory goes with nesting depth, not with document size.
+#
+
+import re
+
+from BasicElements import InvalidStructureError, DelimiterError, UnknownElementError
+from SwalpaObjectModel import container_factory, ContainerTerminated
+from SwalpaObjectModel import TextToken
+from SwalpaObjectModel import ClassContainer, PropertyContainer, ContentContainer, StringContainer
+from ElementTree import elementFactory
+from utils.annotations import virtual
+
+
+START_ELEMENT = 'start_element'
+TEXT = 'text'
+END_ELEMENT = 'end_element'
+
+
+class ElementAttributes(object):
+    """
+    everything that was said about an element between its name and its contents
+    """
+    def __init__(self):
+        self.element_id = None
+        self.classes = []
+        self.default_property = None
+        self.properties = {}
+
+    def parse_classes(self, classes):
+        #IDs are the '#' entries, the last one wins (same as ComplexElement.parse_classes)
+        for cls in classes:
+            if re.match(r"#[\w]+", cls):
+                self.element_id = cls
+            else:
+                self.classes.append(cls)
+
+    def parse_properties(self, defaultprop, properties):
+        if defaultprop is not None:
+            self.default_property = defaultprop
+
+        self.properties.update(properties)
+
+
+class PendingItem(object):
+    """
+    an element (or string) whose name (or text) has been seen, but which
+    is not yet terminated by ';', '{ ... }' or the end of its container
+    """
+    def __init__(self, name, line_number, text=None):
+        self.name = name
+        self.line_number = line_number
+        self.text = text
+        self.attributes = ElementAttributes()
+
+
+class SwalpaEventStream(object):
+    """
+    generates events out of a token stream.
+
+    events are tuples -
+        (START_ELEMENT, element_name, ElementAttributes, line_number)
+        (TEXT, string_contents, line_number)
+        (END_ELEMENT, element_name)
+
+    string contents are given as the SOM has them, i.e. within quotes
+    """
+    def __init__(self, container_fac=container_factory, element_fac=elementFactory):
+        self.containerFactory = container_fac
+        self.elementFactory = element_fac
+
+        self.open_elements = []     # names of the elements whose contents we are in
+        self.pending = None         # PendingItem not yet terminated
+        self.container = None       # class/property/string container digesting tokens
+
+    def events(self, tokens):
+        """
+        generates events for the tokens, one token at a time
+        @param tokens: iterable of tokens, as generated by Lexer.tokenize
+        """
+        for token in tokens:
+            for event in self.process_token(token):
+                yield event
+
+        for event in self.finish():
+            yield event
+
+    def process_token(self, token):
+        """
+        @return: list of events that this token completed
+        """
+        token.set_default_container(self.containerFactory.get_container(token))
+
+        if self.container is not None:
+            try:
+                self.container.digest_token(token)
+            except ContainerTerminated:
+                container, self.container = self.container, None
+                return self.digest_container(container)
+            return []
+
+        if token.has_default_container():
+            container = token.get_default_container()
+
+            if type(container) is ContentContainer:
+                return self.open_element(token)
+
+            if type(container) is StringContainer and self.pending is not None:
+                raise InvalidStructureError("attempt to create a new element, before completing previous one.",
+                                            incomplete_element=self.pending.name,
+                                            new_element="StringElement",
+                                            line_number=token.get_line_number())
+
+            if type(container) is not StringContainer and self.pending is None:
+                raise InvalidStructureError("Attempt to add structure without specifying element",
+                                            line_number=token.get_line_number(),
+                                            structure=type(container).__name__)
+
+            self.container = container
+            return []
+
+        if not len(token.get_token()) or re.match(r"[\s\n\r]+", token.get_token()):
+            return []
+
+        if type(token) is TextToken:
+            return self.start_pending(token)
+
+        if re.match(r"\}", token.get_token()):
+            return self.close_element(token)
+
+        if self.pending is None:
+            return []
+
+        if token.get_token() != ';':
+            raise DelimiterError("don't know how to process delimiter",
+                                 element=self.pending.name, delimiter=token.get_token())
+
+        return self.terminate_pending()
+
+    def finish(self):
+        """
+        @return: events that end of the token stream completes
+        """
+        if self.container is not None:
+            raise InvalidStructureError("unterminated container at the end of input",
+                                        container=type(self.container).__name__,
+                                        line_number=self.container.get_line_number())
+
+        if self.open_elements:
+            raise InvalidStructureError("unterminated element contents at the end of input",
+                                        element=self.open_elements[-1])
+
+        return self.terminate_pending()
+
+    def start_pending(self, token):
+        if self.pending is not None:
+            raise InvalidStructureError("attempt to create a new element, before completing previous one.",
+                                        incomplete_element=self.pending.name,
+                                        new_element=token.get_contents(),
+                                        line_number=token.get_line_number())
+
+        if token.get_contents() not in self.elementFactory.ElementsCache:
+            raise UnknownElementError(token.get_contents())
+
+        self.pending = PendingItem(token.get_contents(), token.get_line_number())
+        return []
+
+    def digest_container(self, container):
+        if type(container) is StringContainer:
+            self.pending = PendingItem(None, container.get_line_number(), container.get_contents())
+        elif type(container) is ClassContainer:
+            self.pending.attributes.parse_classes(container.get_contents())
+        elif type(container) is PropertyContainer:
+            self.pending.attributes.parse_properties(*container.get_contents())
+
+        return []
+
+    def terminate_pending(self):
+        pending, self.pending = self.pending, None
+
+        if pending is None:
+            return []
+
+        if pending.text is not None:
+            return [(TEXT, pending.text, pending.line_number)]
+
+        return [(START_ELEMENT, pending.name, pending.attributes, pending.line_number),
+                (END_ELEMENT, pending.name)]
+
+    def open_element(self, token):
+        if self.pending is None or self.pending.text is not None:
+            raise InvalidStructureError("Attempt to add structure without specifying element",
+                                        line_number=token.get_line_number(),
+                                        structure=ContentContainer.__name__)
+
+        pending, self.pending = self.pending, None
+        self.open_elements.append(pending.name)
+
+        return [(START_ELEMENT, pending.name, pending.attributes, pending.line_number)]
+
+    def close_element(self, token):
+        if not self.open_elements:
+            raise InvalidStructureError("unbalanced container terminator",
+                                        line_number=token.get_line_number())
+
+        return self.terminate_pending() + [(END_ELEMENT, self.open_elements.pop())]
+
+
+class SwalpaEventHandler(object):
+    """
+    callback template for the streaming API. override what you need
+    """
+    @virtual
+    def start_element(self, name, attributes, line_number):
+        pass
+
+    @virtual
+    def text(self, contents, line_number):
+        pass
+
+    @virtual
+    def end_element(self, name):
+        pass
+
+
+def stream_events(tokens, handler):
+    """
+    runs the event stream for tokens, and dispatches each event to the handler
+    @param tokens: iterable of tokens, as generated by Lexer.tokenize
+    @param handler: SwalpaEventHandler derivative
+    """
+    for event in SwalpaEventStream().events(tokens):
+        getattr(handler, event[0])(*event[1:])
@@ -0,0 +1,297 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Includes
+#
+#   include [shared/header.swalpa];
+#
+# pulls in the contents of another swalpa file, in place of the include. included
+# files (fragments) are lexed and built into SOM only once, and kept in a
+# FragmentCache, till they change on disk. the cache also remembers who includes
+# what, so that dependents of a changed fragment can be found.
+#
+# sources that aren't to be trusted with the file system (say, those the compile
+# server gets) either get no includes at all, or get them confined to an include
+# root: absolute paths and paths through '..' are refused, and whatever the path
+# leads to has to be within the root.
+#
+
+import os
+import re
+import threading
+
+from utils.exceptions import GenericError
+from Lexer import Lexer
+from SwalpaObjectModel import SOMBuilder, TextToken, DelimiterToken, PropertyContainer, ContentContainer
+from SubtreeSelector import SubtreeSelector
+from Renderer import unquote
+
+
+INCLUDE_DIRECTIVE = 'include'
+
+
+class IncludeError(GenericError):
+    pass
+
+
+class Fragment(object):
+    def __init__(self, path, stamp, items, includes, token_count=None):
+        self.path = path
+        self.stamp = stamp              # (mtime, size) of the file when it was parsed
+        self.items = items              # SOM root contents, includes already expanded
+        self.includes = includes        # {path: stamp} of all fragments this one pulls in, directly or not
+        self.token_count = token_count  # tokens it took, included fragments and all; None if not metered
+
+
+class FragmentCache(object):
+    """
+    can be shared by compiles running on different threads
+    @param include_root: directory the includes are confined to; includes can be
+                         anywhere if None
+    @param allow_includes: False to refuse all includes
+    """
+    def __init__(self, include_root=None, allow_includes=True):
+        self.include_root = os.path.realpath(include_root) if include_root is not None else None
+        self.allow_includes = allow_includes
+
+        #guards the bookkeeping only; fragments are parsed without it
+        self.lock = threading.Lock()
+        self.fragments = {}
+        self.includes = {}      # source or fragment path -> {fragment path: stamp} of all it pulls in
+        self.dependents = {}    # fragment path -> set of paths that pull it in
+
+    @staticmethod
+    def get_stamp(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            raise IncludeError("cannot read included file", path=path)
+
+        return stat.st_mtime, stat.st_size
+
+    def get_fragment(self, path, including=(), metrics=None, meter=None):
+        """
+        @param path: absolute path of the fragment
+        @param including: chain of files including this one, to catch include cycles
+        @param metrics: CompileMetrics to count the hit or miss in
+        @param meter: BudgetMeter of the compile (see Parser.Budget). the fragment is lexed
+                      within the budget, and its tokens count against it, parsed now or not
+        @return: up to date Fragment for path
+        """
+        if path in including:
+            raise IncludeError("include cycle", chain=' -> '.join(list(including) + [path]))
+
+        stamp = self.get_stamp(path)
+        fragment = self.get_cached_fragment(path, stamp)
+        if fragment is not None and (meter is None or fragment.token_count is not None):
+            if metrics is not None:
+                metrics.count_cache('fragment', True)
+            if meter is not None:
+                meter.count_tokens(fragment.token_count)
+            return fragment
+
+        if metrics is not None:
+            metrics.count_cache('fragment', False)
+
+        #parsed without holding the lock: a fragment that two compiles parse at once is
+        #parsed twice, but no compile waits on another one's parsing
+        if meter is None:
+            tokens = Lexer().tokenize(path)
+        else:
+            tokens_used = meter.tokens_used
+            tokens = meter.meter_tokens(Lexer().tokenize_lines(meter.read_lines(path)))
+
+        somBuilder = SOMBuilder()
+        for token in tokens:
+            somBuilder.process_token(token)
+
+        items = somBuilder.get_root_element().get_contents()
+        includes = self.expand_items(items, path, tuple(including) + (path,), metrics, meter)
+
+        fragment = Fragment(path, stamp, items, includes,
+                            meter.tokens_used - tokens_used if meter is not None else None)
+        with self.lock:
+            self.set_includes(path, includes)
+            self.fragments[path] = fragment
+
+        return fragment
+
+    def get_cached_fragment(self, path, stamp):
+        """
+        @return: the Fragment parsed out of path, if neither it nor any of the files it
+                 pulls in have changed since; None otherwise
+        """
+        with self.lock:
+            fragment = self.fragments.get(path)
+
+        if fragment is None or fragment.stamp != stamp:
+            return None
+
+        try:
+            if all(self.get_stamp(include) == include_stamp for include, include_stamp in fragment.includes.items()):
+                return fragment
+        except IncludeError:
+            pass
+
+        return None
+
+    def expand(self, items, source_file, including=None, metrics=None, meter=None):
+        """
+        replaces include directives in items (and in the containers within) by the
+        contents of the included files, in place
+        @param source_file: the file the items come from; includes are relative to it
+        @param metrics: CompileMetrics to count fragment cache hits and misses in
+        @param meter: BudgetMeter of the compile, for the included files to be lexed within
+        """
+        source_file = os.path.abspath(source_file)
+        includes = self.expand_items(items, source_file, including or (source_file,), metrics, meter)
+
+        with self.lock:
+            self.set_includes(source_file, includes)
+
+        return items
+
+    def set_includes(self, source_file, includes):
+        """
+        records what source_file pulls in. caller holds the lock
+        @param includes: {fragment path: stamp} of all the fragments
+        """
+        for fragment_path in self.includes.pop(source_file, {}):
+            self.dependents.get(fragment_path, set()).discard(source_file)
+
+        self.includes[source_file] = includes
+        for fragment_path in includes:
+            self.dependents.setdefault(fragment_path, set()).add(source_file)
+
+    def expand_items(self, items, source_file, including, metrics=None, meter=None, includes=None):
+        """
+        @return: {fragment path: stamp} of all the fragments pulled into items
+        """
+        includes = includes if includes is not None else {}
+        expanded = []
+
+        for group in SubtreeSelector.split_item_groups(items):
+            if type(group[0]) is TextToken and group[0].get_contents() == INCLUDE_DIRECTIVE:
+                fragment = self.get_fragment(self.get_include_path(group, source_file), including, metrics, meter)
+                includes[fragment.path] = fragment.stamp
+                includes.update(fragment.includes)
+
+                #the trailing ';' makes sure the fragment's last element is done with
+                expanded.extend(fragment.items)
+                expanded.append(DelimiterToken(';', group[0].get_line_number()))
+                continue
+
+            for item in group:
+                if type(item) is ContentContainer:
+                    self.expand_items(item.get_contents(), source_file, including, metrics, meter, includes)
+            expanded.extend(group)
+
+        items[:] = expanded
+        return includes
+
+    def get_include_path(self, group, source_file):
+        """
+        @return: absolute path of the file the include directive in group pulls in
+        """
+        if not self.allow_includes:
+            raise IncludeError("includes are not allowed here", line_number=group[0].get_line_number())
+
+        properties = [item for item in group if type(item) is PropertyContainer]
+        if len(properties) != 1:
+            raise IncludeError("include needs exactly one [file] to include",
+                               line_number=group[0].get_line_number(), file=source_file)
+
+        include_path, _ = properties[0].get_contents()
+        if include_path is None:
+            raise IncludeError("include needs a [file] to include",
+                               line_number=group[0].get_line_number(), file=source_file)
+
+        include_path = unquote(include_path)
+        if self.include_root is None:
+            return os.path.abspath(os.path.join(os.path.dirname(source_file), include_path))
+
+        return self.get_confined_path(include_path, source_file, group[0].get_line_number())
+
+    def get_confined_path(self, include_path, source_file, line_number):
+        """
+        @return: real path of include_path, within the include root. relative to source_file
+                 if that is a file within the root too, relative to the root otherwise
+        """
+        if os.path.isabs(include_path) or '..' in re.split(r'[\\/]', include_path):
+            raise IncludeError("include has to be a relative path, without '..'",
+                               line_number=line_number, include=include_path)
+
+        source_dir = os.path.dirname(os.path.realpath(source_file))
+        if not os.path.isfile(source_file) or not self.is_within_root(source_dir):
+            source_dir = self.include_root
+
+        #symlinks could still lead out of the root
+        path = os.path.realpath(os.path.join(source_dir, include_path))
+        if not self.is_within_root(path):
+            raise IncludeError("include is outside the include root", line_number=line_number,
+                               include=include_path)
+
+        return path
+
+    def is_within_root(self, path):
+        return path == self.include_root or path.startswith(os.path.join(self.include_root, ''))
+
+    def get_includes(self, source_file):
+        """
+        @return: all fragments source_file pulls in, directly or otherwise
+        """
+        with self.lock:
+            return sorted(self.includes.get(os.path.abspath(source_file), {}))
+
+    def get_include_stamps(self, source_file):
+        """
+        @return: (path, stamp) of every fragment source_file pulls in, as they were when parsed
+        """
+        with self.lock:
+            return sorted(self.includes.get(os.path.abspath(source_file), {}).items())
+
+    def forget(self, source_file):
+        """
+        drops what's known about what source_file includes; for sources that are
+        compiled once, and never heard of again
+        """
+        source_file = os.path.abspath(source_file)
+
+        with self.lock:
+            for fragment_path in self.includes.pop(source_file, {}):
+                self.dependents.get(fragment_path, set()).discard(source_file)
+
+    def get_dependents(self, path):
+        """
+        @return: all files that pull in path, directly or otherwise
+        """
+        with self.lock:
+            dependents = set()
+            pending = [os.path.abspath(path)]
+
+            while pending:
+                for dependent in self.dependents.get(pending.pop(), set()):
+                    if dependent not in dependents:
+                        dependents.add(dependent)
+                        pending.append(dependent)
+
+            return sorted(dependents)
@@ -0,0 +1,269 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Incremental reparsing
+#
+# keeps the SOM and the ElementTree of a document around, and when the document
+# changes, finds the smallest '{ ... }' ContentContainer that the changed lines are
+# wholly inside of. only the lines of that container are lexed again, its contents
+# rebuilt, and spliced into the SOM and the ElementTree. line numbers of everything
+# after it are shifted along.
+#
+# whenever the change can't be pinned down to one container (say, braces were
+# added or removed across it), the whole document is parsed again.
+#
+# includes and components are expanded by an expand callable (see Compiler.new_document)
+# on every full parse. the expanded SOM no longer lines up with the source (included
+# items carry the line numbers of their own files, component trees are shared by all
+# their uses), so a document that has any include, component or use in it is always
+# parsed whole; so is one that gets its first directive in the change.
+#
+
+from Lexer import Lexer
+from SwalpaObjectModel import SOMBuilder, Token, TextToken, Container, ContentContainer
+from ElementTree import ElementTree
+from BasicElements import ComplexElement
+from SubtreeSelector import SubtreeSelector
+from Includes import INCLUDE_DIRECTIVE
+from Components import COMPONENT_DIRECTIVE, USE_DIRECTIVE
+
+
+DIRECTIVES = (INCLUDE_DIRECTIVE, COMPONENT_DIRECTIVE, USE_DIRECTIVE)
+
+
+class IncrementalDocument(object):
+    """
+    @param lines: source lines of the document (with line endings)
+    @param lazy: build lazy ElementTrees
+    @param expand: callable expanding the includes and components in the SOM root it's
+                   given, in place; documents with directives can't be built without one
+    """
+    def __init__(self, lines, lazy=False, expand=None):
+        self.lazy = lazy
+        self.expand = expand
+        self.lines = []
+        self.som_root = None
+        self.element_tree = None
+        self.has_directives = False
+
+        self.reparse(lines)
+
+    @classmethod
+    def from_file(cls, source_file, lazy=False, expand=None):
+        with open(source_file) as source:
+            return cls(source.readlines(), lazy, expand)
+
+    def reparse(self, lines):
+        """
+        parses the whole document
+        """
+        somBuilder = SOMBuilder()
+        for token in Lexer().tokenize_lines(lines):
+            somBuilder.process_token(token)
+
+        som_root = somBuilder.get_root_element()
+        has_directives = self.holds_directives(som_root.get_contents())
+        if has_directives and self.expand is not None:
+            self.expand(som_root)
+
+        element_tree = ElementTree(som_root.get_contents(), lazy=self.lazy)
+
+        self.lines = list(lines)
+        self.som_root = som_root
+        self.element_tree = element_tree
+        self.has_directives = has_directives
+
+    @classmethod
+    def holds_directives(cls, items):
+        """
+        @return: True if there's an include, component or use in items, or in the containers within
+        """
+        for group in SubtreeSelector.split_item_groups(items):
+            if type(group[0]) is TextToken and group[0].get_contents() in DIRECTIVES:
+                return True
+
+            for item in group:
+                if type(item) is ContentContainer and cls.holds_directives(item.get_contents()):
+                    return True
+
+        return False
+
+    def update(self, lines):
+        """
+        brings the document up to date with lines, reparsing as little of it as possible
+        @return: True if only a part of the document was reparsed
+        """
+        lines = list(lines)
+        first, old_last, new_last = self.get_changed_lines(self.lines, lines)
+
+        if first is None:
+            return True
+
+        if self.has_directives:
+            self.reparse(lines)
+            return False
+
+        path, container = self.find_enclosing_container(first, old_last)
+        if container is None or not self.reparse_container(lines, path, container, new_last - old_last):
+            self.reparse(lines)
+            return False
+
+        self.lines = lines
+        return True
+
+    @staticmethod
+    def get_changed_lines(old_lines, new_lines):
+        """
+        @return: (first changed line, its last line in old_lines, and in new_lines),
+                 1 based. (None, None, None) if nothing changed
+        """
+        if old_lines == new_lines:
+            return None, None, None
+
+        prefix = 0
+        while prefix < min(len(old_lines), len(new_lines)) and old_lines[prefix] == new_lines[prefix]:
+            prefix += 1
+
+        suffix = 0
+        while suffix < min(len(old_lines), len(new_lines)) - prefix and \
+                old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+            suffix += 1
+
+        return prefix + 1, len(old_lines) - suffix, len(new_lines) - suffix
+
+    def find_enclosing_container(self, first, last):
+        """
+        finds the innermost ContentContainer that lines first to last are wholly inside
+        of, not touching the lines it starts and ends on
+        @return: (path, container). path holds the index of the element group at each level,
+                 down from the root. container is None if there is no such container
+        """
+        path = []
+        found = None
+        items = self.som_root.get_contents()
+
+        while True:
+            for index, group in enumerate(SubtreeSelector.split_item_groups(items)):
+                contents = [item for item in group if type(item) is ContentContainer]
+                if contents and contents[0].get_line_number() < first and \
+                        contents[0].get_end_line_number() > last:
+                    path.append(index)
+                    found = contents[0]
+                    items = found.get_contents()
+                    break
+            else:
+                return path, found
+
+    def reparse_container(self, lines, path, container, shift):
+        """
+        lexes and builds the contents of container again, out of the changed lines
+        @return: False if the new lines don't keep the container where it was
+        """
+        start = container.get_line_number()
+        end = container.get_end_line_number() + shift
+
+        somBuilder = SOMBuilder()
+        somBuilder.get_root_element().container_start_line_number = start
+        somBuilder.get_root_element().container_start_position = container.container_start_position
+
+        for token in Lexer().tokenize_lines(lines[start - 1:end], first_line_number=start):
+            # the tokens on the first line, till the container starts, are not ours
+            if token.get_line_number() == start and token.position <= container.container_start_position:
+                continue
+
+            somBuilder.process_token(token)
+            if somBuilder.complete:
+                break
+
+        new_container = somBuilder.get_root_element()
+        if not somBuilder.complete or new_container.get_end_line_number() != end:
+            return False
+
+        if self.holds_directives(new_container.get_contents()):
+            return False
+
+        # elements first; if the new contents don't build, nothing has been touched yet
+        elem = self.rebuild_element_subtree(path, new_container)
+        self.shift_line_numbers(self.som_root, container, container.get_end_line_number(), shift)
+        self.shift_element_line_numbers(self.element_tree.root, elem, container.get_end_line_number(), shift)
+
+        container.children = new_container.children
+        container.container_end_line_number = end
+
+        return True
+
+    @classmethod
+    def shift_line_numbers(cls, item, skipped, after, shift):
+        """
+        shifts line numbers of the SOM items from line 'after' on, skipping
+        the 'skipped' container
+        """
+        if shift == 0 or item is skipped:
+            return
+
+        if isinstance(item, Token):
+            if item.line_number >= after:
+                item.line_number += shift
+            return
+
+        if not isinstance(item, Container):
+            return
+
+        if item.container_start_line_number >= after:
+            item.container_start_line_number += shift
+        if item.container_end_line_number >= after:
+            item.container_end_line_number += shift
+
+        for child in item.children:
+            cls.shift_line_numbers(child, skipped, after, shift)
+
+    @classmethod
+    def shift_element_line_numbers(cls, elements, skipped, after, shift):
+        """
+        shifts line numbers of the elements from line 'after' on, skipping the children
+        of the 'skipped' element. children not built yet (in lazy trees) are left alone;
+        they get built out of the SOM, which is shifted already
+        """
+        if shift == 0:
+            return
+
+        for elem in elements:
+            if elem.line_number >= after:
+                elem.line_number += shift
+
+            if elem is not skipped and isinstance(elem, ComplexElement):
+                cls.shift_element_line_numbers(elem.get_built_child_element_tree() or [], skipped, after, shift)
+
+    def rebuild_element_subtree(self, path, container):
+        """
+        builds the children of the element, at path, that container belongs to
+        @return: the element
+        """
+        elements = self.element_tree.root
+        for index in path[:-1]:
+            elements = elements[index].get_child_element_tree()
+
+        elem = elements[path[-1]]
+        children = ElementTree(container.get_contents(), lazy=self.lazy, parent_type=type(elem)).root
+
+        elem.replace_child_element_tree(children if children else None)
+        return elem
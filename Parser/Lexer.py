@@ -40,13 +40,23 @@ class Lexer(object):
         """
         self.swalpa_file = file
 
-        for line_number, line in enumerate(fileinput.input(self.swalpa_file), start=1):
+        #a FileInput of our own; fileinput.input() is one per process, and can't be
+        #used by two compiles at once
+        return self.tokenize_lines(fileinput.FileInput(self.swalpa_file))
+
+    def tokenize_lines(self, lines, first_line_number=1):
+        """
+        generates one token at a time from lines of swalpa source
+        @param lines: iterable of lines (with their line endings)
+        @param first_line_number: line number of the first of the lines
+        """
+        for line_number, line in enumerate(lines, start=first_line_number):
             tokens = self.tokenizer.split(line)
             if not tokens:
-                print("info: couldn't tokenize input file - " + file)
+                print("info: couldn't tokenize input file - " + str(self.swalpa_file))
 
-            for token in tokens:
-                yield (DelimiterToken if self.tokenizer.match(token) else TextToken)(token, line_number)
+            for position, token in enumerate(tokens):
+                yield (DelimiterToken if self.tokenizer.match(token) else TextToken)(token, line_number, position)
 
 
 
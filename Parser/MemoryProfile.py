@@ -0,0 +1,213 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# Memory profile
+#
+# CompileMetrics that also account for the memory each stage of a compile takes:
+#
+#   retained        bytes of the objects a stage made, still alive once it's through
+#   by_type         the retained bytes by type. an instance is charged with its own
+#                   __dict__, and with the sets, dicts, lists and strings it holds
+#                   in there, so Tokens, Containers and elements show what they cost whole
+#   peak_growth     how much the stage raised the process's peak resident size
+#                   (0 if it stayed under an earlier peak)
+#
+# and, for the whole compile, the bytes retained per token and per element, and the
+# types retaining the most.
+#
+# the census walks every object the garbage collector tracks, before and after each
+# stage, so profiled compiles are many times slower than others. strings, numbers and
+# other untracked objects are counted through what refers to them.
+#
+
+import gc
+import sys
+import resource
+from contextlib import contextmanager
+
+from Metrics import CompileMetrics
+
+
+#types retaining the most, in the report
+TOP_TYPES = 10
+
+#stages in the order a compile goes through them, for the report
+PIPELINE_STAGES = ('lex', 'som', 'includes', 'components', 'element_tree', 'budget', 'verify', 'processors',
+                   'render', 'snapshot_load', 'snapshot_save')
+
+_HELD_TYPES = (dict, set, frozenset, list, tuple, str, type(u''), bytearray)
+#code, and the profiler's own frames
+_SKIPPED_TYPES = (type, type(sys), type(len), type(lambda: None), type(gc.collect), type(sys._getframe()),
+                  type(x for x in ()))
+
+
+def get_peak_rss():
+    """
+    @return: peak resident size of the process so far, in bytes (linux reports kilobytes)
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def take_census():
+    """
+    @return: ids of all the objects the garbage collector tracks, after a collection
+    """
+    gc.collect()
+    return set(id(obj) for obj in gc.get_objects())
+
+
+def get_held_objects(obj):
+    """
+    @return: the objects an instance holds in its __dict__ (or __slots__), and the
+             __dict__ itself, that are charged to the instance
+    """
+    held = []
+    attributes = getattr(obj, '__dict__', None)
+    if type(attributes) is dict:
+        held.append(attributes)
+        held.extend(value for value in attributes.values() if type(value) in _HELD_TYPES)
+
+    for name in getattr(type(obj), '__slots__', ()):
+        value = getattr(obj, name, None)
+        if type(value) in _HELD_TYPES:
+            held.append(value)
+
+    return held
+
+
+def account(new_objects, known):
+    """
+    @param new_objects: objects a stage made
+    @param known: ids of the objects that were there before (and of the profiler's own)
+    @return: {type name: bytes}
+    """
+    by_type = {}
+    counted = set(known)
+
+    def charge(name, obj):
+        if id(obj) in counted:
+            return
+        counted.add(id(obj))
+        by_type[name] = by_type.get(name, 0) + sys.getsizeof(obj)
+
+        #strings and such aren't tracked, so they are only found through what holds them
+        if type(obj) in (list, tuple, set, frozenset):
+            for item in obj:
+                if not gc.is_tracked(item):
+                    charge(name, item)
+        elif type(obj) is dict:
+            for key, value in obj.items():
+                for item in (key, value):
+                    if not gc.is_tracked(item):
+                        charge(name, item)
+
+    #instances first, so that what they hold is charged to them
+    instances = [obj for obj in new_objects
+                 if type(obj) not in _HELD_TYPES and not isinstance(obj, _SKIPPED_TYPES)]
+    for obj in instances:
+        name = type(obj).__name__
+        charge(name, obj)
+        for held in get_held_objects(obj):
+            charge(name, held)
+
+    for obj in new_objects:
+        if not isinstance(obj, _SKIPPED_TYPES):
+            charge(type(obj).__name__, obj)
+
+    return by_type
+
+
+class MemoryMetrics(CompileMetrics):
+    def __init__(self, source_name):
+        super(MemoryMetrics, self).__init__(source_name)
+
+        self.memory = {}    # stage -> {'retained': bytes, 'peak_growth': bytes, 'by_type': {type: bytes}}
+
+    @contextmanager
+    def stage(self, name):
+        known = take_census()
+        peak = get_peak_rss()
+
+        with super(MemoryMetrics, self).stage(name):
+            yield
+
+        gc.collect()
+        known.update((id(known), id(sys._getframe())))
+        new_objects = [obj for obj in gc.get_objects() if id(obj) not in known]
+        by_type = account(new_objects, known)
+        del new_objects
+
+        usage = self.memory.setdefault(name, {'retained': 0, 'peak_growth': 0, 'by_type': {}})
+        usage['retained'] += sum(by_type.values())
+        usage['peak_growth'] += get_peak_rss() - peak
+        for type_name, size in by_type.items():
+            usage['by_type'][type_name] = usage['by_type'].get(type_name, 0) + size
+
+    def get_summary(self):
+        """
+        @return: bytes per token and per element, and the types retaining the most
+        """
+        retained = {}
+        for usage in self.memory.values():
+            for type_name, size in usage['by_type'].items():
+                retained[type_name] = retained.get(type_name, 0) + size
+
+        tokens = sum(self.tokens.values())
+        elements = sum(self.elements.values())
+        lexed = self.memory.get('lex', {}).get('retained', 0)
+        built = self.memory.get('element_tree', {}).get('retained', 0)
+
+        return {'retained': sum(retained.values()),
+                'bytes_per_token': float(lexed) / tokens if tokens else None,
+                'bytes_per_element': float(built) / elements if elements else None,
+                'top_types': sorted(retained.items(), key=lambda item: -item[1])[:TOP_TYPES]}
+
+    def to_dict(self):
+        metrics = super(MemoryMetrics, self).to_dict()
+        metrics['memory'] = dict(self.memory, summary=self.get_summary())
+        return metrics
+
+
+def format_memory_report(metrics):
+    """
+    @param metrics: MemoryMetrics.to_dict() of a compile
+    @return: the memory profile, as a table
+    """
+    memory = metrics['memory']
+    summary = memory['summary']
+    lines = ["memory: %s" % metrics['source'],
+             "%-14s %14s %14s  %s" % ('stage', 'retained', 'peak growth', 'most retained by')]
+
+    #stages not known to be part of the pipeline go last
+    stages = [stage for stage in memory if stage != 'summary']
+    for name in sorted(stages, key=lambda stage: (PIPELINE_STAGES.index(stage) if stage in PIPELINE_STAGES
+                                                  else len(PIPELINE_STAGES), stage)):
+        usage = memory[name]
+        top = sorted(usage['by_type'].items(), key=lambda item: -item[1])[:3]
+        lines.append("%-14s %14d %14d  %s" % (name, usage['retained'], usage['peak_growth'],
+                                              ', '.join("%s %d" % item for item in top)))
+
+    lines.append("retained in all: %d bytes" % summary['retained'])
+    for label, key in (('per token', 'bytes_per_token'), ('per element', 'bytes_per_element')):
+        if summary[key] is not None:
+            lines.append("%s: %.1f bytes" % (label, summary[key]))
+    lines.extend("  %-24s %12d" % item for item in summary['top_types'])
+
+    return '\n'.join(lines) + '\n'
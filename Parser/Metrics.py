@@ -0,0 +1,222 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# Compile metrics
+#
+# what a compile did, and where its time went, for finding out why a layout is slow:
+#
+#   stages          wall seconds per stage (lex, som, expand, element_tree, verify,
+#                   render, ...), and the CPU seconds the whole process took meanwhile
+#                   (process_cpu). python 2 can't tell the CPU time of one thread, so
+#                   with compiles running on other threads (say, --pipeline) it has
+#                   theirs in it too
+#   tokens          tokens by kind: 'text', 'whitespace', or the delimiter itself
+#   containers      SOM containers by type, after includes and components are expanded
+#   elements        elements by type, and how deep the tree goes
+#   cache           fragment and snapshot cache hits and misses
+#   output_bytes    HTML produced
+#
+# metrics are opt-in. a compile without them (context.metrics is None) pays for a
+# few 'is None' checks, and nothing else.
+#
+
+import io
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+from utils.annotations import overrides
+from SwalpaObjectModel import Container, ContentContainer, ComponentInstance, TextToken
+from ElementProcessors import ElementProcessor
+
+
+#CPU seconds of the process so far (time.clock is CPU time on unix, and is all python 2 has)
+cpu_time = getattr(time, 'process_time', None) or time.clock
+
+
+def get_token_kind(token):
+    if type(token) is TextToken:
+        return 'text'
+
+    text = token.get_token()
+    return 'whitespace' if text.isspace() else text.strip()
+
+
+class CompileMetrics(object):
+    def __init__(self, source_name):
+        self.source_name = source_name
+        self.started = (time.time(), cpu_time())
+        self.stages = {}    # stage -> [wall seconds, process CPU seconds]
+        self.tokens = {}
+        self.containers = {}
+        self.elements = {}
+        self.cache = {}
+        self.max_depth = 0
+        self.output_bytes = 0
+        self.error = None
+
+    @contextmanager
+    def stage(self, name):
+        """
+        times the block as stage name; a stage that runs more than once adds up
+        """
+        wall, cpu = time.time(), cpu_time()
+        try:
+            yield
+        finally:
+            timing = self.stages.setdefault(name, [0.0, 0.0])
+            timing[0] += time.time() - wall
+            timing[1] += cpu_time() - cpu
+
+    @staticmethod
+    def count(counters, key, amount=1):
+        counters[key] = counters.get(key, 0) + amount
+
+    def count_cache(self, name, hit):
+        self.count(self.cache, '%s_%s' % (name, 'hits' if hit else 'misses'))
+
+    def meter_tokens(self, tokens):
+        """
+        generates tokens, counting them by kind
+        """
+        counters = self.tokens
+        for token in tokens:
+            kind = get_token_kind(token)
+            counters[kind] = counters.get(kind, 0) + 1
+            yield token
+
+    def count_containers(self, items, instances=None):
+        """
+        counts the containers in items, and within them. a component instance's
+        containers are counted once, however many times it's used
+        """
+        instances = instances if instances is not None else set()
+
+        for item in items:
+            if type(item) is ComponentInstance:
+                if id(item) not in instances:
+                    instances.add(id(item))
+                    self.count_containers(item.get_contents(), instances)
+            elif isinstance(item, Container):
+                self.count(self.containers, type(item).__name__)
+                if type(item) is ContentContainer:
+                    self.count_containers(item.get_contents(), instances)
+
+    def finish(self, error=None):
+        """
+        stops the clock on the whole compile ('total')
+        @param error: the exception the compile failed with, if it did
+        """
+        self.stages['total'] = [time.time() - self.started[0], cpu_time() - self.started[1]]
+        self.error = type(error).__name__ if error is not None else None
+
+    def to_dict(self):
+        """
+        @return: the metrics, as plain (JSON-able) types
+        """
+        return {'source': self.source_name,
+                'stages': dict((name, {'wall': wall, 'process_cpu': cpu})
+                               for name, (wall, cpu) in self.stages.items()),
+                'tokens': self.tokens,
+                'containers': self.containers,
+                'elements': self.elements,
+                'max_depth': self.max_depth,
+                'cache': self.cache,
+                'output_bytes': self.output_bytes,
+                'error': self.error}
+
+
+class CollectMetrics(ElementProcessor):
+    """
+    counts the elements of a tree by type, and how deep it goes, into CompileMetrics
+    """
+    @overrides(ElementProcessor)
+    def initialize(self):
+        self.metrics = None
+        self.depth = 0
+
+    def set_metrics(self, metrics):
+        self.metrics = metrics
+
+    @overrides(ElementProcessor)
+    def going_deeper(self):
+        self.depth += 1
+        self.metrics.max_depth = max(self.metrics.max_depth, self.depth)
+
+    @overrides(ElementProcessor)
+    def coming_back_up(self):
+        self.depth -= 1
+
+    @overrides(ElementProcessor)
+    def process(self, elem):
+        CompileMetrics.count(self.metrics.elements, type(elem).__name__)
+
+
+def get_sink_size(sink):
+    """
+    @return: bytes that have gone into an OutputSink so far
+    """
+    return sink.bytes_written + len(sink.buffer)
+
+
+class NoStage(object):
+    """
+    stands in for CompileMetrics.stage when there are no metrics to keep
+    """
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_STAGE = NoStage()
+
+
+def time_stage(metrics, name):
+    """
+    with time_stage(context.metrics, 'render'): ... - times the block, if there are metrics
+    """
+    return metrics.stage(name) if metrics is not None else NO_STAGE
+
+
+class JsonLineWriter(object):
+    """
+    a metrics callback writing the metrics of each compile as a line of JSON.
+    lines are appended whole, so processes can share a file
+    @param path: file to append to; '-' for stderr
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def __call__(self, metrics):
+        line = json.dumps(metrics, sort_keys=True) + '\n'
+
+        with self.lock:
+            if self.path == '-':
+                sys.stderr.write(line)
+                sys.stderr.flush()
+                return
+
+            with io.open(self.path, 'ab') as output:
+                output.write(line.encode('utf-8'))
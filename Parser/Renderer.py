@@ -0,0 +1,308 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Renderer
+#
+# the output stage. it runs as a visitor atop a verified ElementTree and emits
+# UTF-8 bytes straight into an OutputSink, so nothing is ever built up as a
+# unicode/str document and encoded at the end.
+#
+
+import io
+import re
+
+from ElementProcessors import ElementProcessor
+from BasicElements import StringElement
+from utils.annotations import overrides
+
+
+text_type = type(u'')
+
+
+def to_utf8(value):
+    """
+    returns the UTF-8 bytes for value
+    @param value: unicode, bytes or anything that str() can handle
+    """
+    if isinstance(value, text_type):
+        return value.encode('utf-8')
+
+    return value if isinstance(value, bytes) else str(value).encode('utf-8')
+
+
+_quoted_regex = re.compile(r"""^(["'])(.*)\1$""", re.DOTALL)
+_backslash_escape_regex = re.compile(r"\\(.)", re.DOTALL)
+
+
+def unquote(value):
+    """
+    strips the quotes that StringContainer puts around strings, and
+    resolves the backslash escapes inside them.
+    unquoted values are returned as they are
+    """
+    matches = _quoted_regex.match(value)
+    if not matches:
+        return value
+
+    return _backslash_escape_regex.sub(r"\1", matches.group(2))
+
+
+_escapable_regex = re.compile(br'[&<>"]')
+_html_escapes = {b'&': b'&amp;', b'<': b'&lt;', b'>': b'&gt;', b'"': b'&quot;'}
+
+
+def escape_html(value):
+    """
+    HTML-escapes value and returns it as UTF-8 bytes.
+    most of the text in a swalpa file needs no escaping at all, so the
+    common case is a single regex scan, with no copying
+    """
+    value = to_utf8(value)
+
+    if _escapable_regex.search(value) is None:
+        return value
+
+    return _escapable_regex.sub(lambda m: _html_escapes[m.group()], value)
+
+
+########## Output sink ############
+
+
+class OutputSink(object):
+    """
+    collects rendered fragments in one bytearray and hands them over to
+    the underlying binary stream in large chunks.
+
+    without a stream, everything stays in the buffer and can be collected
+    with getvalue()
+    """
+    DEFAULT_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, stream=None, chunk_size=DEFAULT_CHUNK_SIZE, owns_stream=False):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        #whether closing the sink closes the stream too
+        self.owns_stream = owns_stream
+        self.buffer = bytearray()
+        self.bytes_written = 0
+
+    @classmethod
+    def open(cls, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        returns a sink writing to file at path through an io.BufferedWriter.
+        the sink owns the file, and closes it when it is closed
+        """
+        return cls(io.open(path, 'wb', buffering=chunk_size), chunk_size, owns_stream=True)
+
+    def write(self, *fragments):
+        """
+        appends all fragments to the buffer, flushing it if it has grown
+        beyond the chunk size
+        @param fragments: bytes fragments, in the order they are to be written
+        """
+        for fragment in fragments:
+            self.buffer += fragment
+
+        if self.stream is not None and len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.stream is None or not self.buffer:
+            return
+
+        self.stream.write(self.buffer)
+        self.bytes_written += len(self.buffer)
+        del self.buffer[:]
+
+    def close(self):
+        self.flush()
+
+        if self.stream is None:
+            return
+
+        if self.owns_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+    def getvalue(self):
+        return bytes(self.buffer)
+
+    def spawn(self):
+        """
+        @return: a fresh in-memory sink, for output rendered on the side
+        """
+        return OutputSink()
+
+
+########## HTML renderer ############
+
+
+class TagFragments(object):
+    """
+    pre-encoded static fragments of the HTML tag of an element class
+    """
+    def __init__(self, elementcls):
+        tag = to_utf8(elementcls.html_tag)
+
+        self.begin = b'<' + tag
+        self.end = b'' if elementcls.html_void else b'</' + tag + b'>'
+
+
+#fragments are per element class and never change, so they are shared across renders
+_tag_fragments_cache = {}
+_attribute_fragments_cache = {}
+
+_ID_ATTRIBUTE = b' id="'
+_CLASS_ATTRIBUTE = b' class="'
+_ATTRIBUTE_END = b'"'
+_TAG_END = b'>'
+
+
+def get_tag_fragments(elementcls):
+    try:
+        return _tag_fragments_cache[elementcls]
+    except KeyError:
+        return _tag_fragments_cache.setdefault(elementcls, TagFragments(elementcls))
+
+
+def get_attribute_fragment(name):
+    """
+    returns the pre-encoded ' name="' fragment for an attribute name
+    """
+    try:
+        return _attribute_fragments_cache[name]
+    except KeyError:
+        return _attribute_fragments_cache.setdefault(name, b' ' + escape_html(name) + b'="')
+
+
+class HtmlRenderer(ElementProcessor):
+    """
+    renders the element tree to HTML
+
+    an element's end tag can only be written once its children are through.
+    the visitor protocol doesn't announce leaf elements ending, so the last
+    visited element is kept pending until we know whether it has children
+
+    components are rendered once for every element tree they share; later uses
+    just copy the HTML over
+    """
+    @overrides(ElementProcessor)
+    def initialize(self):
+        self.sink = OutputSink()
+        self.open_elements = []
+        self.pending_element = None
+
+        self.component_sinks = []
+        self.component_output = {}  # id(shared element tree) -> (element tree, HTML)
+
+    def set_sink(self, sink):
+        """
+        sets the OutputSink the HTML goes into. needs to be done before the visit
+        """
+        self.sink = sink
+
+    @overrides(ElementProcessor)
+    def entering_component(self, component):
+        self.close_pending_element()
+
+        rendered = self.component_output.get(id(component.get_child_element_tree()))
+        if rendered is not None:
+            self.sink.write(rendered[1])
+            return True
+
+        #render the component on the side, to keep its HTML for the next use
+        self.component_sinks.append(self.sink)
+        self.sink = self.sink.spawn()
+        return False
+
+    @overrides(ElementProcessor)
+    def leaving_component(self, component):
+        self.close_pending_element()
+
+        rendered = self.sink.getvalue()
+        self.component_output[id(component.get_child_element_tree())] = (component.get_child_element_tree(), rendered)
+
+        self.sink = self.component_sinks.pop()
+        self.sink.write(rendered)
+
+    @overrides(ElementProcessor)
+    def going_deeper(self):
+        self.open_elements.append(self.pending_element)
+        self.pending_element = None
+
+    @overrides(ElementProcessor)
+    def coming_back_up(self):
+        self.close_pending_element()
+        self.write_end_tag(self.open_elements.pop())
+
+    @overrides(ElementProcessor)
+    def process(self, elem):
+        self.close_pending_element()
+
+        if type(elem) is StringElement:
+            self.sink.write(escape_html(unquote(elem.content)))
+            return
+
+        self.write_begin_tag(elem)
+        self.pending_element = elem
+
+    def write_begin_tag(self, elem):
+        write = self.sink.write
+        write(get_tag_fragments(type(elem)).begin)
+
+        if elem.element_id:
+            write(_ID_ATTRIBUTE, escape_html(elem.element_id.lstrip('#')), _ATTRIBUTE_END)
+
+        #sorted, so that the output is stable from one compile to the next
+        if elem.classes:
+            write(_CLASS_ATTRIBUTE, escape_html(' '.join(sorted(elem.classes))), _ATTRIBUTE_END)
+
+        for name in sorted(elem.properties):
+            write(get_attribute_fragment(name), escape_html(unquote(elem.properties[name])), _ATTRIBUTE_END)
+
+        write(_TAG_END)
+
+    def write_end_tag(self, elem):
+        self.sink.write(get_tag_fragments(type(elem)).end)
+
+    def close_pending_element(self):
+        if self.pending_element is not None:
+            self.write_end_tag(self.pending_element)
+            self.pending_element = None
+
+    def finish(self, close=True):
+        """
+        closes whatever is still open, and flushes the sink
+        @param close: False to only flush the sink, and leave it open for more HTML
+        @return: the OutputSink holding (or having written) the HTML
+        """
+        self.close_pending_element()
+
+        while self.open_elements:
+            self.write_end_tag(self.open_elements.pop())
+
+        if close:
+            self.sink.close()
+        else:
+            self.sink.flush()
+        return self.sink
@@ -0,0 +1,134 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Subtree selection
+#
+# finds the subtree rooted at a given element ID ('#file.new') or element type path
+# ('navbar/menu') by looking at the SOM alone. no element is constructed on the way;
+# the parentage is known by element classes, which is all that parent validation
+# and parent specific configuration need
+#
+
+import re
+
+from BasicElements import UnknownElementError
+from SwalpaObjectModel import TextToken, DelimiterToken
+from SwalpaObjectModel import ClassContainer, ContentContainer, StringContainer, ComponentInstance
+from ElementTree import elementFactory
+
+
+class SubtreeSelector(object):
+    """
+    @param selector: '#id' to select the element with that ID, or a '/' separated
+                     path of element names from the top level to select all elements
+                     at that path
+    """
+    def __init__(self, selector, element_fac=elementFactory):
+        self.selector = selector
+        self.elementFactory = element_fac
+
+        if selector.startswith('#'):
+            self.element_id = selector
+            self.path = None
+        else:
+            self.element_id = None
+            self.path = [name for name in selector.split('/') if name]
+
+    def select(self, items):
+        """
+        generates (parentage, item_group) for every selected element, in document order
+        @param items: contents of the SOM root
+        @return: parentage is the list of parent element classes, outermost first.
+                 item_group is the list of SOM items that make up the element
+                 (can be passed on to ElementTree as it is)
+        """
+        return self.select_from(items, [])
+
+    def select_from(self, items, parentage):
+        depth = len(parentage)
+
+        for group in self.split_item_groups(items):
+            if type(group[0]) is not TextToken:
+                continue
+
+            name = group[0].get_contents()
+            contents = [item for item in group if type(item) is ContentContainer]
+
+            if self.element_id is not None:
+                if self.element_id == self.get_id(group):
+                    yield parentage, group
+                    continue
+            elif name == self.path[depth]:
+                if depth + 1 == len(self.path):
+                    yield parentage, group
+                    continue
+            else:
+                #not on the path, nothing below can be on it either
+                continue
+
+            if contents and contents[0].get_contents():
+                for selected in self.select_from(contents[0].get_contents(),
+                                                 parentage + [self.get_element_class(name)]):
+                    yield selected
+
+    def get_element_class(self, name):
+        try:
+            return self.elementFactory.ElementsCache[name]
+        except KeyError:
+            raise UnknownElementError(name)
+
+    @staticmethod
+    def get_id(group):
+        """
+        @return: ID the element made of group gets, None if it gets none.
+                 same as ComplexElement.parse_classes, the last ID wins
+        """
+        ids = [cls for item in group if type(item) is ClassContainer
+               for cls in item.get_contents() if re.match(r"#[\w]+", cls)]
+
+        return ids[-1] if ids else None
+
+    @staticmethod
+    def split_item_groups(items):
+        """
+        splits items of a ContentContainer into per-element groups. an element
+        starts with its name (or string, or component) and runs till its '{ ... }',
+        a ';' or the start of the next element
+        """
+        group = []
+
+        for item in items:
+            if type(item) is TextToken or type(item) is StringContainer or type(item) is ComponentInstance:
+                if group:
+                    yield group
+                group = [item]
+            elif type(item) is DelimiterToken and not group:
+                continue
+            else:
+                group.append(item)
+
+            if type(item) is ContentContainer or (type(item) is DelimiterToken and item.get_token() == ';'):
+                yield group
+                group = []
+
+        if group:
+            yield group
@@ -80,10 +80,11 @@ class InvalidClassError(SwalpaException):
 ############# Tokens ###############
 
 class Token(object):
-    def __init__(self, token, line_no):
+    def __init__(self, token, line_no, position=-1):
         self.token = token
         self.default_container = None
         self.line_number = line_no
+        self.position = position    # index of the token among the tokens of its line
 
     def get_token(self):
         return self.token
@@ -154,6 +155,7 @@ class ContainerFactory(object):
                 container = value()
                 container.CONTAINER_START = symbol_or_token.get_token()
                 container.container_start_line_number = symbol_or_token.get_line_number()
+                container.container_start_position = symbol_or_token.position
 
                 return container
 
@@ -182,6 +184,8 @@ class Container(object):
 
         self.CONTAINER_START = None     # to be set by ContainerFactory when initializing the container
         self.container_start_line_number = -1 # where does the container start
+        self.container_start_position = -1    # and which token of that line starts it
+        self.container_end_line_number = -1   # where does the container end
         self.terminator_token = "\W"    # needs to be specified by derived classes
         self.__is_terminated = False    # will be set to true when a terminator token is received
 
@@ -232,6 +236,7 @@ class Container(object):
                 raise InvalidTokenInContainer(token, self)
 
             if self.is_terminator(token):
+                self.container_end_line_number = token.get_line_number()
                 raise ContainerTerminated
 
             self.append_child(token)
@@ -274,6 +279,9 @@ class Container(object):
     def get_line_number(self):
         return self.container_start_line_number
 
+    def get_end_line_number(self):
+        return self.container_end_line_number
+
 
 @container
 class StringContainer(Container):
@@ -296,6 +304,7 @@ class StringContainer(Container):
         anything and eveything is part of the string until we hit the terminator ["']
         """
         if self.is_terminator(token):
+            self.container_end_line_number = token.get_line_number()
             raise ContainerTerminated
 
         if self.is_ignored_token(token):
@@ -432,6 +441,31 @@ class ContentContainer(Container):
         return self.children
 
 
+class ComponentInstance(object):
+    """
+    a component put to use, with one set of arguments. it replaces the 'use'
+    directive in the SOM (see Components), and carries the component body with
+    the arguments substituted in. all uses with the same arguments share one instance
+    """
+    def __init__(self, name, arguments, items, line_number):
+        self.name = name
+        self.arguments = arguments
+        self.items = items
+        self.line_number = line_number
+
+        #element trees built out of items, by parent element type (filled in by ElementTree)
+        self.element_trees = {}
+
+    def get_contents(self):
+        return self.items
+
+    def get_line_number(self):
+        return self.line_number
+
+    def __str__(self):
+        return " <%s %s> " % (self.name, ', '.join("%s: %s" % arg for arg in self.arguments))
+
+
 ############# Swalpa Object Model Builder ###############
 
 class SOMBuilder:
@@ -441,6 +475,7 @@ class SOMBuilder:
     """
     def __init__(self, container_fac=container_factory):
         self.containerFactory = container_fac
+        self.complete = False   # set once the root container gets terminated
 
         # a little convoluted way of getting SOMRoot element from container factory, but
         # worth it, since container factory can have logic on top of just creating an object
@@ -460,4 +495,6 @@ class SOMBuilder:
         try:
             self.SOMroot.digest_token(token)
         except ContainerTerminated:
-            print("debug: SOMBuilder complete. File syntax verified. Mandal aabhari aahe.")
+            #only happens when the root is fed its own '}' (see IncrementalDocument); the
+            #flag is all the caller needs, nothing is printed, as this runs on every edit
+            self.complete = True
@@ -0,0 +1,191 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# Tree diffing
+#
+# compares two verified element trees of the same layout, and tells the changes as a
+# list of DOM patches, for a client (see PATCH_CLIENT_SCRIPT) to apply to the HTML it
+# already has, instead of reloading all of it:
+#
+#   {"op": "insert", "path": [0, 2], "html": "<li>..</li>"}
+#   {"op": "remove", "path": [0, 3]}
+#   {"op": "attributes", "path": [0], "set": {"class": "a b"}, "remove": ["href"]}
+#   {"op": "text", "path": [0, 1, 0], "text": "..."}
+#
+# a path is the index of the node among its parent's child nodes, from the top, below
+# the element the HTML was rendered into. patches are applied in order, and each path
+# is as the document is by then.
+#
+# siblings are paired up on their element type and ID, in order; an element that doesn't
+# pair up is removed, or inserted whole
+#
+
+from difflib import SequenceMatcher
+
+from BasicElements import StringElement, ComplexElement
+from CompactElementTree import CompactElementTree
+from Renderer import HtmlRenderer, OutputSink, unquote, escape_html
+
+
+class PatchNode(object):
+    """
+    what the diff needs to know of a DOM node, as the element renders it.
+    text nodes have a tag of None
+    """
+    __slots__ = ('tag', 'element_id', 'attributes', 'text', 'children', 'element')
+
+    def __init__(self, tag, element_id=None, attributes=None, text=None, children=(), element=None):
+        self.tag = tag
+        self.element_id = element_id
+        self.attributes = attributes
+        self.text = text
+        self.children = children
+        self.element = element
+
+    def get_key(self):
+        return self.tag, self.element_id
+
+    def to_html(self):
+        if self.tag is None:
+            return escape_html(self.text).decode('utf-8')
+
+        renderer = HtmlRenderer()
+        renderer.set_sink(OutputSink())
+        self.element.grant_visit(renderer)
+        return renderer.finish().getvalue().decode('utf-8')
+
+
+def to_text(value):
+    return value if isinstance(value, type(u'')) else value.decode('utf-8')
+
+
+def get_attributes(elem):
+    """
+    @return: {name: value} of the attributes the element renders with
+    """
+    attributes = dict((to_text(name), to_text(unquote(value))) for name, value in elem.properties.items())
+
+    if elem.element_id:
+        attributes[u'id'] = to_text(elem.element_id.lstrip('#'))
+    if elem.classes:
+        attributes[u'class'] = to_text(' '.join(sorted(elem.classes)))
+
+    return attributes
+
+
+def snapshot_nodes(elements):
+    """
+    @param elements: root elements of a verified ElementTree (or CompactElementTree)
+    @return: list of PatchNodes for the DOM nodes that the elements render to. as in the
+             DOM, adjacent strings are one text node, and empty strings are none
+    """
+    nodes = []
+
+    for elem in CompactElementTree.flatten_components(elements):
+        if type(elem) is StringElement:
+            text = to_text(unquote(elem.content))
+            if not text:
+                continue
+            if nodes and nodes[-1].tag is None:
+                nodes[-1].text += text
+            else:
+                nodes.append(PatchNode(None, text=text))
+            continue
+
+        children = elem.get_child_element_tree() if isinstance(elem, ComplexElement) else None
+        nodes.append(PatchNode(type(elem).html_tag, elem.element_id, get_attributes(elem),
+                               children=snapshot_nodes(children or []), element=elem))
+
+    return nodes
+
+
+def diff_nodes(old_nodes, new_nodes, path=(), patches=None):
+    """
+    @param old_nodes, new_nodes: lists of PatchNodes (see snapshot_nodes)
+    @return: list of patches that turn old_nodes into new_nodes
+    """
+    patches = patches if patches is not None else []
+
+    matcher = SequenceMatcher(None, [node.get_key() for node in old_nodes],
+                              [node.get_key() for node in new_nodes], autojunk=False)
+
+    #everything before new index j is through by the time the opcode at j is reached,
+    #so old nodes still to be dealt with are at j onwards
+    for opcode, i1, i2, j1, j2 in matcher.get_opcodes():
+        if opcode == 'equal':
+            for offset in range(i2 - i1):
+                diff_node(old_nodes[i1 + offset], new_nodes[j1 + offset], path + (j1 + offset,), patches)
+            continue
+
+        for _ in range(i2 - i1):
+            patches.append({'op': 'remove', 'path': list(path + (j1,))})
+        for j in range(j1, j2):
+            patches.append({'op': 'insert', 'path': list(path + (j,)), 'html': new_nodes[j].to_html()})
+
+    return patches
+
+
+def diff_node(old, new, path, patches):
+    if old.tag is None:
+        if old.text != new.text:
+            patches.append({'op': 'text', 'path': list(path), 'text': new.text})
+        return
+
+    changed = dict((name, value) for name, value in new.attributes.items() if old.attributes.get(name) != value)
+    removed = sorted(name for name in old.attributes if name not in new.attributes)
+    if changed or removed:
+        patches.append({'op': 'attributes', 'path': list(path), 'set': changed, 'remove': removed})
+
+    diff_nodes(old.children, new.children, path, patches)
+
+
+def diff_trees(old_elements, new_elements):
+    """
+    @param old_elements, new_elements: root elements of the verified trees
+    @return: list of patches that turn the HTML of the old tree into that of the new one
+    """
+    return diff_nodes(snapshot_nodes(old_elements), snapshot_nodes(new_elements))
+
+
+#applies a list of patches to the children of root: applyPatches(root, patches)
+PATCH_CLIENT_SCRIPT = r"""
+function applyPatches(root, patches) {
+    patches.forEach(function (patch) {
+        var parent = root, path = patch.path;
+        for (var i = 0; i < path.length - 1; i++) {
+            parent = parent.childNodes[path[i]];
+        }
+        var index = path[path.length - 1], node = parent.childNodes[index];
+
+        if (patch.op === 'insert') {
+            var template = document.createElement('template');
+            template.innerHTML = patch.html;
+            parent.insertBefore(template.content, node || null);
+        } else if (patch.op === 'remove') {
+            parent.removeChild(node);
+        } else if (patch.op === 'text') {
+            node.nodeValue = patch.text;
+        } else if (patch.op === 'attributes') {
+            Object.keys(patch.set).forEach(function (name) { node.setAttribute(name, patch.set[name]); });
+            patch.remove.forEach(function (name) { node.removeAttribute(name); });
+        }
+    });
+}
+"""
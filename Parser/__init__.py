@@ -22,4 +22,16 @@
 from Lexer import Lexer
 from SwalpaObjectModel import SOMBuilder
 from ElementTree import ElementTree
-import ElementProcessors
\ No newline at end of file
+from CompactElementTree import CompactElementTree
+import ElementProcessors
+from Renderer import HtmlRenderer, OutputSink
+from SubtreeSelector import SubtreeSelector
+from Includes import FragmentCache
+from Components import ComponentRegistry
+from CompileContext import CompileContext
+from Budget import CompileBudget, BudgetExceeded
+from TreeDiff import diff_trees, snapshot_nodes
+from Metrics import CompileMetrics
+from MemoryProfile import MemoryMetrics
+from IncrementalParser import IncrementalDocument
+from EventStream import SwalpaEventStream, SwalpaEventHandler, stream_events
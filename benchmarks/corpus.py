@@ -0,0 +1,250 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# Synthetic corpus
+#
+#   python benchmarks/corpus.py [-s seed] [-n size] [-o directory] [shape ...]
+#
+# generates swalpa layouts out of the real element set, in a handful of shapes that
+# stress different parts of the compiler:
+#
+#   wide        one navbar with a very long menu
+#   deep        menus nested in menus, many levels down
+#   strings     long strings, full of escapes and characters HTML needs escaped
+#   properties  elements with many IDs, classes and properties
+#   components  layouts made mostly of component uses
+#   mixed       a bit of everything, as real navbars are
+#
+# the same seed and size always generate the same layouts, so timings taken on them
+# can be compared from one run (or one change) to the next.
+#
+
+import os
+import sys
+import random
+from optparse import OptionParser
+
+
+SHAPES = ('wide', 'deep', 'strings', 'properties', 'components', 'mixed')
+
+DEFAULT_SEED = 1
+DEFAULT_SIZE = 400
+
+#levels in one stack of the deep shape; visits recurse about twice per level
+DEEP_LEVELS = 40
+
+_WORDS = ('home', 'about', 'blog', 'news', 'contact', 'search', 'profile', 'settings', 'help', 'docs',
+          'pricing', 'team', 'careers', 'archive', 'login', 'logout', 'admin', 'feed', 'tags', 'faq')
+
+
+class LayoutWriter(object):
+    """
+    puts a layout together, a line at a time, with the indentation kept track of
+    """
+    def __init__(self, rng):
+        self.rng = rng
+        self.lines = []
+        self.depth = 0
+
+    def line(self, text):
+        self.lines.append('    ' * self.depth + text + '\n')
+
+    def open(self, text):
+        self.line(text + ' {')
+        self.depth += 1
+
+    def close(self):
+        self.depth -= 1
+        self.line('}')
+
+    def word(self):
+        return self.rng.choice(_WORDS)
+
+    def url(self):
+        return 'http://%s.example.com/%s/%d' % (self.word(), self.word(), self.rng.randint(0, 999))
+
+    def text(self, length=1):
+        return ' '.join(self.word().capitalize() for _ in range(length))
+
+    def getvalue(self):
+        return ''.join(self.lines)
+
+    def header(self):
+        self.open('header')
+        self.open('branding ["%s"]' % self.url())
+        self.line('"%s";' % self.text(2))
+        self.line('img [images/%s.png]' % self.word())
+        self.close()
+        self.line('toggle (pull-left) [navbar-collapse] { }')
+        self.close()
+
+    def link(self, index):
+        self.line('link(#%s%d %s) [%s] { "%s" }' % (self.word(), index, self.word(), self.url(), self.text()))
+
+    def search_form(self, index):
+        self.open('form (navbar-left) [role: "search"]')
+        self.line('textbox(#q%d form-control) [placeholder: "%s"];' % (index, self.text(2)))
+        self.line('submit_button { "Go" }')
+        self.close()
+
+    def menu_entry(self, index):
+        choice = self.rng.random()
+        if choice < 0.5:
+            self.link(index)
+        elif choice < 0.7:
+            self.line('menuitem [%s] { "%s" }' % (self.url(), self.text()))
+        elif choice < 0.85:
+            self.line('divider;')
+        elif choice < 0.95:
+            self.open('link [%s]' % self.url())
+            self.line('"%s";' % self.text())
+            self.line('img [http://placehold.it/%dx%d]' % (self.rng.randint(10, 99), self.rng.randint(10, 99)))
+            self.close()
+        else:
+            self.search_form(index)
+
+
+def wide(writer, size):
+    writer.open('navbar')
+    writer.header()
+    writer.open('menu (navbar-collapse)')
+    for index in range(size * 4):
+        writer.menu_entry(index)
+    writer.close()
+    writer.close()
+
+
+def deep(writer, size):
+    for stack in range(max(1, size // 10)):
+        writer.open('navbar')
+        for level in range(DEEP_LEVELS):
+            writer.open('menu (level%d)' % level)
+            writer.line('menuitem [%s] { "%s" }' % (writer.url(), writer.text()))
+        writer.link(stack)
+        for level in range(DEEP_LEVELS):
+            writer.close()
+        writer.close()
+
+
+def strings(writer, size):
+    specials = ('<b>', '&amp;', '"', "'", '>', '\\\\')
+
+    writer.open('navbar')
+    writer.open('menu')
+    for index in range(size):
+        pieces = [writer.text(writer.rng.randint(4, 20))]
+        for _ in range(writer.rng.randint(1, 6)):
+            special = writer.rng.choice(specials)
+            pieces.append('\\"' if special == '"' else special)
+            pieces.append(writer.text(writer.rng.randint(1, 8)))
+        writer.line('menuitem [%s] { "%s" }' % (writer.url(), ' '.join(pieces)))
+    writer.close()
+    writer.close()
+
+
+def properties(writer, size):
+    writer.open('navbar')
+    writer.open('menu')
+    for index in range(size):
+        classes = ' '.join('%s-%d' % (writer.word(), n) for n in range(writer.rng.randint(2, 8)))
+        props = ', '.join('data_%s%d: "%s"' % (writer.word(), n, writer.text()) for n in range(writer.rng.randint(2, 8)))
+        writer.line('link(#item%d %s) [%s] [%s] { "%s" }' % (index, classes, writer.url(), props, writer.text()))
+    writer.close()
+    writer.close()
+
+
+def components(writer, size):
+    writer.open('component [search_form]')
+    writer.open('form (navbar-left) [role: "search"]')
+    writer.line('textbox (#$id form-control) [placeholder: $placeholder];')
+    writer.line('submit_button { $label }')
+    writer.close()
+    writer.close()
+    writer.line('component [item] { menuitem [$href] { $text } }')
+
+    for block in range(max(1, size // 20)):
+        writer.open('navbar')
+        writer.open('menu (navbar-collapse)')
+        for index in range(20):
+            if writer.rng.random() < 0.8:
+                writer.line('use [item, href: "%s", text: "%s"]' % (writer.url(), writer.text()))
+            else:
+                writer.line('use [search_form] [id: s%d_%d, placeholder: "%s", label: "Go"]'
+                            % (block, index, writer.text(2)))
+        writer.close()
+        writer.close()
+
+
+def mixed(writer, size):
+    for block in range(max(1, size // 20)):
+        writer.open('navbar')
+        writer.header()
+        for menu in range(writer.rng.randint(1, 3)):
+            writer.open('menu (navbar-collapse navbar-%s) ["%s"]' % (writer.word(), writer.text()))
+            for index in range(writer.rng.randint(4, 12)):
+                writer.menu_entry(block * 100 + index)
+            writer.close()
+        writer.line('menuitem [%s] { "%s" }' % (writer.url(), writer.text()))
+        writer.close()
+
+
+def generate(shape, size=DEFAULT_SIZE, seed=DEFAULT_SEED):
+    """
+    @param shape: one of SHAPES
+    @param size: how big a layout; about the number of elements, in hundreds of lines
+    @return: swalpa source of the layout
+    """
+    if shape not in SHAPES:
+        raise ValueError("unknown shape '%s' (known: %s)" % (shape, ', '.join(SHAPES)))
+
+    #seeded per shape, so a shape's layout doesn't depend on which others are generated
+    writer = LayoutWriter(random.Random('%s:%s:%d' % (seed, shape, size)))
+    globals()[shape](writer, size)
+    return writer.getvalue()
+
+
+def main():
+    parser = OptionParser(usage="usage: %prog [options] [shape ...]")
+    parser.add_option("-s", "--seed", dest="seed", type="int", default=DEFAULT_SEED)
+    parser.add_option("-n", "--size", dest="size", type="int", default=DEFAULT_SIZE)
+    parser.add_option("-o", "--output", dest="output_dir",
+                      help="write the layouts as <shape>.swalpa into this directory, instead of to stdout")
+    cmd_opts, cmd_args = parser.parse_args()
+
+    for shape in cmd_args or SHAPES:
+        try:
+            source = generate(shape, cmd_opts.size, cmd_opts.seed)
+        except ValueError as e:
+            parser.error(str(e))
+
+        if cmd_opts.output_dir is None:
+            sys.stdout.write(source)
+            continue
+
+        if not os.path.isdir(cmd_opts.output_dir):
+            os.makedirs(cmd_opts.output_dir)
+        with open(os.path.join(cmd_opts.output_dir, shape + '.swalpa'), 'w') as output:
+            output.write(source)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
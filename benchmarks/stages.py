@@ -0,0 +1,223 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# Per stage benchmark
+#
+#   python benchmarks/stages.py [-s seed] [-n size] [-r repeat] [-o results.json]
+#                               [--baseline baseline.json] [--threshold 0.1] [shape ...]
+#
+# compiles each shape of the synthetic corpus (see corpus.py) a stage at a time, and
+# times every stage on its own: lexing, SOM building, include and component expansion,
+# ElementTree construction, each of the visitors, and rendering.
+#
+# the results go out as JSON (stdout, or the -o file), and as a table on stderr. given a
+# baseline (the JSON of an earlier run, with the same seed and size), every stage is
+# compared to it, and the run fails if any got slower by more than the threshold. the
+# comparison is of the fastest runs - the others are as slow as whatever else the
+# machine was doing made them.
+#
+
+from __future__ import print_function
+
+import os
+import gc
+import sys
+import json
+import platform
+from timeit import default_timer
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Orchestrator import Compiler
+from Parser import Lexer, SOMBuilder, ElementTree, OutputSink, HtmlRenderer
+from Parser.SwalpaObjectModel import container_factory
+from Parser.ElementProcessors import VerifyParentageAndConfigure, CollectElementTypes
+from corpus import SHAPES, DEFAULT_SEED, DEFAULT_SIZE, generate
+
+
+RESULTS_VERSION = 1
+
+STAGES = ('lex', 'som', 'expand', 'element_tree', 'verify', 'collect_types', 'render')
+
+#stages faster than this (seconds) are too close to the timer's noise to call regressions
+NOISE_FLOOR = 0.001
+
+
+def run_stages(compiler, lines):
+    """
+    compiles lines once, a stage at a time
+    @return: ({stage: seconds}, {count: value})
+    """
+    timings = {}
+    context = compiler.new_context('<%s>' % __name__)
+
+    start = default_timer()
+    tokens = list(Lexer().tokenize_lines(lines))
+    timings['lex'] = default_timer() - start
+
+    start = default_timer()
+    somBuilder = SOMBuilder(container_factory)
+    for token in tokens:
+        somBuilder.process_token(token)
+    som_root = somBuilder.get_root_element()
+    timings['som'] = default_timer() - start
+
+    start = default_timer()
+    items = compiler.expand_som(context, som_root).get_contents()
+    timings['expand'] = default_timer() - start
+
+    start = default_timer()
+    elementTree = ElementTree(items)
+    timings['element_tree'] = default_timer() - start
+
+    for stage, processor in (('verify', VerifyParentageAndConfigure()), ('collect_types', CollectElementTypes())):
+        start = default_timer()
+        elementTree.grant_visit(processor)
+        timings[stage] = default_timer() - start
+
+    start = default_timer()
+    renderer = HtmlRenderer()
+    renderer.set_sink(OutputSink())
+    elementTree.grant_visit(renderer)
+    output = renderer.finish().getvalue()
+    timings['render'] = default_timer() - start
+
+    return timings, {'tokens': len(tokens), 'output_bytes': len(output)}
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def benchmark_shape(compiler, source, repeat):
+    lines = source.splitlines(True)
+    runs = []
+
+    for _ in range(repeat):
+        #garbage from the run before isn't this run's to collect
+        gc.collect()
+        timings, counts = run_stages(compiler, lines)
+        runs.append(timings)
+
+    stages = dict((stage, {'min': min(run[stage] for run in runs), 'median': median([run[stage] for run in runs])})
+                  for stage in STAGES)
+    total = [sum(run.values()) for run in runs]
+    stages['total'] = {'min': min(total), 'median': median(total)}
+
+    return dict(counts, lines=len(lines), bytes=len(source), stages=stages)
+
+
+def compare(results, baseline, threshold):
+    """
+    @return: list of (shape, stage, baseline min, min, change), and the list of
+             those that count as regressions
+    """
+    rows = []
+    regressions = []
+
+    for shape, result in sorted(results['shapes'].items()):
+        base_result = baseline['shapes'].get(shape)
+        if base_result is None:
+            continue
+
+        for stage in STAGES + ('total',):
+            before = base_result['stages'][stage]['min']
+            after = result['stages'][stage]['min']
+            change = (after - before) / before if before else 0.0
+            rows.append((shape, stage, before, after, change))
+
+            if change > threshold and after - before > NOISE_FLOOR:
+                regressions.append(rows[-1])
+
+    return rows, regressions
+
+
+def print_table(results, stream):
+    print("%-12s %-14s %12s %12s" % ('shape', 'stage', 'median ms', 'min ms'), file=stream)
+    for shape, result in sorted(results['shapes'].items()):
+        for stage in STAGES + ('total',):
+            timing = result['stages'][stage]
+            print("%-12s %-14s %12.3f %12.3f" % (shape, stage, timing['median'] * 1000, timing['min'] * 1000),
+                  file=stream)
+
+
+def print_comparison(rows, regressions, stream):
+    print("%-12s %-14s %12s %12s %8s" % ('shape', 'stage', 'baseline ms', 'min ms', 'change'), file=stream)
+    for row in rows:
+        shape, stage, before, after, change = row
+        print("%-12s %-14s %12.3f %12.3f %+7.1f%%%s" % (shape, stage, before * 1000, after * 1000, change * 100,
+                                                         '  REGRESSION' if row in regressions else ''), file=stream)
+
+
+def main():
+    parser = OptionParser(usage="usage: %prog [options] [shape ...]")
+    parser.add_option("-s", "--seed", dest="seed", type="int", default=DEFAULT_SEED)
+    parser.add_option("-n", "--size", dest="size", type="int", default=DEFAULT_SIZE)
+    parser.add_option("-r", "--repeat", dest="repeat", type="int", default=5,
+                      help="compiles per shape; the medians and minimums are over these")
+    parser.add_option("-o", "--output", dest="output", help="write the results JSON here, instead of stdout")
+    parser.add_option("--baseline", dest="baseline", help="results JSON of an earlier run to compare with")
+    parser.add_option("--threshold", dest="threshold", type="float", default=0.1,
+                      help="slowdown (a fraction of the baseline) that counts as a regression")
+    cmd_opts, cmd_args = parser.parse_args()
+
+    shapes = cmd_args or list(SHAPES)
+    unknown = [shape for shape in shapes if shape not in SHAPES]
+    if unknown:
+        parser.error("unknown shape(s): %s (known: %s)" % (', '.join(unknown), ', '.join(SHAPES)))
+
+    baseline = None
+    if cmd_opts.baseline:
+        with open(cmd_opts.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if (baseline.get('version'), baseline.get('seed'), baseline.get('size')) != \
+                (RESULTS_VERSION, cmd_opts.seed, cmd_opts.size):
+            parser.error("baseline is of another version, seed or size; it can't be compared with")
+
+    compiler = Compiler()
+    results = {'version': RESULTS_VERSION, 'seed': cmd_opts.seed, 'size': cmd_opts.size, 'repeat': cmd_opts.repeat,
+               'python': platform.python_version(), 'shapes': {}}
+
+    for shape in shapes:
+        results['shapes'][shape] = benchmark_shape(compiler, generate(shape, cmd_opts.size, cmd_opts.seed),
+                                                   cmd_opts.repeat)
+
+    data = json.dumps(results, indent=1, sort_keys=True)
+    if cmd_opts.output:
+        with open(cmd_opts.output, 'w') as output:
+            output.write(data + '\n')
+    else:
+        print(data)
+
+    if baseline is None:
+        print_table(results, sys.stderr)
+        return 0
+
+    rows, regressions = compare(results, baseline, cmd_opts.threshold)
+    print_comparison(rows, regressions, sys.stderr)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+from __future__ import print_function
+
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Thread scaling benchmark
+#
+#   python benchmarks/thread_scaling.py [-n compiles] [-t 1,2,4,8] [source.swalpa ...]
+#
+# compiles the sources (or a built-in layout) over and over with one Compiler shared
+# by a pool of threads, for each of the thread counts, and reports the throughput and
+# the speedup over a single thread. every output is checked against the single
+# threaded one, so any state leaking between concurrent compiles shows up as a mismatch.
+#
+# on a build with a GIL, compiles (all python) can't overlap, so expect the speedup to
+# stay near 1 - what this shows there is that concurrent compiles are safe, and what
+# they cost. on a free-threaded build, the speedup is what the threads buy.
+#
+
+import os
+import sys
+import time
+import threading
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Orchestrator import Compiler
+
+
+SAMPLE_LAYOUT = """
+navbar {
+    header {
+        branding ["http://the.link.com/"] { "Site"; img [images/brand.png] }
+        toggle (pull-left) [navbar-collapse] { }
+    }
+    menu (navbar-collapse) {
+        link(#home active) [/] { "Home" }
+        divider;
+        link(#about) [/about] { "About" }
+        form (navbar-left) [role: "search"] {
+            textbox(#q form-control) [placeholder: "Search"];
+            submit_button {"Go"}
+        }
+    }
+    menuitem [http://some.link.com] { "SomeLink" }
+}
+"""
+
+
+def compile_all(compiler, sources, count, threads):
+    """
+    compiles sources round robin, count compiles in all, on threads threads
+    @return: (seconds taken, outputs by source index)
+    """
+    outputs = [set() for _ in sources]
+    next_job = iter(xrange(count))
+    lock = threading.Lock()
+
+    def run():
+        while True:
+            with lock:
+                job = next(next_job, None)
+            if job is None:
+                return
+
+            index = job % len(sources)
+            outputs[index].add(compiler.compile_source(sources[index]).getvalue())
+
+    workers = [threading.Thread(target=run) for _ in xrange(threads)]
+
+    start = time.time()
+    map(lambda worker: worker.start(), workers)
+    map(lambda worker: worker.join(), workers)
+
+    return time.time() - start, outputs
+
+
+def main():
+    parser = OptionParser(usage="usage: %prog [options] [source.swalpa ...]")
+    parser.add_option("-n", "--compiles", dest="compiles", type="int", default=2000,
+                      help="compiles per thread count")
+    parser.add_option("-t", "--threads", dest="threads", default="1,2,4,8",
+                      help="comma separated thread counts")
+    cmd_opts, cmd_args = parser.parse_args()
+
+    sources = [open(source_file).read() for source_file in cmd_args] or [SAMPLE_LAYOUT]
+    compiler = Compiler()
+
+    #the single threaded outputs are what every other run has to match
+    expected = [compiler.compile_source(source).getvalue() for source in sources]
+
+    print("%8s %10s %12s %8s  %s" % ('threads', 'seconds', 'compiles/s', 'speedup', 'outputs'))
+    baseline = None
+
+    for threads in [int(count) for count in cmd_opts.threads.split(',')]:
+        seconds, outputs = compile_all(compiler, sources, cmd_opts.compiles, threads)
+        rate = cmd_opts.compiles / seconds
+        baseline = baseline or rate
+
+        consistent = all(output <= {expected[index]} for index, output in enumerate(outputs))
+        print("%8d %10.3f %12.1f %7.2fx  %s" % (threads, seconds, rate, rate / baseline,
+                                                'ok' if consistent else 'MISMATCH'))
+
+        if not consistent:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
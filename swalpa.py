@@ -28,36 +28,190 @@
 # The tokens received from the Lexer are then passed on to the SOMBuilder for building SOM
 # The SOM thus built, is then passed to ElementTreeBuilder to process it further and build and ElementTree
 # Then some basic structural and validation rules are run atop the ElementTree
-# Once those rules are run, and the tree is clean, it then juices the HTML milk out of it.
+# Once those rules are run, and the tree is clean, it then juices the HTML milk out of it,
+# as UTF-8 bytes, into the output file (or stdout)
 # SWEET!!!
 #
+# In batch mode (-b), it takes any number of files, directories and globs instead, and
+# compiles them all across a pool of worker processes, into the output directory
+# In watch mode (-w), it stays up, and compiles them again as and when they change
+# (with --patches, it also writes the DOM patches for live reloading clients)
+# With --serve, it runs as a compile server (see Orchestrator.Server)
+# With -p, a single (huge) file is compiled a chunk of top level elements per worker
+# With --profile, the compile(s) run under a profiler (see Orchestrator.Profiling)
+#
 
 
+import sys
 from optparse import OptionParser
 
-from Parser import Lexer
-from Parser import SOMBuilder
-from Parser import ElementTree
-from Parser.ElementProcessors import VerifyParentageAndConfigure, PrintElementName
+from Parser import OutputSink
+from Parser.Budget import CompileBudget
+from Parser.Metrics import CompileMetrics, JsonLineWriter
+from Parser.MemoryProfile import MemoryMetrics, format_memory_report
+from Orchestrator import Compiler
+from Orchestrator.Snapshot import SnapshotCache
+from Orchestrator.Batch import BatchCompiler, report
+from Orchestrator.Manifest import ASSET_MANIFEST_NAME
+from Orchestrator.Watcher import SourceWatcher
+from Orchestrator.ParallelCompile import ParallelCompiler
+from Orchestrator import Server
+from Orchestrator.Profiling import profile
+
+
+def report_memory(metrics=None):
+    """
+    @param metrics: metrics callback to pass the metrics on to as well
+    @return: a metrics callback printing the memory profile of every compile on stderr
+    """
+    def report(compile_metrics):
+        sys.stderr.write(format_memory_report(compile_metrics))
+        if metrics is not None:
+            metrics(compile_metrics)
+
+    return report
 
 
 def main():
     # parse command line args
     parser = OptionParser()
     parser.add_option("-o", "--output", dest="outputfile", help="output file")
+    parser.add_option("-s", "--select", dest="selector",
+                      help="render only the subtree at this element '#id' or 'type/path'")
+    parser.add_option("-b", "--batch", dest="batch", action="store_true", default=False,
+                      help="compile all files, directories and globs given, into the output directory")
+    parser.add_option("-p", "--parallel", dest="parallel", action="store_true", default=False,
+                      help="compile the file's top level elements across worker processes")
+    parser.add_option("-w", "--watch", dest="watch", action="store_true", default=False,
+                      help="keep compiling the files, directories and globs given, as they change")
+    parser.add_option("--patches", dest="patches", action="store_true", default=False,
+                      help="in watch mode, also write the DOM patches from the last compile, as <output>.patch.json")
+    parser.add_option("--serve", dest="serve", metavar="ADDRESS",
+                      help="run as a compile server on 'host:port' or on a unix socket path")
+    parser.add_option("--timeout", dest="timeout", type="float", default=Server.DEFAULT_TIMEOUT,
+                      help="seconds a compile may take in server mode")
+    parser.add_option("--warm-pool", dest="warm_pool", action="store_true", default=False,
+                      help="server compiles on pre-forked workers, in micro-batches through shared memory")
+    parser.add_option("--batch-size", dest="batch_size", type="int",
+                      help="most compiles a --warm-pool worker takes at once")
+    parser.add_option("--budget", dest="budget", metavar="SPEC",
+                      help="limits for every compile, as 'depth=N,tokens=N,line=N,string=N,output=N,deadline=SECS' "
+                           "(server default: %s, deadline: the timeout)" % Server.DEFAULT_BUDGET)
+    parser.add_option("--include-root", dest="include_root", metavar="DIR",
+                      help="in server mode, let the sources include files from DIR (and only from there); "
+                           "by default they can't include anything")
+    parser.add_option("--cache-entries", dest="cache_entries", type="int", default=Server.DEFAULT_CACHE_ENTRIES,
+                      help="compile results the server caches, 0 to not cache")
+    parser.add_option("--cache-ttl", dest="cache_ttl", type="float",
+                      help="seconds a cached compile result is good for (default: till evicted)")
+    parser.add_option("-j", "--jobs", dest="jobs", type="int",
+                      help="number of worker processes in batch, parallel and server modes")
+    parser.add_option("-i", "--incremental", dest="incremental", action="store_true", default=False,
+                      help="in batch mode, compile only what has changed since the last build")
+    parser.add_option("--snapshot-dir", dest="snapshot_dir",
+                      help="load verified element trees from snapshots in this directory (and keep them there)")
+    parser.add_option("--hashed", dest="hashed", action="store_true", default=False,
+                      help="in batch mode, name the outputs by a hash of their content, and list them in %s"
+                           % ASSET_MANIFEST_NAME)
+    parser.add_option("--metrics", dest="metrics_file", metavar="FILE",
+                      help="append per-stage timings and counts of every compile to FILE, a JSON line each "
+                           "('-' for stderr)")
+    parser.add_option("--profile-memory", dest="profile_memory", action="store_true", default=False,
+                      help="report the memory each stage of the compile retains, on stderr (single file compiles)")
+    parser.add_option("--profile", dest="profile", metavar="PREFIX",
+                      help="profile the compile(s), into PREFIX.pstats and PREFIX.collapsed (for flamegraphs); "
+                           "batch compiles run in this process then")
+    parser.add_option("--profile-sampler", dest="profile_sampler", action="store_true", default=False,
+                      help="with --profile, sample the stack now and then, instead of tracing every call (cProfile)")
+    parser.add_option("--pipeline", dest="pipeline", action="store_true", default=False,
+                      help="in batch mode, overlap reading, compiling and writing of files in a pipeline")
+    parser.add_option("--chunksize", dest="chunksize", type="int",
+                      help="number of files handed to a worker at a time in batch mode")
     cmd_opts, cmd_args = parser.parse_args()
 
-    lexer = Lexer()
-    somBuilder = SOMBuilder()
+    try:
+        budget = CompileBudget.parse(cmd_opts.budget) if cmd_opts.budget else None
+    except ValueError as e:
+        parser.error("--budget: %s" % e)
+
+    #the compiles run elsewhere, or over and over; there'd be no one profile to report
+    if cmd_opts.profile_memory and (cmd_opts.serve or cmd_opts.watch or cmd_opts.batch or cmd_opts.parallel):
+        parser.error("--profile-memory works on single file compiles")
+
+    if cmd_opts.profile is None:
+        return run(parser, cmd_opts, cmd_args, budget)
+
+    if cmd_opts.serve or cmd_opts.watch or cmd_opts.parallel:
+        parser.error("--profile works on single file and batch compiles")
+    if cmd_opts.batch:
+        #compiles in worker processes would be out of the profile's sight
+        cmd_opts.jobs = 1
+
+    with profile(cmd_opts.profile, sampling=cmd_opts.profile_sampler):
+        return run(parser, cmd_opts, cmd_args, budget)
+
+
+def run(parser, cmd_opts, cmd_args, budget):
+    """
+    compiles, serves or watches, as the command line says
+    """
+    if cmd_opts.serve:
+        if cmd_opts.metrics_file:
+            parser.error("--metrics can't be used with --serve")
+        Server.serve(cmd_opts.serve, workers=cmd_opts.jobs, timeout=cmd_opts.timeout,
+                     cache_entries=cmd_opts.cache_entries, cache_ttl=cmd_opts.cache_ttl,
+                     warm_pool=cmd_opts.warm_pool, batch_size=cmd_opts.batch_size,
+                     budget=Server.create_budget(cmd_opts.budget, cmd_opts.timeout),
+                     include_root=cmd_opts.include_root)
+        return
+
+    if cmd_opts.watch:
+        #compiles from incremental documents keep within no budget, and keep no metrics
+        for option, value in (('--budget', budget), ('--metrics', cmd_opts.metrics_file)):
+            if value:
+                parser.error("%s can't be used with --watch" % option)
+        SourceWatcher(cmd_args, cmd_opts.outputfile or '.', patches=cmd_opts.patches).run()
+        return
+
+    if cmd_opts.batch:
+        batchCompiler = BatchCompiler(workers=cmd_opts.jobs, chunksize=cmd_opts.chunksize,
+                                      snapshot_dir=cmd_opts.snapshot_dir, pipelined=cmd_opts.pipeline,
+                                      content_addressed=cmd_opts.hashed, metrics_file=cmd_opts.metrics_file,
+                                      budget=budget)
+        results = batchCompiler.compile_tree(cmd_args, cmd_opts.outputfile or '.', cmd_opts.incremental)
+        sys.exit(1 if report(results) else 0)
+
+    if cmd_opts.parallel:
+        #the document is compiled in pieces, on workers; none of these can follow it there
+        for option, value in (('--select', cmd_opts.selector), ('--budget', budget),
+                              ('--metrics', cmd_opts.metrics_file), ('--snapshot-dir', cmd_opts.snapshot_dir)):
+            if value:
+                parser.error("%s can't be used with --parallel" % option)
+
+    if cmd_opts.outputfile:
+        sink = OutputSink.open(cmd_opts.outputfile)
+    else:
+        sink = OutputSink(getattr(sys.stdout, 'buffer', sys.stdout))
+
+    if cmd_opts.parallel:
+        parallelCompiler = ParallelCompiler(workers=cmd_opts.jobs)
+        try:
+            parallelCompiler.compile_file(cmd_args[0], sink)
+        finally:
+            parallelCompiler.close()
+        return
 
     # try:
-    for token in lexer.tokenize(cmd_args[0]):
-        # print("processing %s: '%s'" %(type(token).__name__, token.get_token()))
-        somBuilder.process_token(token)
+    snapshots = SnapshotCache(cmd_opts.snapshot_dir) if cmd_opts.snapshot_dir else None
+    metrics = JsonLineWriter(cmd_opts.metrics_file) if cmd_opts.metrics_file else None
+    metrics_class = CompileMetrics
+
+    if cmd_opts.profile_memory:
+        metrics_class = MemoryMetrics
+        metrics = report_memory(metrics)
 
-    elementTree = ElementTree(somBuilder.get_root_element().get_contents())
-    elementTree.grant_visit(PrintElementName())
-    # elementTree.grant_visit(VerifyParentageAndConfigure())
+    Compiler(snapshots=snapshots, budget=budget, metrics=metrics,
+             metrics_class=metrics_class).compile_file(cmd_args[0], sink, selector=cmd_opts.selector)
     # except Exception as e:
     #     print("error: " + str(e))
 
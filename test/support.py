@@ -0,0 +1,128 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# test support
+#
+# what the unit tests share - compiling source text, and swalpa files in a
+# temporary directory that goes away with the test
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import Parser
+from Parser import CompactElementTree
+from Orchestrator import Compiler
+
+
+#a bit of everything - ids, classes, properties, strings, nesting and components
+DOCUMENT = '''component [search_form] {
+    form (navbar-left) [role: "search"] {
+        textbox (#$id form-control) [placeholder: $placeholder];
+        submit_button { $label }
+    }
+}
+
+navbar {
+    header {
+        branding ["http://the.link.com/"] {
+            "Site";
+            img [images/brand.png]
+        }
+    }
+    menu (#main navbar-collapse) {
+        link (#home active) [index.html] { "Home" }
+        divider;
+        link [about.html] [title: "About us"] { "About" }
+        use [search_form] [id: search, placeholder: "Search", label: "Go"];
+    }
+    menuitem [http://some.link.com] { "SomeLink" }
+}
+
+navbar {
+    menu {
+        use [search_form] [id: search, placeholder: "Search", label: "Go"];
+        link (#last) [last.html] { "Last" }
+    }
+}
+'''
+
+
+def compile_html(source, compiler=None, **kwargs):
+    """
+    @return: the HTML for swalpa source text, as bytes
+    """
+    compiler = compiler if compiler is not None else Compiler()
+    return compiler.compile_source(source, **kwargs).getvalue()
+
+
+def describe(elements):
+    """
+    @return: nested (type, id, classes, properties, line number, children) for elements,
+             with components flattened, as the compact tree keeps them
+    """
+    description = []
+
+    for elem in CompactElementTree.flatten_components(elements):
+        if hasattr(elem, 'content'):
+            description.append(('string', elem.content, elem.line_number))
+            continue
+
+        description.append((type(elem).__name__, elem.element_id, sorted(elem.classes),
+                            sorted(elem.properties.items()), elem.line_number,
+                            describe(elem.get_child_element_tree() or [])))
+
+    return description
+
+
+class TempDirTestCase(unittest.TestCase):
+    """
+    a test case with a temporary directory to write swalpa files to
+    """
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='swalpa-test-')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def path(self, *names):
+        return os.path.join(self.tempdir, *names)
+
+    def write_file(self, name, content):
+        """
+        writes content to name in the temporary directory
+        @return: path of the file
+        """
+        path = self.path(name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        with open(path, 'w') as source:
+            source.write(content)
+
+        return path
+
+    def read_file(self, name):
+        with open(self.path(name), 'rb') as output:
+            return output.read()
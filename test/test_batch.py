@@ -0,0 +1,196 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# batch compile tests - incremental builds and the build manifest
+#
+
+import os
+import re
+import json
+import hashlib
+import unittest
+
+from support import TempDirTestCase
+from Orchestrator.Batch import BatchCompiler
+from Orchestrator.Manifest import BuildManifest, ASSET_MANIFEST_NAME, COMPILER_MODULES, compiler_fingerprint
+
+
+class IncrementalBuildTest(TempDirTestCase):
+    def setUp(self):
+        super(IncrementalBuildTest, self).setUp()
+
+        self.write_file('src/home.swalpa', 'navbar { menu { link [index.html] { "Home" } } }')
+        self.write_file('src/about.swalpa', 'navbar { include [shared.swalpa]; }')
+        self.write_file('src/shared.swalpa', 'menuitem [about.html] { "About" }')
+
+    def build(self, *names):
+        compiler = BatchCompiler(workers=1)
+        inputs = [self.path('src', name) for name in names] or [self.path('src')]
+        return compiler.compile_tree(inputs, self.path('out'), incremental=True)
+
+    def compiled(self, results):
+        return sorted(result.job.name for result in results if not result.skipped)
+
+    def manifest(self):
+        return BuildManifest.for_output_dir(self.path('out'))
+
+    def test_only_changed_sources_are_compiled(self):
+        self.assertEqual(self.compiled(self.build()), ['about.swalpa', 'home.swalpa', 'shared.swalpa'])
+        self.assertEqual(self.compiled(self.build()), [])
+
+        self.write_file('src/home.swalpa', 'navbar { menu { link [index.html] { "Start" } } }')
+        self.assertEqual(self.compiled(self.build()), ['home.swalpa'])
+        self.assertEqual(self.read_file('out/home.html'), b'<nav><ul><a href="index.html">Start</a></ul></nav>')
+
+    def test_change_in_include_recompiles_includer(self):
+        self.build()
+
+        self.write_file('src/shared.swalpa', 'menuitem [about.html] { "About us" }')
+        self.assertEqual(self.compiled(self.build()), ['about.swalpa', 'shared.swalpa'])
+        self.assertEqual(self.read_file('out/about.html'), b'<nav><li href="about.html">About us</li></nav>')
+
+    def test_missing_output_is_rebuilt(self):
+        self.build()
+
+        os.remove(self.path('out', 'home.html'))
+        self.assertEqual(self.compiled(self.build()), ['home.swalpa'])
+
+    def test_deleted_sources_are_dropped(self):
+        self.build()
+        self.assertEqual(len(self.manifest().sources), 3)
+
+        os.remove(self.path('src', 'home.swalpa'))
+        self.build()
+
+        self.assertEqual(sorted(os.path.basename(path) for path in self.manifest().sources),
+                         ['about.swalpa', 'shared.swalpa'])
+
+    def test_failed_source_is_not_recorded(self):
+        self.write_file('src/home.swalpa', 'navbar { nonsense; }')
+
+        results = self.build()
+
+        self.assertEqual([result.job.name for result in results if not result.succeeded()], ['home.swalpa'])
+        self.assertNotIn(self.path('src', 'home.swalpa'), self.manifest().sources)
+        self.assertEqual(self.compiled(self.build()), ['home.swalpa'])
+
+
+class ContentAddressedBuildTest(TempDirTestCase):
+    def setUp(self):
+        super(ContentAddressedBuildTest, self).setUp()
+
+        self.write_file('src/home.swalpa', 'navbar { menu { link [index.html] { "Home" } } }')
+        self.write_file('src/about.swalpa', 'navbar { menuitem [about.html] { "About" } }')
+
+    def build(self, incremental=False):
+        compiler = BatchCompiler(workers=1, content_addressed=True)
+        return compiler.compile_tree([self.path('src')], self.path('out'), incremental=incremental)
+
+    def assets(self):
+        return json.loads(self.read_file(os.path.join('out', ASSET_MANIFEST_NAME)).decode('utf-8'))
+
+    def test_outputs_are_named_by_their_content(self):
+        self.build()
+
+        assets = self.assets()
+        self.assertEqual(sorted(assets), ['about.swalpa', 'home.swalpa'])
+
+        for name, output in assets.items():
+            self.assertRegexpMatches(output, r'^%s\.[0-9a-f]{16}\.html$' % re.escape(name[:-len('.swalpa')]))
+
+            html = self.read_file(os.path.join('out', output))
+            self.assertIn(hashlib.sha1(html).hexdigest()[:16], output)
+
+        self.assertEqual(self.read_file(os.path.join('out', assets['home.swalpa'])),
+                         b'<nav><ul><a href="index.html">Home</a></ul></nav>')
+
+    def test_unchanged_output_keeps_its_name(self):
+        for incremental in (False, True):
+            self.build(incremental)
+            assets = self.assets()
+            stamp = os.stat(self.path('out', assets['home.swalpa'])).st_mtime
+
+            os.utime(self.path('src', 'home.swalpa'), None)
+            self.write_file('src/about.swalpa', 'navbar { menuitem [about.html] { "About %s" } }' % incremental)
+            self.build(incremental)
+
+            self.assertEqual(self.assets()['home.swalpa'], assets['home.swalpa'])
+            self.assertEqual(os.stat(self.path('out', assets['home.swalpa'])).st_mtime, stamp)
+            self.assertNotEqual(self.assets()['about.swalpa'], assets['about.swalpa'])
+
+    def test_deleted_sources_are_dropped(self):
+        self.build(incremental=True)
+
+        os.remove(self.path('src', 'about.swalpa'))
+        self.build(incremental=True)
+
+        self.assertEqual(sorted(self.assets()), ['home.swalpa'])
+
+    def test_failed_source_keeps_last_output(self):
+        self.build()
+        output = self.assets()['about.swalpa']
+
+        self.write_file('src/about.swalpa', 'navbar { nonsense; }')
+        results = self.build()
+
+        self.assertEqual([result.job.name for result in results if not result.succeeded()], ['about.swalpa'])
+        self.assertEqual(self.assets()['about.swalpa'], output)
+
+
+class OutputCollisionTest(TempDirTestCase):
+    def test_sources_with_the_same_output(self):
+        self.write_file('a/x.swalpa', 'navbar { }')
+        self.write_file('b/x.swalpa', 'navbar { divider; }')
+        self.write_file('b/y.swalpa', 'navbar { }')
+
+        for incremental in (False, True):
+            compiler = BatchCompiler(workers=1)
+            results = compiler.compile_tree([self.path('a', 'x.swalpa'), self.path('b', 'x.swalpa'),
+                                             self.path('b', 'y.swalpa')], self.path('out'), incremental)
+
+            self.assertEqual([(result.job.source_file, result.succeeded()) for result in results],
+                             [(self.path('a', 'x.swalpa'), False), (self.path('b', 'x.swalpa'), False),
+                              (self.path('b', 'y.swalpa'), True)])
+            self.assertIn(self.path('b', 'x.swalpa'), results[0].error)
+            self.assertFalse(os.path.exists(self.path('out', 'x.html')))
+            self.assertTrue(os.path.exists(self.path('out', 'y.html')))
+
+    def test_directories_keep_their_structure(self):
+        self.write_file('src/a/x.swalpa', 'navbar { }')
+        self.write_file('src/b/x.swalpa', 'navbar { divider; }')
+
+        results = BatchCompiler(workers=1).compile_tree([self.path('src')], self.path('out'))
+
+        self.assertTrue(all(result.succeeded() for result in results))
+        self.assertEqual(self.read_file('out/b/x.html'), b'<nav><li class="divider"></li></nav>')
+
+
+class CompilerFingerprintTest(unittest.TestCase):
+    def test_covers_includes_and_components(self):
+        for name in ('Parser.Includes', 'Parser.Components', 'Parser.SubtreeSelector'):
+            self.assertIn(name, COMPILER_MODULES)
+
+        self.assertEqual(len(compiler_fingerprint()), 40)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+#
+# compile budget tests
+#
+
+import os
+import sys
+import subprocess
+import unittest
+
+from support import TempDirTestCase
+from Parser.Budget import CompileBudget, BudgetExceeded
+from Parser.Lexer import Lexer
+from Orchestrator import Compiler
+from Orchestrator.Batch import BatchCompiler
+
+
+SWALPA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'swalpa.py')
+
+
+class BudgetTest(TempDirTestCase):
+    def setUp(self):
+        super(BudgetTest, self).setUp()
+
+        self.write_file('shared/items.swalpa', 'menuitem [a.html] { "A" }\ninclude [more.swalpa];')
+        self.write_file('shared/more.swalpa', 'menuitem [b.html] { "B" }')
+        self.page = self.write_file('page.swalpa', 'navbar { include [shared/items.swalpa]; divider; }')
+
+    def compile(self, source, spec, compiler=None):
+        compiler = compiler or Compiler(budget=CompileBudget.parse(spec))
+        return compiler.compile_file(self.write_file('source.swalpa', source)).getvalue()
+
+    def assertExceeds(self, budget_name, source, spec, compiler=None):
+        with self.assertRaises(BudgetExceeded) as raised:
+            self.compile(source, spec, compiler)
+        self.assertEqual(raised.exception.params['budget'], budget_name)
+
+    def count_tokens(self, *names):
+        return sum(len(list(Lexer().tokenize(self.path(name)))) for name in names)
+
+    def test_within_budget(self):
+        html = self.compile('navbar { menuitem [a.html] { "A" } }',
+                            'depth=4,tokens=100,line=80,string=10,output=100,deadline=10')
+        self.assertEqual(html, b'<nav><li href="a.html">A</li></nav>')
+
+    def test_depth(self):
+        self.assertExceeds('max_depth', 'navbar { menu { menuitem [a.html] { "A" } } }', 'depth=2')
+
+    def test_tokens(self):
+        self.assertExceeds('max_tokens', 'navbar { menuitem [a.html] { "A" } }', 'tokens=5')
+
+    def test_line_length(self):
+        self.assertExceeds('max_line_length', 'navbar {\n' + 'divider; ' * 20 + '\n}', 'line=80')
+
+    def test_string_length(self):
+        self.assertExceeds('max_string_length', 'navbar { menuitem [a.html] { "too long" } }', 'string=4')
+
+    def test_output_bytes(self):
+        self.assertExceeds('max_output_bytes', 'navbar { menuitem [a.html] { "A" } }', 'output=10')
+
+    def test_deadline(self):
+        self.assertExceeds('deadline', 'navbar {\n' + 'divider;\n' * 1000 + '}', 'deadline=0')
+
+    def test_tokens_through_includes(self):
+        tokens = self.count_tokens('page.swalpa', 'shared/items.swalpa', 'shared/more.swalpa')
+
+        compiler = Compiler(budget=CompileBudget(max_tokens=tokens - 1))
+        with self.assertRaises(BudgetExceeded) as raised:
+            compiler.compile_file(self.page)
+        self.assertEqual(raised.exception.params['budget'], 'max_tokens')
+
+        compiler.budget = CompileBudget(max_tokens=tokens)
+        html = compiler.compile_file(self.page).getvalue()
+        self.assertEqual(html, Compiler().compile_file(self.page).getvalue())
+
+        #the fragments come out of the cache now, but their tokens still count
+        compiler.budget = CompileBudget(max_tokens=tokens - 1)
+        with self.assertRaises(BudgetExceeded):
+            compiler.compile_file(self.page)
+
+        compiler.budget = CompileBudget(max_tokens=tokens)
+        self.assertEqual(compiler.compile_file(self.page).getvalue(), html)
+
+    def test_fragments_parsed_without_budget(self):
+        compiler = Compiler()
+        compiler.compile_file(self.page)
+
+        #what they took wasn't counted; they're lexed again, within the budget
+        compiler.budget = CompileBudget(max_tokens=self.count_tokens('page.swalpa'))
+        with self.assertRaises(BudgetExceeded):
+            compiler.compile_file(self.page)
+
+    def test_line_length_through_includes(self):
+        self.write_file('shared/long.swalpa', 'divider; ' * 20)
+        self.assertExceeds('max_line_length', 'navbar { include [shared/long.swalpa]; }', 'line=80')
+
+    @unittest.skipUnless(os.path.exists('/dev/zero'), "needs /dev/zero")
+    def test_endless_include(self):
+        self.assertExceeds('max_line_length', 'navbar { include [/dev/zero]; }', 'line=100,deadline=1')
+        self.assertExceeds('deadline', 'navbar { include [/dev/zero]; }', 'deadline=0.05')
+
+
+class BatchBudgetTest(TempDirTestCase):
+    def test_every_compile_keeps_within_budget(self):
+        self.write_file('src/small.swalpa', 'navbar { }')
+        self.write_file('src/large.swalpa', 'navbar { menuitem [a.html] { "A" } }')
+
+        #in this process, and on worker processes
+        for workers, pipelined in ((1, False), (1, True), (2, False)):
+            compiler = BatchCompiler(workers=workers, pipelined=pipelined, budget=CompileBudget(max_tokens=20))
+            results = compiler.compile_tree([self.path('src')], self.path('out'))
+
+            self.assertEqual([result.job.name for result in results if not result.succeeded()], ['large.swalpa'])
+            self.assertIn('max_tokens', results[0].error)
+
+    def test_watch_mode_refuses_budget(self):
+        source = self.write_file('page.swalpa', 'navbar { }')
+        process = subprocess.Popen([sys.executable, SWALPA, '-w', '--budget', 'depth=4', source],
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, errors = process.communicate()
+
+        self.assertEqual(process.returncode, 2)
+        self.assertIn(b"--budget can't be used with --watch", errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# ElementTree backends - lazy and compact trees against the plain one
+#
+
+import unittest
+
+from support import DOCUMENT, compile_html, describe
+from Parser import CompileContext, CompactElementTree, OutputSink
+from Parser.ElementProcessors import VerifyParentageAndConfigure
+from Parser.ElementTree import ElementTree
+from Orchestrator import Compiler
+
+
+def build_som(source):
+    context = CompileContext('<test>')
+    return Compiler().expand_som(context, context.build_som(source.splitlines(True))).get_contents()
+
+
+def build_tree(source, lazy=False):
+    tree = ElementTree(build_som(source), lazy=lazy)
+    tree.grant_visit(VerifyParentageAndConfigure())
+    return tree
+
+
+def render(tree):
+    return Compiler().render(tree, OutputSink()).getvalue()
+
+
+class LazyElementTreeTest(unittest.TestCase):
+    def test_lazy_tree_matches_eager_tree(self):
+        self.assertEqual(describe(build_tree(DOCUMENT, lazy=True).root), describe(build_tree(DOCUMENT).root))
+
+    def test_lazy_tree_renders_the_same(self):
+        self.assertEqual(render(build_tree(DOCUMENT, lazy=True)), compile_html(DOCUMENT))
+
+
+class CompactElementTreeTest(unittest.TestCase):
+    def test_packed_tree_matches_element_tree(self):
+        tree = build_tree(DOCUMENT)
+        compact = CompactElementTree(tree.root)
+
+        self.assertEqual(describe(compact.root), describe(tree.root))
+        self.assertEqual(render(compact), render(tree))
+
+    def test_from_som_matches_full_compile(self):
+        #a form in a navbar gets configured for it (navbar-form)
+        for source in (DOCUMENT, 'navbar { form { "x" } }'):
+            compact = CompactElementTree.from_som(build_som(source))
+
+            self.assertEqual(describe(compact.root), describe(build_tree(source).root))
+            self.assertEqual(render(compact), compile_html(source))
+
+        self.assertIn(b'navbar-form', render(CompactElementTree.from_som(build_som('navbar { form { "x" } }'))))
+
+    def test_from_som_lets_go_of_packed_subtrees(self):
+        roots = ElementTree(build_som(DOCUMENT), lazy=True).root
+        CompactElementTree(roots, release=True)
+
+        self.assertEqual([elem.get_child_element_tree() for elem in roots
+                          if type(elem).__name__ != 'ComponentElement'], [None, None])
+
+    def test_concatenate(self):
+        first, second = DOCUMENT.rsplit('navbar {', 1)
+        definition = DOCUMENT.split('navbar {', 1)[0]
+        trees = [CompactElementTree(build_tree(first).root),
+                 CompactElementTree(build_tree(definition + 'navbar {' + second).root)]
+
+        merged = CompactElementTree.concatenate(trees)
+
+        self.assertEqual(len(merged), sum(len(tree) for tree in trees))
+        self.assertEqual(render(merged), render(trees[0]) + render(trees[1]))
+        self.assertEqual(render(merged), compile_html(DOCUMENT))
+
+
+if __name__ == '__main__':
+    unittest.main()
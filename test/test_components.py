@@ -0,0 +1,97 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# component tests
+#
+
+import unittest
+
+from support import DOCUMENT, compile_html, TempDirTestCase
+from Parser import CompileContext, ComponentRegistry
+from Parser.Components import ComponentError
+from Orchestrator import Compiler
+
+
+SEARCH_FORM = (b'<form class="navbar-left" role="search"><input id="search" class="form-control" placeholder="Search">'
+               b'<button class="btn btn-default" type="submit">Go</button></form>')
+
+
+def expand(source):
+    items = CompileContext('<test>').build_som(source.splitlines(True)).get_contents()
+    registry = ComponentRegistry()
+    registry.expand(items)
+    return registry, items
+
+
+class ComponentTest(TempDirTestCase):
+    def test_arguments_are_substituted(self):
+        html = compile_html(DOCUMENT)
+
+        self.assertEqual(html.count(SEARCH_FORM), 2)
+
+    def test_uses_share_one_instance(self):
+        registry, items = expand(DOCUMENT)
+
+        self.assertEqual(len(registry.instances), 1)
+
+    def test_distinct_arguments_get_distinct_instances(self):
+        source = ('component [item] { menuitem [$href] { $text } }\n'
+                  'navbar { use [item] [href: a.html, text: "A"]; use [item] [href: b.html, text: "B"]; }')
+
+        registry, items = expand(source)
+
+        self.assertEqual(len(registry.instances), 2)
+        self.assertEqual(compile_html(source), b'<nav><li href="a.html">A</li><li href="b.html">B</li></nav>')
+
+    def test_nested_components(self):
+        source = ('component [item] { menuitem [$href] { $text } }\n'
+                  'component [menu_of_one] { menu { use [item] [href: $href, text: $text]; } }\n'
+                  'navbar { use [menu_of_one] [href: a.html, text: "A"]; }')
+
+        self.assertEqual(compile_html(source), b'<nav><ul><li href="a.html">A</li></ul></nav>')
+
+    def test_component_from_include(self):
+        self.write_file('components.swalpa', 'component [item] { menuitem [$href] { $text } }')
+        page = self.write_file('page.swalpa', 'include [components.swalpa];\n'
+                                              'navbar { use [item] [href: a.html, text: "A"]; }')
+
+        self.assertEqual(Compiler().compile_file(page).getvalue(), b'<nav><li href="a.html">A</li></nav>')
+
+    def test_undefined_component(self):
+        with self.assertRaises(ComponentError):
+            compile_html('navbar { use [nothing]; }')
+
+    def test_component_using_itself(self):
+        with self.assertRaises(ComponentError):
+            compile_html('component [loop] { menu { use [loop]; } }\nnavbar { use [loop]; }')
+
+    def test_missing_argument(self):
+        with self.assertRaises(ComponentError):
+            compile_html('component [item] { menuitem [$href] { $text } }\nnavbar { use [item] [href: a.html]; }')
+
+    def test_duplicate_definition(self):
+        with self.assertRaises(ComponentError):
+            compile_html('component [item] { divider; }\ncomponent [item] { divider; }\nnavbar { }')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# EventStream tests
+#
+
+import unittest
+
+import Parser
+from Parser import Lexer, SwalpaEventStream, SwalpaEventHandler, stream_events
+from Parser.EventStream import START_ELEMENT, TEXT, END_ELEMENT
+from Parser.BasicElements import InvalidStructureError
+
+
+SOURCE = '''navbar {
+    menu (#first left #second) [role: "nav"] {
+        link [a.html] { "A" }
+        divider;
+    }
+}
+'''
+
+
+def tokenize(source):
+    return Lexer().tokenize_lines(source.splitlines(True))
+
+
+class RecordingHandler(SwalpaEventHandler):
+    def __init__(self):
+        self.calls = []
+
+    def start_element(self, name, attributes, line_number):
+        self.calls.append(('start', name, line_number))
+
+    def text(self, contents, line_number):
+        self.calls.append(('text', contents, line_number))
+
+    def end_element(self, name):
+        self.calls.append(('end', name))
+
+
+class EventStreamTest(unittest.TestCase):
+    def test_events_in_document_order(self):
+        events = list(SwalpaEventStream().events(tokenize(SOURCE)))
+
+        summary = [(event[0], event[1]) for event in events]
+        self.assertEqual(summary, [(START_ELEMENT, 'navbar'),
+                                   (START_ELEMENT, 'menu'),
+                                   (START_ELEMENT, 'link'),
+                                   (TEXT, '"A"'),
+                                   (END_ELEMENT, 'link'),
+                                   (START_ELEMENT, 'divider'),
+                                   (END_ELEMENT, 'divider'),
+                                   (END_ELEMENT, 'menu'),
+                                   (END_ELEMENT, 'navbar')])
+
+    def test_attributes(self):
+        events = list(SwalpaEventStream().events(tokenize(SOURCE)))
+
+        menu = events[1][2]
+        self.assertEqual(menu.element_id, '#second')
+        self.assertEqual(menu.classes, ['left'])
+        self.assertEqual(menu.properties, {'role': '"nav"'})
+
+        link = events[2][2]
+        self.assertEqual(link.default_property, 'a.html')
+
+    def test_handler_dispatch(self):
+        handler = RecordingHandler()
+        stream_events(tokenize(SOURCE), handler)
+
+        self.assertEqual(handler.calls[0], ('start', 'navbar', 1))
+        self.assertEqual(handler.calls[2], ('start', 'link', 3))
+        self.assertEqual(handler.calls[3], ('text', '"A"', 3))
+        self.assertEqual(handler.calls[-1], ('end', 'navbar'))
+
+    def test_unterminated_element(self):
+        with self.assertRaises(InvalidStructureError):
+            list(SwalpaEventStream().events(tokenize('navbar { menu { }')))
+
+
+if __name__ == '__main__':
+    unittest.main()
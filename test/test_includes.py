@@ -0,0 +1,98 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# include tests
+#
+
+import os
+import unittest
+
+from support import TempDirTestCase, compile_html
+from Parser.Includes import IncludeError
+from Orchestrator import Compiler
+
+
+class IncludeTest(TempDirTestCase):
+    def setUp(self):
+        super(IncludeTest, self).setUp()
+
+        self.write_file('shared/items.swalpa', 'menuitem [a.html] { "A" }\ninclude [more.swalpa];')
+        self.write_file('shared/more.swalpa', 'menuitem [b.html] { "B" }')
+        self.page = self.write_file('page.swalpa', 'navbar { include [shared/items.swalpa]; divider; }')
+
+    def touch(self, name, content):
+        #mtimes can be coarse; make sure the change shows
+        path = self.write_file(name, content)
+        stamp = os.stat(path).st_mtime + 2
+        os.utime(path, (stamp, stamp))
+
+    def test_nested_includes(self):
+        html = Compiler().compile_file(self.page).getvalue()
+
+        self.assertEqual(html, b'<nav><li href="a.html">A</li><li href="b.html">B</li>'
+                               b'<li class="divider"></li></nav>')
+
+    def test_includes_and_dependents(self):
+        compiler = Compiler()
+        compiler.compile_file(self.page)
+
+        self.assertEqual(compiler.fragments.get_includes(self.page),
+                         sorted([self.path('shared', 'items.swalpa'), self.path('shared', 'more.swalpa')]))
+        self.assertEqual(compiler.fragments.get_dependents(self.path('shared', 'more.swalpa')),
+                         sorted([self.path('page.swalpa'), self.path('shared', 'items.swalpa')]))
+
+    def test_changed_fragment_is_parsed_again(self):
+        compiler = Compiler()
+        compiler.compile_file(self.page)
+
+        self.touch('shared/more.swalpa', 'menuitem [c.html] { "C" }')
+
+        self.assertIn(b'<li href="c.html">C</li>', compiler.compile_file(self.page).getvalue())
+
+    def test_include_cycle(self):
+        self.write_file('a.swalpa', 'navbar { include [b.swalpa]; }')
+        self.write_file('b.swalpa', 'menu { include [c.swalpa]; }')
+        self.write_file('c.swalpa', 'include [b.swalpa];')
+
+        with self.assertRaises(IncludeError) as raised:
+            Compiler().compile_file(self.path('a.swalpa'))
+        self.assertIn('include cycle', str(raised.exception))
+
+    def test_self_include(self):
+        self.write_file('self.swalpa', 'navbar { }\ninclude [self.swalpa];')
+
+        with self.assertRaises(IncludeError):
+            Compiler().compile_file(self.path('self.swalpa'))
+
+    def test_missing_include(self):
+        self.write_file('missing.swalpa', 'navbar { include [nowhere.swalpa]; }')
+
+        with self.assertRaises(IncludeError):
+            Compiler().compile_file(self.path('missing.swalpa'))
+
+    def test_include_needs_a_file(self):
+        with self.assertRaises(IncludeError):
+            compile_html('navbar { include; }', source_name=self.path('page.swalpa'))
+
+
+if __name__ == '__main__':
+    unittest.main()
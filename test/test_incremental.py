@@ -0,0 +1,186 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# incremental reparsing tests - every update has to end up where a full parse does
+#
+
+import sys
+import unittest
+from StringIO import StringIO
+
+from support import DOCUMENT, describe, compile_html, TempDirTestCase
+from Parser import IncrementalDocument
+from Orchestrator import Compiler
+from Parser.SwalpaObjectModel import Token, Container
+
+
+SOURCE = '''navbar {
+    header {
+        branding ["http://the.link.com/"] {
+            "Site";
+            img [images/brand.png]
+        }
+    }
+    menu (navbar-example1-collapse) {
+        link (#placeholder classes) [http://the.link.com/] {
+            "Placeholder"
+        }
+        divider;
+        link (#somelink) [http://the.link.com/somelink] { "Some Link" }
+    }
+    menu (navbar-right) ["File"] {
+        link (#file.new classes) [file/new] { "New" }
+        link (#file.open classes) [file/open] { "Open" }
+    }
+    menuitem [http://some.link.com] { "SomeLink" }
+}
+'''
+
+
+def som_line_numbers(item):
+    """
+    @return: (token, line number) of every token in the SOM, and the lines every container spans
+    """
+    if isinstance(item, Token):
+        return [(item.get_token(), item.line_number)]
+
+    numbers = [(type(item).__name__, item.container_start_line_number, item.container_end_line_number)]
+    for child in item.children:
+        numbers.extend(som_line_numbers(child))
+
+    return numbers
+
+
+def edit(source, line_number, *lines):
+    """
+    @return: source lines, with the given lines put in place of line 'line_number'
+    """
+    source_lines = source.splitlines(True)
+    return source_lines[:line_number - 1] + [line + '\n' for line in lines] + source_lines[line_number:]
+
+
+class IncrementalDocumentTest(unittest.TestCase):
+    lazy = False
+
+    def assertUpdatesLikeFullParse(self, lines, partial=True):
+        document = IncrementalDocument(SOURCE.splitlines(True), lazy=self.lazy)
+        #builds all the children of lazy trees, so that there are elements to shift
+        describe(document.element_tree.root)
+
+        self.assertEqual(document.update(lines), partial)
+
+        expected = IncrementalDocument(lines, lazy=self.lazy)
+        self.assertEqual(describe(document.element_tree.root), describe(expected.element_tree.root))
+        self.assertEqual(som_line_numbers(document.som_root), som_line_numbers(expected.som_root))
+
+        return document
+
+    def test_lines_added(self):
+        lines = edit(SOURCE, 11, '        }', '        divider;', '        divider;')
+        document = self.assertUpdatesLikeFullParse(lines)
+
+        menus = [elem for elem in document.element_tree.root[0].get_child_element_tree()
+                 if type(elem).__name__ == 'menu']
+        self.assertEqual([menu.line_number for menu in menus], [8, 17])
+
+    def test_lines_removed(self):
+        lines = SOURCE.splitlines(True)
+        self.assertUpdatesLikeFullParse(lines[:9] + lines[10:])
+
+    def test_line_changed(self):
+        self.assertUpdatesLikeFullParse(edit(SOURCE, 16, '        link (#file.new) [file/new] { "Brand New" }'))
+
+    def test_braces_changed(self):
+        self.assertUpdatesLikeFullParse(edit(SOURCE, 15, '    }', '    menu {'), partial=False)
+
+    def test_nothing_changed(self):
+        self.assertUpdatesLikeFullParse(SOURCE.splitlines(True))
+
+    def test_nothing_printed(self):
+        document = IncrementalDocument(SOURCE.splitlines(True), lazy=self.lazy)
+
+        stdout, sys.stdout = sys.stdout, StringIO()
+        try:
+            document.update(edit(SOURCE, 16, '        divider;'))
+            printed = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+        self.assertEqual(printed, '')
+
+
+class LazyIncrementalDocumentTest(IncrementalDocumentTest):
+    lazy = True
+
+
+class DirectivesTest(TempDirTestCase):
+    def assertCompilesLikeFullCompile(self, compiler, document, lines, partial):
+        self.assertEqual(document.update(lines), partial)
+        self.assertEqual(compiler.compile_document(document).getvalue(), compile_html(''.join(lines)))
+
+    def test_components(self):
+        compiler = Compiler()
+        document = compiler.new_document(self.path('page.swalpa'), DOCUMENT.splitlines(True))
+        self.assertEqual(compiler.compile_document(document).getvalue(), compile_html(DOCUMENT))
+
+        lines = DOCUMENT.replace('"Home"', '"Start"').splitlines(True)
+        self.assertCompilesLikeFullCompile(compiler, document, lines, partial=False)
+
+        lines = DOCUMENT.replace('label: "Go"', 'label: "Find"').splitlines(True)
+        self.assertCompilesLikeFullCompile(compiler, document, lines, partial=False)
+
+    def test_includes(self):
+        self.write_file('items.swalpa', 'menuitem [a.html] { "A" }')
+        source = self.write_file('page.swalpa', 'navbar {\n    include [items.swalpa];\n    divider;\n}\n')
+
+        compiler = Compiler()
+        document = compiler.new_document(source)
+        self.assertEqual(compiler.compile_document(document).getvalue(), compiler.compile_file(source).getvalue())
+
+        self.assertFalse(document.update(['navbar {\n', '    include [items.swalpa];\n', '}\n']))
+        self.assertEqual(compiler.compile_document(document).getvalue(),
+                         b'<nav><li href="a.html">A</li></nav>')
+        self.assertEqual(compiler.fragments.get_dependents(self.path('items.swalpa')), [source])
+
+    def test_directive_added_in_container(self):
+        self.write_file('items.swalpa', 'menuitem [a.html] { "A" }')
+        source = self.write_file('page.swalpa', SOURCE)
+
+        compiler = Compiler()
+        document = compiler.new_document(source)
+
+        lines = edit(SOURCE, 16, '        include [items.swalpa];')
+        self.assertFalse(document.update(lines))
+        self.assertEqual(compiler.compile_document(document).getvalue(),
+                         compiler.compile_file(self.write_file('page.swalpa', ''.join(lines))).getvalue())
+        self.assertIn(b'<li href="a.html">A</li>', compiler.compile_document(document).getvalue())
+
+    def test_partial_without_directives(self):
+        compiler = Compiler()
+        document = compiler.new_document(self.path('page.swalpa'), SOURCE.splitlines(True))
+
+        lines = edit(SOURCE, 16, '        link (#file.new) [file/new] { "Brand New" }')
+        self.assertCompilesLikeFullCompile(compiler, document, lines, partial=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
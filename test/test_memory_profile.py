@@ -0,0 +1,100 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+#
+# memory profile tests
+#
+
+import os
+import sys
+import subprocess
+import unittest
+
+from support import DOCUMENT, TempDirTestCase
+from Parser.MemoryProfile import MemoryMetrics, PIPELINE_STAGES, format_memory_report
+from Orchestrator import Compiler
+
+
+SWALPA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'swalpa.py')
+
+
+class MemoryReportTest(TempDirTestCase):
+    def profile(self, source):
+        reports = []
+        compiler = Compiler(metrics=reports.append, metrics_class=MemoryMetrics)
+        compiler.compile_file(self.write_file('page.swalpa', source))
+        return reports[0]
+
+    def reported_stages(self, report):
+        #the stage rows come after the title and the header, and before the totals
+        lines = format_memory_report(report).splitlines()[2:]
+        return [line.split()[0] for line in lines[:len(report['memory']) - 1]]
+
+    def test_stages_in_pipeline_order(self):
+        report = self.profile(DOCUMENT)
+        stages = self.reported_stages(report)
+
+        self.assertEqual(stages, [stage for stage in PIPELINE_STAGES if stage in report['memory']])
+        self.assertEqual(stages[:3], ['lex', 'som', 'includes'])
+        self.assertLess(stages.index('element_tree'), stages.index('render'))
+
+    def test_unknown_stages_go_last(self):
+        report = self.profile(DOCUMENT)
+        report['memory']['another'] = report['memory']['aside'] = report['memory']['lex']
+
+        self.assertEqual(self.reported_stages(report)[-2:], ['another', 'aside'])
+
+    def test_summary(self):
+        summary = self.profile(DOCUMENT)['memory']['summary']
+
+        self.assertGreater(summary['retained'], 0)
+        self.assertGreater(summary['bytes_per_token'], 0)
+        self.assertGreater(summary['bytes_per_element'], 0)
+
+
+class MemoryProfileCommandLineTest(TempDirTestCase):
+    def run_swalpa(self, *args):
+        process = subprocess.Popen([sys.executable, SWALPA] + list(args),
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, errors = process.communicate()
+        return process.returncode, output, errors
+
+    def test_single_file(self):
+        status, output, errors = self.run_swalpa('--profile-memory', self.write_file('page.swalpa', DOCUMENT))
+
+        self.assertEqual(status, 0)
+        self.assertIn(b'<nav>', output)
+        self.assertIn(b'retained in all', errors)
+
+    def test_modes_it_cant_profile(self):
+        source = self.write_file('page.swalpa', 'navbar { }')
+
+        #a server that isn't refused fails to bind, rather than serving on
+        for mode in (['-b'], ['-w'], ['-p'], ['--serve', self.path('missing', 'socket')]):
+            status, output, errors = self.run_swalpa(*(['--profile-memory'] + mode + [source]))
+
+            self.assertEqual(status, 2)
+            self.assertIn(b"--profile-memory works on single file compiles", errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
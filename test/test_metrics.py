@@ -0,0 +1,138 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+#
+# compile metrics tests
+#
+
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+import unittest
+from StringIO import StringIO
+
+from support import DOCUMENT, TempDirTestCase
+from Parser.Metrics import CompileMetrics, JsonLineWriter
+from Orchestrator import Compiler
+
+
+SWALPA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'swalpa.py')
+
+
+class CompileMetricsTest(unittest.TestCase):
+    def test_stages_add_up(self):
+        metrics = CompileMetrics('<test>')
+
+        for _ in range(2):
+            with metrics.stage('lex'):
+                time.sleep(0.01)
+
+        with self.assertRaises(ValueError):
+            with metrics.stage('render'):
+                raise ValueError()
+
+        stages = metrics.to_dict()['stages']
+        self.assertEqual(sorted(stages), ['lex', 'render'])
+        self.assertGreaterEqual(stages['lex']['wall'], 0.02)
+        self.assertEqual(sorted(stages['lex']), ['process_cpu', 'wall'])
+
+    def test_finish(self):
+        metrics = CompileMetrics('<test>')
+        metrics.finish(KeyError('x'))
+
+        metrics = metrics.to_dict()
+        self.assertIn('total', metrics['stages'])
+        self.assertEqual(metrics['error'], 'KeyError')
+        self.assertEqual(metrics['source'], '<test>')
+
+    def test_metrics_of_a_compile(self):
+        reports = []
+        compiler = Compiler(metrics=reports.append)
+        html = compiler.compile_source(DOCUMENT).getvalue()
+
+        metrics = reports[0]
+        #all JSON-able, as they are written
+        self.assertEqual(json.loads(json.dumps(metrics)), metrics)
+
+        for stage in ('lex', 'som', 'includes', 'components', 'element_tree', 'verify', 'render', 'total'):
+            self.assertIn(stage, metrics['stages'])
+        self.assertEqual(metrics['output_bytes'], len(html))
+        self.assertEqual(metrics['elements']['navbar'], 2)
+        self.assertEqual(metrics['tokens']['{'], metrics['tokens']['}'])
+        self.assertGreater(metrics['max_depth'], 2)
+        self.assertIsNone(metrics['error'])
+
+    def test_metrics_of_a_failed_compile(self):
+        reports = []
+
+        with self.assertRaises(Exception):
+            Compiler(metrics=reports.append).compile_source('navbar { nonsense; }')
+        self.assertEqual(reports[0]['error'], 'UnknownElementError')
+
+
+class JsonLineWriterTest(TempDirTestCase):
+    def test_lines_are_appended_whole(self):
+        writer = JsonLineWriter(self.path('metrics.jsonl'))
+
+        def write(thread):
+            for number in range(50):
+                writer({'thread': thread, 'number': number, 'padding': 'x' * 1000})
+
+        threads = [threading.Thread(target=write, args=(thread,)) for thread in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        lines = [json.loads(line) for line in self.read_file('metrics.jsonl').decode('utf-8').splitlines()]
+        self.assertEqual(len(lines), 200)
+        self.assertEqual(sorted((line['thread'], line['number']) for line in lines),
+                         [(thread, number) for thread in range(4) for number in range(50)])
+
+    def test_stderr(self):
+        stderr, sys.stderr = sys.stderr, StringIO()
+        try:
+            JsonLineWriter('-')({'a': 1})
+            written = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+
+        self.assertEqual(written, '{"a": 1}\n')
+
+    def test_modes_that_keep_no_metrics(self):
+        source = self.write_file('page.swalpa', 'navbar { }')
+
+        #a server that isn't refused fails to bind, rather than serving on
+        for mode, name in ((['-w'], '--watch'), (['--serve', self.path('missing', 'socket')], '--serve')):
+            process = subprocess.Popen([sys.executable, SWALPA, '--metrics', self.path('metrics')] + mode + [source],
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            output, errors = process.communicate()
+
+            self.assertEqual(process.returncode, 2)
+            self.assertIn(b"--metrics can't be used with " + name.encode('ascii'), errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
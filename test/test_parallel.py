@@ -0,0 +1,123 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# parallel compile tests - a document compiled in pieces has to come out as it does in one
+#
+
+import os
+import sys
+import subprocess
+import unittest
+
+from support import DOCUMENT, compile_html, TempDirTestCase
+from Parser.BasicElements import UnknownElementError
+from Orchestrator import Compiler
+from Orchestrator.ParallelCompile import ParallelCompiler
+
+
+DEFINITION, NAVBARS = DOCUMENT.split('\nnavbar', 1)
+LARGE_DOCUMENT = DEFINITION + ('\nnavbar' + NAVBARS) * 20
+
+SWALPA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'swalpa.py')
+
+
+class ParallelCompilerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.compiler = ParallelCompiler(workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.compiler.close()
+
+    def compile(self, source):
+        return self.compiler.compile_lines(source.splitlines(True)).getvalue()
+
+    def test_same_as_serial(self):
+        for source in (LARGE_DOCUMENT, DOCUMENT, 'navbar { }'):
+            self.assertEqual(self.compile(source), compile_html(source))
+
+    def test_empty_input(self):
+        for source in ('', '\n\n', '   \n'):
+            self.assertEqual(self.compile(source), compile_html(source))
+            self.assertEqual(self.compile(source), b'')
+
+    def test_only_definitions(self):
+        self.assertEqual(self.compile(DEFINITION), compile_html(DEFINITION))
+
+    def test_error_at_the_same_line(self):
+        lines = LARGE_DOCUMENT.splitlines(True)
+        source = ''.join(lines[:-5] + ['navbar { nonsense; }\n'] + lines[-5:])
+
+        with self.assertRaises(UnknownElementError):
+            compile_html(source)
+        with self.assertRaises(UnknownElementError):
+            self.compile(source)
+
+
+class ParallelIncludeTest(TempDirTestCase):
+    def setUp(self):
+        super(ParallelIncludeTest, self).setUp()
+        self.compiler = ParallelCompiler(workers=2)
+
+    def tearDown(self):
+        self.compiler.close()
+        super(ParallelIncludeTest, self).tearDown()
+
+    def test_components_defined_in_included_file(self):
+        #the included file has elements of its own too; those must come out only once
+        self.write_file('defs.swalpa', DEFINITION + '\nnavbar { menuitem [included.html] { "Included" } }\n')
+        source = self.write_file('page.swalpa', 'include [defs.swalpa];\n' + ('\nnavbar' + NAVBARS) * 20)
+
+        html = self.compiler.compile_file(source).getvalue()
+
+        self.assertEqual(html, Compiler().compile_file(source).getvalue())
+        self.assertEqual(html.count(b'included.html'), 1)
+        self.assertEqual(html.count(b'role="search"'), 40)
+
+
+class ParallelCommandLineTest(TempDirTestCase):
+    def run_swalpa(self, *args):
+        process = subprocess.Popen([sys.executable, SWALPA] + list(args),
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, errors = process.communicate()
+        return process.returncode, output, errors
+
+    def test_empty_file(self):
+        source = self.write_file('empty.swalpa', '')
+
+        self.assertEqual(self.run_swalpa(source)[:2], (0, b''))
+        self.assertEqual(self.run_swalpa('-p', source)[:2], (0, b''))
+
+    def test_options_that_parallel_compiles_cant_follow(self):
+        source = self.write_file('page.swalpa', 'navbar { }')
+
+        for option in (['--budget', 'depth=4'], ['--metrics', self.path('metrics')],
+                       ['--snapshot-dir', self.path('snapshots')], ['--select', '#a']):
+            status, output, errors = self.run_swalpa(*(['-p'] + option + [source]))
+
+            self.assertEqual(status, 2)
+            self.assertIn(option[0] + " can't be used with --parallel", errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+#
+# pipeline tests
+#
+
+import time
+import random
+import threading
+import unittest
+
+from support import DOCUMENT, TempDirTestCase, compile_html
+from Orchestrator import Compiler
+from Orchestrator.Batch import BatchJob
+from Orchestrator.Pipeline import Pipeline, CompileState, CompileStages
+
+
+class Item(object):
+    def __init__(self, number):
+        self.number = number
+        self.error = None
+        self.stages = []
+
+
+def stage(name, delay=0):
+    def run(item):
+        time.sleep(random.random() * delay)
+        item.stages.append(name)
+    return run
+
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.threads = threading.active_count()
+
+    def assertThreadsGone(self):
+        self.assertEqual(threading.active_count(), self.threads)
+
+    def test_items_come_out_in_order(self):
+        pipeline = Pipeline([stage('a', 0.002), stage('b', 0.002), stage('c')], queue_size=2)
+        items = list(pipeline.run(Item(number) for number in range(50)))
+
+        self.assertEqual([item.number for item in items], list(range(50)))
+        self.assertTrue(all(item.stages == ['a', 'b', 'c'] for item in items))
+        self.assertThreadsGone()
+
+    def test_error_skips_the_rest_of_the_stages(self):
+        def fail(item):
+            if item.number == 3:
+                raise ValueError(item.number)
+
+        items = list(Pipeline([stage('a'), fail, stage('c')]).run(Item(number) for number in range(6)))
+
+        self.assertEqual([type(item.error) for item in items], [type(None)] * 3 + [ValueError] + [type(None)] * 2)
+        self.assertEqual(items[3].stages, ['a'])
+        self.assertEqual(items[4].stages, ['a', 'c'])
+
+    def test_nothing_to_run(self):
+        self.assertEqual(list(Pipeline([stage('a')]).run([])), [])
+        self.assertThreadsGone()
+
+    def test_backpressure(self):
+        fed = []
+
+        def feed():
+            for number in range(1000):
+                fed.append(number)
+                yield Item(number)
+
+        stages = [stage('a'), stage('b')]
+        queue_size = 2
+        results = Pipeline(stages, queue_size).run(feed())
+        next(results)
+        time.sleep(0.2)
+
+        #a full queue in front of every stage and of the caller, an item in every stage,
+        #the one being fed, and the one taken
+        self.assertLessEqual(len(fed), (len(stages) + 1) * queue_size + len(stages) + 2)
+
+        results.close()
+        self.assertThreadsGone()
+        self.assertLess(len(fed), 1000)
+
+    def test_stopped_early(self):
+        results = Pipeline([stage('a', 0.001)], queue_size=1).run(Item(number) for number in range(100))
+        self.assertEqual([next(results).number for _ in range(3)], [0, 1, 2])
+
+        results.close()
+        self.assertThreadsGone()
+
+
+class CompileStagesTest(TempDirTestCase):
+    def test_compiles_like_compiler(self):
+        sources = [DOCUMENT, 'navbar { }', 'navbar { nonsense; }', 'navbar { menuitem [a.html] { "A" } }']
+        jobs = [BatchJob(self.write_file('page%d.swalpa' % number, source), None)
+                for number, source in enumerate(sources)]
+
+        states = list(Pipeline(CompileStages(Compiler()).get_stages()).run(CompileState(job) for job in jobs))
+
+        self.assertEqual([state.job for state in states], jobs)
+        self.assertEqual(type(states[2].error).__name__, 'UnknownElementError')
+        for state, source in zip(states, sources):
+            if state.error is None:
+                self.assertEqual(state.output, compile_html(source))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+#
+# profiling tests
+#
+
+import os
+import re
+import sys
+import pstats
+import subprocess
+import unittest
+
+from support import DOCUMENT, TempDirTestCase, compile_html
+from Orchestrator.Profiling import profile, collapse_stats, SamplingProfiler
+
+
+SWALPA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'swalpa.py')
+
+#'frame;frame;frame count', frames neither empty nor starting or ending in blanks
+COLLAPSED_LINE = re.compile(r'^[^;\s]([^;]*[^;\s])?(;[^;\s]([^;]*[^;\s])?)* [1-9][0-9]*$')
+
+#big enough to take the sampler a good few samples
+SOURCE = DOCUMENT + 'navbar { menu { link (#x active) [x.html] { "X" } divider; } }\n' * 400
+
+
+class ProfileTest(TempDirTestCase):
+    def read_collapsed(self, prefix):
+        """
+        @return: {stack: count}, once every line is checked to be well formed
+        """
+        collapsed = {}
+        with open(prefix + '.collapsed') as lines:
+            for line in lines:
+                line = line.rstrip('\n')
+                self.assertRegexpMatches(line, COLLAPSED_LINE)
+                stack, count = line.rsplit(' ', 1)
+                self.assertNotIn(stack, collapsed)
+                collapsed[stack] = int(count)
+
+        self.assertTrue(collapsed)
+        return collapsed
+
+    def check_profile(self, prefix, function='compile_file'):
+        """
+        checks the profile is loadable, and has function of the Compiler in it
+        """
+        stats = pstats.Stats(prefix + '.pstats')
+        self.assertIn(function, [name for filename, line, name in stats.stats])
+
+        collapsed = self.read_collapsed(prefix)
+        self.assertTrue(any('%s (Compiler.py:' % function in stack for stack in collapsed))
+
+    def run_swalpa(self, *args):
+        source = self.write_file('page.swalpa', SOURCE)
+        output = self.path('page.html')
+
+        process = subprocess.Popen([sys.executable, SWALPA, '-o', output] + list(args) + [source],
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        _, errors = process.communicate()
+
+        self.assertEqual(process.returncode, 0, errors)
+        self.assertEqual(self.read_file('page.html'), compile_html(SOURCE))
+
+    def test_profile(self):
+        prefix = self.path('profiles', 'run')
+        self.run_swalpa('--profile', prefix)
+        self.check_profile(prefix)
+
+    def test_profile_sampler(self):
+        prefix = self.path('profiles', 'run')
+        self.run_swalpa('--profile', prefix, '--profile-sampler')
+        self.check_profile(prefix)
+
+    def test_sampler_counts(self):
+        prefix = self.path('run')
+        with profile(prefix, sampling=True) as profiler:
+            compile_html(SOURCE)
+
+        samples = sum(profiler.stacks.values())
+        self.assertEqual(sum(self.read_collapsed(prefix).values()), samples)
+
+        #the pstats count samples as calls; every sample is of one leaf
+        stats = pstats.Stats(prefix + '.pstats')
+        self.assertEqual(sum(cc for cc, nc, tt, ct, callers in stats.stats.values()), samples)
+
+    def test_profile_written_when_block_fails(self):
+        prefix = self.path('run')
+        with self.assertRaises(ValueError):
+            with profile(prefix):
+                compile_html(SOURCE)
+                raise ValueError()
+
+        self.check_profile(prefix, 'compile_source')
+
+
+class CollapseStatsTest(unittest.TestCase):
+    MAIN = ('~', 0, '<main>')
+    PAGE = ('/src/page.py', 10, 'page')
+    ITEM = ('/src/item.py', 20, 'item')
+
+    def test_time_is_shared_among_callers(self):
+        #main calls page, and item; page calls item too
+        stats = {
+            self.MAIN: (1, 1, 1.0, 10.0, {}),
+            self.PAGE: (2, 2, 2.0, 5.0, {self.MAIN: (2, 2, 2.0, 5.0)}),
+            self.ITEM: (4, 4, 7.0, 7.0, {self.MAIN: (1, 1, 4.0, 4.0), self.PAGE: (3, 3, 3.0, 3.0)}),
+        }
+
+        self.assertEqual(collapse_stats(stats), {
+            '<main>': 1000000,
+            '<main>;page (page.py:10)': 2000000,
+            '<main>;page (page.py:10);item (item.py:20)': 3000000,
+            '<main>;item (item.py:20)': 4000000,
+        })
+
+    def test_recursion_is_folded(self):
+        stats = {
+            self.MAIN: (1, 1, 0.0, 3.0, {}),
+            self.PAGE: (3, 1, 3.0, 3.0, {self.MAIN: (1, 1, 1.0, 3.0), self.PAGE: (2, 2, 2.0, 2.0)}),
+        }
+
+        self.assertEqual(collapse_stats(stats), {'<main>;page (page.py:10)': 3000000})
+
+    def test_small_times_are_left_out(self):
+        stats = {
+            self.MAIN: (1, 1, 1.0, 1.0000001, {}),
+            self.PAGE: (1, 1, 1e-7, 1e-7, {self.MAIN: (1, 1, 1e-7, 1e-7)}),
+        }
+
+        self.assertEqual(collapse_stats(stats), {'<main>': 1000000})
+
+
+class SamplingProfilerTest(unittest.TestCase):
+    def test_collapsed_stacks(self):
+        profiler = SamplingProfiler()
+        main = ('/src/main.py', 1, 'main')
+        page = ('/src/page.py', 10, 'page')
+        profiler.stacks = {(main,): 1, (main, page): 3}
+
+        self.assertEqual(profiler.get_collapsed(), {'main (main.py:1)': 1, 'main (main.py:1);page (page.py:10)': 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
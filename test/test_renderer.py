@@ -0,0 +1,73 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# Renderer tests
+#
+
+import io
+import unittest
+
+from support import compile_html, TempDirTestCase
+from Parser import OutputSink
+from Parser.Renderer import escape_html, unquote
+
+
+class EscapingTest(unittest.TestCase):
+    def test_escape_html(self):
+        self.assertEqual(escape_html(u'a < b & "c" > d'), b'a &lt; b &amp; &quot;c&quot; &gt; d')
+        self.assertEqual(escape_html('plain'), b'plain')
+        self.assertEqual(escape_html(u'caf\xe9'), b'caf\xc3\xa9')
+
+    def test_unquote(self):
+        self.assertEqual(unquote('"say \\"hi\\""'), 'say "hi"')
+        self.assertEqual(unquote("'single'"), 'single')
+        self.assertEqual(unquote('bare'), 'bare')
+
+    def test_text_and_attributes_are_escaped(self):
+        html = compile_html('navbar { menu { link(#a x<y) ["a&b"] { "<b>\\"q\\"</b> & co" } } }')
+
+        self.assertEqual(html, b'<nav><ul><a id="a" class="x&lt;y" href="a&amp;b">'
+                               b'&lt;b&gt;&quot;q&quot;&lt;/b&gt; &amp; co</a></ul></nav>')
+
+
+class OutputSinkTest(TempDirTestCase):
+    def test_small_chunks_are_flushed_in_order(self):
+        stream = io.BytesIO()
+        sink = OutputSink(stream, chunk_size=4)
+        sink.write(b'ab', b'c')
+        sink.write(b'defg')
+        sink.close()
+
+        self.assertEqual(stream.getvalue(), b'abcdefg')
+        self.assertFalse(stream.closed)
+
+    def test_closes_the_file_it_opened(self):
+        sink = OutputSink.open(self.path('out.html'))
+        sink.write(b'<nav></nav>')
+        sink.close()
+
+        self.assertTrue(sink.stream.closed)
+        self.assertEqual(self.read_file('out.html'), b'<nav></nav>')
+
+
+if __name__ == '__main__':
+    unittest.main()
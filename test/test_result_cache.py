@@ -0,0 +1,180 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# compile result cache tests
+#
+
+import os
+import time
+import threading
+import unittest
+
+from support import TempDirTestCase
+from test_server import ServerTestCase
+from Orchestrator import Batch
+from Orchestrator.Batch import init_worker
+from Orchestrator.WorkerPool import compile_source_job
+from Orchestrator.ResultCache import CompileResultCache, result_key, includes_unchanged
+
+
+class CompileResultCacheTest(unittest.TestCase):
+    def test_hit_and_miss(self):
+        cache = CompileResultCache()
+        calls = []
+
+        for _ in range(3):
+            self.assertEqual(cache.get_or_compile('key', lambda: calls.append(1) or 'value'), 'value')
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cache.get_stats()['hits'], cache.get_stats()['misses']), (2, 1))
+
+    def test_stale_value_is_compiled_again(self):
+        cache = CompileResultCache()
+        fresh = [True]
+
+        cache.get_or_compile('key', lambda: 'old')
+        fresh[0] = False
+        value = cache.get_or_compile('key', lambda: 'new', is_fresh=lambda value: fresh[0])
+
+        self.assertEqual(value, 'new')
+        self.assertEqual(cache.get_stats()['bytes'], len('new'))
+
+    def test_not_cacheable(self):
+        cache = CompileResultCache()
+
+        cache.get_or_compile('key', lambda: 'timeout', cacheable=lambda value: False)
+
+        self.assertEqual(cache.get_or_compile('key', lambda: 'value'), 'value')
+
+    def test_ttl(self):
+        cache = CompileResultCache(ttl=0.01)
+
+        cache.get_or_compile('key', lambda: 'old')
+        time.sleep(0.02)
+
+        self.assertEqual(cache.get_or_compile('key', lambda: 'new'), 'new')
+
+    def test_eviction(self):
+        cache = CompileResultCache(max_entries=2)
+
+        for key in ('a', 'b', 'a', 'c'):
+            cache.get_or_compile(key, lambda: key)
+
+        self.assertEqual(sorted(cache.entries), ['a', 'c'])
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+
+    def test_identical_compiles_are_coalesced(self):
+        cache = CompileResultCache()
+        started, release = threading.Event(), threading.Event()
+        calls, values = [], []
+
+        def compile_func():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return 'value'
+
+        first = threading.Thread(target=lambda: values.append(cache.get_or_compile('key', compile_func)))
+        first.start()
+        started.wait()
+        second = threading.Thread(target=lambda: values.append(cache.get_or_compile('key', compile_func)))
+        second.start()
+
+        #the second request has to be waiting on the first before it goes through
+        while not cache.get_stats()['coalesced']:
+            time.sleep(0.001)
+        release.set()
+        first.join()
+        second.join()
+
+        self.assertEqual((len(calls), values), (1, ['value', 'value']))
+
+    def test_result_key(self):
+        self.assertEqual(result_key(b'navbar { }'), result_key(b'navbar { }'))
+        self.assertNotEqual(result_key(b'navbar { }'), result_key(b'navbar { }', '#a'))
+        self.assertNotEqual(result_key(b'navbar { }'), result_key(b'navbar {  }'))
+
+
+class IncludeStampsTest(TempDirTestCase):
+    def setUp(self):
+        super(IncludeStampsTest, self).setUp()
+
+        self.write_file('a.swalpa', 'menuitem [a.html] { "A" }')
+        self.write_file('b.swalpa', 'menuitem [b.html] { "B" }')
+        init_worker(include_root=self.tempdir)
+
+    def tearDown(self):
+        Batch._worker_compiler = None
+        super(IncludeStampsTest, self).tearDown()
+
+    def test_stamps_of_each_compile(self):
+        first = compile_source_job('navbar { include [a.swalpa]; }')
+        second = compile_source_job('navbar { include [b.swalpa]; }')
+        third = compile_source_job('navbar { }')
+
+        self.assertEqual([path for path, stamp in first[2]], [os.path.realpath(self.path('a.swalpa'))])
+        self.assertEqual([path for path, stamp in second[2]], [os.path.realpath(self.path('b.swalpa'))])
+        self.assertEqual(third[2], [])
+
+        #nothing is kept about the sources once they're compiled
+        self.assertEqual(Batch._worker_compiler.fragments.includes,
+                         {os.path.realpath(self.path('a.swalpa')): {},
+                          os.path.realpath(self.path('b.swalpa')): {}})
+
+    def test_stamps_of_failed_compile(self):
+        succeeded, result, stamps = compile_source_job('navbar { include [a.swalpa]; nonsense; }')
+
+        self.assertFalse(succeeded)
+        self.assertEqual(len(stamps), 1)
+
+    def test_includes_unchanged(self):
+        stamps = compile_source_job('navbar { include [a.swalpa]; }')[2]
+        self.assertTrue(includes_unchanged(stamps))
+
+        self.write_file('a.swalpa', 'menuitem [a.html] { "changed" }')
+        self.assertFalse(includes_unchanged(stamps))
+
+        os.remove(self.path('a.swalpa'))
+        self.assertFalse(includes_unchanged(stamps))
+
+
+class CachingServerTest(ServerTestCase):
+    cache_entries = 16
+
+    def make_include_root(self):
+        self.write_file('root/items.swalpa', 'menuitem [a.html] { "A" }')
+        return self.path('root')
+
+    def test_cached_result_goes_with_the_include(self):
+        source = 'navbar { include [items.swalpa]; }'
+        self.assertEqual(self.post(source), (200, b'<nav><li href="a.html">A</li></nav>'))
+        self.assertEqual(self.post(source), (200, b'<nav><li href="a.html">A</li></nav>'))
+        self.assertEqual(self.server.cache.get_stats()['hits'], 1)
+
+        self.write_file('root/items.swalpa', 'menuitem [a.html] { "Changed" }')
+
+        self.assertEqual(self.post(source), (200, b'<nav><li href="a.html">Changed</li></nav>'))
+        self.assertEqual(self.server.cache.get_stats()['hits'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
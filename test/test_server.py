@@ -0,0 +1,211 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# compile server tests
+#
+
+import os
+import json
+import threading
+import unittest
+from httplib import HTTPConnection
+
+from support import TempDirTestCase, compile_html
+from Parser.Includes import IncludeError
+from Orchestrator import Compiler
+from Orchestrator.Server import create_server, create_result_cache, create_budget
+from Orchestrator import WorkerPool
+from Orchestrator.WorkerPool import CompilePool, WarmWorkerPool
+
+
+class ServerTestCase(TempDirTestCase):
+    """
+    runs a compile server on a free port, for the duration of the test
+    """
+    warm_pool = False
+    cache_entries = 0
+
+    def setUp(self):
+        super(ServerTestCase, self).setUp()
+
+        include_root = self.make_include_root()
+        budget = create_budget()
+        if self.warm_pool:
+            self.pool = WarmWorkerPool(1, budget=budget, include_root=include_root)
+        else:
+            self.pool = CompilePool(1, budget, include_root=include_root)
+
+        self.server = create_server('127.0.0.1:0', self.pool, timeout=10,
+                                    cache=create_result_cache(self.cache_entries))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        self.pool.close()
+        self.pool.join()
+
+        super(ServerTestCase, self).tearDown()
+
+    def make_include_root(self):
+        """
+        @return: the include root for the server, None for no includes
+        """
+        return None
+
+    def post(self, source, path='/compile'):
+        """
+        @return: (status, body)
+        """
+        connection = HTTPConnection(*self.server.server_address)
+        try:
+            connection.request('POST', path, source)
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+
+class CompileServerTest(ServerTestCase):
+    def test_compile(self):
+        source = 'navbar { menu { link [a.html] { "A" } } }'
+
+        self.assertEqual(self.post(source), (200, compile_html(source)))
+
+    def test_compile_error(self):
+        status, body = self.post('navbar { nonsense; }')
+
+        self.assertEqual(status, 422)
+        self.assertEqual(json.loads(body)['error'], 'UnknownElementError')
+
+    def test_select(self):
+        status, body = self.post('navbar { menu { link (#a) [a.html] { "A" } } }', '/compile?select=%23a')
+
+        self.assertEqual((status, body), (200, b'<a id="a" href="a.html">A</a>'))
+
+    def test_includes_are_refused(self):
+        secret = self.write_file('secret.swalpa', 'menuitem [secret.html] { "secret" }')
+
+        for path in (secret, '/etc/passwd', 'secret.swalpa'):
+            status, body = self.post('navbar { include [%s]; }' % path)
+
+            self.assertEqual(status, 422)
+            self.assertEqual(json.loads(body)['error'], 'IncludeError')
+            self.assertNotIn(b'secret', body.replace(b'secret.swalpa', b''))
+            self.assertNotIn(b'root:', body)
+
+
+class WarmPoolServerTest(CompileServerTest):
+    warm_pool = True
+
+
+class IncludeRootServerTest(ServerTestCase):
+    def make_include_root(self):
+        self.write_file('root/items.swalpa', 'menuitem [a.html] { "A" }\ninclude [more/more.swalpa];')
+        self.write_file('root/more/more.swalpa', 'menuitem [b.html] { "B" }')
+        self.write_file('outside.swalpa', 'menuitem [c.html] { "outside" }')
+        os.symlink(self.path('outside.swalpa'), self.path('root', 'link.swalpa'))
+        return self.path('root')
+
+    def test_includes_within_the_root(self):
+        status, body = self.post('navbar { include [items.swalpa]; }')
+
+        self.assertEqual((status, body), (200, b'<nav><li href="a.html">A</li><li href="b.html">B</li></nav>'))
+
+    def test_includes_outside_the_root_are_refused(self):
+        for path in ('/etc/passwd', self.path('outside.swalpa'), '../outside.swalpa', 'more/../../outside.swalpa',
+                     'link.swalpa'):
+            status, body = self.post('navbar { include [%s]; }' % path)
+
+            self.assertEqual(status, 422, path)
+            self.assertEqual(json.loads(body)['error'], 'IncludeError')
+            self.assertNotIn(b'outside"', body)
+
+
+def failing_compile_source_job(source, selector=None):
+    raise RuntimeError("compile went wrong")
+
+
+class WarmWorkerPoolTest(unittest.TestCase):
+    def make_pool(self, compile_source_job=None):
+        """
+        @param compile_source_job: what the workers compile with, in place of WorkerPool.compile_source_job
+        """
+        original = WorkerPool.compile_source_job
+        WorkerPool.compile_source_job = compile_source_job or original
+        try:
+            #the workers are forked right away, and take the module as it is now
+            return WarmWorkerPool(1, batch_size=2)
+        finally:
+            WorkerPool.compile_source_job = original
+
+    def assertAllReleased(self, pool):
+        self.assertEqual(pool.slots.free.qsize(), pool.slots.count)
+        self.assertTrue(pool.free_workers.acquire(False))
+        pool.free_workers.release()
+
+    def test_compiles(self):
+        pool = self.make_pool()
+        try:
+            for index in range(5):
+                self.assertEqual(pool.compile('navbar { menuitem [%d] { } }' % index, timeout=10),
+                                 (True, b'<nav><li href="%d"></li></nav>' % index, []))
+            self.assertAllReleased(pool)
+        finally:
+            pool.close()
+            pool.join()
+
+    def test_failing_batches_release_their_worker_and_slots(self):
+        pool = self.make_pool(failing_compile_source_job)
+        try:
+            #more than there are workers, so that a leaked worker would hang the rest
+            for _ in range(5):
+                succeeded, result, stamps = pool.compile('navbar { }', timeout=10)
+                self.assertFalse(succeeded)
+                self.assertEqual(result['error'], 'RuntimeError')
+            self.assertAllReleased(pool)
+        finally:
+            pool.close()
+            pool.join()
+
+
+class ConfinedIncludeTest(TempDirTestCase):
+    def test_includes_not_allowed(self):
+        self.write_file('items.swalpa', 'divider;')
+
+        with self.assertRaises(IncludeError):
+            Compiler(allow_includes=False).compile_file(self.write_file('page.swalpa',
+                                                                        'navbar { include [items.swalpa]; }'))
+
+    def test_source_file_within_the_root(self):
+        self.write_file('root/pages/items.swalpa', 'divider;')
+        page = self.write_file('root/pages/page.swalpa', 'navbar { include [items.swalpa]; }')
+
+        html = Compiler(include_root=self.path('root')).compile_file(page).getvalue()
+
+        self.assertEqual(html, b'<nav><li class="divider"></li></nav>')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# snapshot tests
+#
+
+import io
+import unittest
+
+from support import DOCUMENT, TempDirTestCase, describe
+from Parser import CompactElementTree, OutputSink
+from Orchestrator import Compiler
+from Orchestrator import Snapshot
+from Orchestrator.Snapshot import SnapshotCache, SnapshotError, dump_snapshot, load_snapshot
+
+
+class SnapshotTest(TempDirTestCase):
+    def setUp(self):
+        super(SnapshotTest, self).setUp()
+
+        self.write_file('items.swalpa', 'menuitem [a.html] { "A" }')
+        self.source = self.write_file('page.swalpa', DOCUMENT.replace('divider;', 'include [items.swalpa];'))
+        self.snapshots = SnapshotCache(self.path('snapshots'))
+
+    def build(self):
+        """
+        @return: the HTML, and the tree it was rendered from (CompactElementTree)
+        """
+        compiler = Compiler(snapshots=self.snapshots)
+        tree = compiler.load_element_tree(self.source)
+        return compiler.render(tree, OutputSink()).getvalue(), tree
+
+    def test_round_trip(self):
+        html, tree = self.build()
+
+        stream = io.BytesIO()
+        dump_snapshot(tree, stream, 'a' * 40, [('/some/include', 'b' * 40)])
+        stream.seek(0)
+        loaded, includes = load_snapshot(stream, 'a' * 40)
+
+        self.assertEqual(includes, [('/some/include', 'b' * 40)])
+        self.assertEqual(describe(loaded.root), describe(tree.root))
+        self.assertEqual(Compiler().render(loaded, OutputSink()).getvalue(), html)
+
+    def test_snapshot_is_used(self):
+        html, tree = self.build()
+
+        self.assertIsNotNone(self.snapshots.get(self.source))
+        self.assertEqual(html, Compiler().compile_file(self.source).getvalue())
+        self.assertEqual(self.build()[0], html)
+
+    def test_changed_source_invalidates(self):
+        self.build()
+
+        self.write_file('page.swalpa', 'navbar { }')
+
+        self.assertIsNone(self.snapshots.get(self.source))
+        self.assertEqual(self.build()[0], b'<nav></nav>')
+
+    def test_changed_include_invalidates(self):
+        self.build()
+
+        self.write_file('items.swalpa', 'menuitem [b.html] { "B" }')
+
+        self.assertIsNone(self.snapshots.get(self.source))
+        self.assertIn(b'<li href="b.html">B</li>', self.build()[0])
+
+    def test_changed_elements_invalidate(self):
+        self.build()
+
+        full_fingerprint = Snapshot.full_fingerprint
+        Snapshot.full_fingerprint = lambda: 'f' * 40
+        try:
+            self.assertIsNone(self.snapshots.get(self.source))
+        finally:
+            Snapshot.full_fingerprint = full_fingerprint
+
+        self.assertIsNotNone(self.snapshots.get(self.source))
+
+    def test_of_another_source(self):
+        stream = io.BytesIO()
+        dump_snapshot(CompactElementTree([]), stream, 'a' * 40)
+        stream.seek(0)
+
+        with self.assertRaises(SnapshotError):
+            load_snapshot(stream, 'b' * 40)
+
+    def test_truncated_snapshot(self):
+        self.build()
+
+        snapshot_path = self.snapshots.get_snapshot_path(self.source)
+        with open(snapshot_path, 'rb') as snapshot:
+            data = snapshot.read()
+        with open(snapshot_path, 'wb') as snapshot:
+            snapshot.write(data[:len(data) // 2])
+
+        self.assertIsNone(self.snapshots.get(self.source))
+
+
+if __name__ == '__main__':
+    unittest.main()
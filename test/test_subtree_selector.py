@@ -0,0 +1,83 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+#
+# SubtreeSelector tests
+#
+
+import unittest
+
+from support import DOCUMENT, compile_html, TempDirTestCase
+from Parser import SubtreeSelector, CompileContext, ComponentRegistry
+from Parser.Renderer import OutputSink
+from Orchestrator import Compiler
+
+
+class SubtreeSelectorTest(unittest.TestCase):
+    def test_select_by_id(self):
+        html = compile_html(DOCUMENT, selector='#home')
+
+        self.assertEqual(html, b'<a id="home" class="active" href="index.html">Home</a>')
+
+    def test_selected_subtree_renders_as_in_the_full_document(self):
+        full = compile_html(DOCUMENT)
+
+        for selector in ('#main', '#home', '#last', 'navbar/menuitem'):
+            html = compile_html(DOCUMENT, selector=selector)
+            self.assertTrue(html and html in full, selector)
+
+    def test_select_by_path(self):
+        html = compile_html(DOCUMENT, selector='navbar/menu')
+
+        self.assertEqual(html.count(b'<ul'), 2)
+        self.assertTrue(html.startswith(b'<ul id="main"'))
+
+    def test_nothing_selected(self):
+        self.assertEqual(compile_html(DOCUMENT, selector='#nothing'), b'')
+        self.assertEqual(compile_html(DOCUMENT, selector='navbar/header/menu'), b'')
+
+    def test_last_id_wins(self):
+        source = 'navbar { menu (#first x #second) { divider; } }'
+
+        self.assertEqual(compile_html(source, selector='#first'), b'')
+        self.assertEqual(compile_html(source, selector='#second'),
+                         b'<ul id="second" class="x"><li class="divider"></li></ul>')
+
+    def test_parentage(self):
+        items = CompileContext('<test>').build_som(DOCUMENT.splitlines(True)).get_contents()
+        ComponentRegistry().expand(items)
+        selected = list(SubtreeSelector('#home').select(items))
+
+        self.assertEqual(len(selected), 1)
+        self.assertEqual([cls.__name__ for cls in selected[0][0]], ['navbar', 'menu'])
+
+
+class SelectToFileTest(TempDirTestCase):
+    def test_all_matches_are_written(self):
+        source = self.write_file('page.swalpa', DOCUMENT)
+
+        for selector in ('navbar/menu', '#nothing', '#home'):
+            Compiler().compile_file(source, OutputSink.open(self.path('out.html')), selector=selector)
+            self.assertEqual(self.read_file('out.html'), compile_html(DOCUMENT, selector=selector), selector)
+
+
+if __name__ == '__main__':
+    unittest.main()
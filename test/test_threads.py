@@ -0,0 +1,114 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+#
+# shared compiler tests
+#
+# several threads compiling on one Compiler at once get what they'd get one at a time
+#
+
+import threading
+import unittest
+
+from support import DOCUMENT, TempDirTestCase
+from Orchestrator import Compiler
+
+
+THREADS = 8
+ROUNDS = 5
+
+
+class SharedCompilerTest(TempDirTestCase):
+    def setUp(self):
+        super(SharedCompilerTest, self).setUp()
+
+        self.write_file('shared/items.swalpa', 'menuitem [a.html] { "A" }\ninclude [more.swalpa];')
+        self.write_file('shared/more.swalpa', 'menuitem [b.html] { "B" }')
+        self.write_file('shared/forms.swalpa', DOCUMENT.split('\n\n')[0])
+
+        self.pages = [self.write_file('page.swalpa', DOCUMENT)]
+        for number in range(6):
+            self.pages.append(self.write_file('page%d.swalpa' % number,
+                                              'include [shared/forms.swalpa];\n'
+                                              'navbar (#nav%d) {\n'
+                                              '    menu { include [shared/items.swalpa]; divider; }\n'
+                                              '    use [search_form] [id: s%d, placeholder: "Find", label: "%d"];\n'
+                                              '}\n'
+                                              'navbar { include [shared/more.swalpa]; }\n' % (number, number, number)))
+
+    def compile_at_once(self, compiler):
+        """
+        @return: {(thread, round, page): HTML} of every thread compiling every page, every round,
+                 all starting together
+        """
+        start = threading.Event()
+        outputs = {}
+        errors = []
+
+        def compile_pages(thread):
+            start.wait()
+            try:
+                for round in range(ROUNDS):
+                    #every thread goes through the pages in an order of its own
+                    for index in range(len(self.pages)):
+                        page = self.pages[(index + thread) % len(self.pages)]
+                        outputs[thread, round, page] = compiler.compile_file(page).getvalue()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=compile_pages, args=(thread,)) for thread in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        return outputs
+
+    def check(self, compiler, serial_compiler):
+        serial = dict((page, serial_compiler.compile_file(page).getvalue()) for page in self.pages)
+        outputs = self.compile_at_once(compiler)
+
+        self.assertEqual(len(outputs), THREADS * ROUNDS * len(self.pages))
+        for (thread, round, page), html in outputs.items():
+            self.assertEqual(html, serial[page], 'thread %d, round %d, %s' % (thread, round, page))
+
+    def test_shared_compiler(self):
+        self.check(Compiler(), Compiler())
+
+    def test_shared_lazy_compiler(self):
+        self.check(Compiler(lazy=True), Compiler(lazy=True))
+
+    def test_shared_includes(self):
+        compiler = Compiler()
+        self.compile_at_once(compiler)
+
+        self.assertEqual(compiler.fragments.get_includes(self.pages[1]),
+                         sorted([self.path('shared', 'forms.swalpa'), self.path('shared', 'items.swalpa'),
+                                 self.path('shared', 'more.swalpa')]))
+        self.assertEqual(compiler.fragments.get_dependents(self.path('shared', 'more.swalpa')),
+                         sorted(self.pages[1:] + [self.path('shared', 'items.swalpa')]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+#
+# tree diff tests
+#
+# the patches are applied to a DOM of the old HTML, the way PATCH_CLIENT_SCRIPT
+# applies them, and what comes out has to be the DOM of the new HTML
+#
+
+import unittest
+from HTMLParser import HTMLParser
+
+from support import DOCUMENT
+from Parser import diff_trees
+from Parser.Renderer import OutputSink
+from Orchestrator import Compiler
+
+
+#elements that have no end tag, and no children
+VOID_TAGS = ('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'wbr')
+
+
+class DomNode(object):
+    """
+    an element, or a text node if tag is None
+    """
+    def __init__(self, tag, attributes=None, text=None):
+        self.tag = tag
+        self.attributes = dict(attributes or {})
+        self.text = text
+        self.child_nodes = []
+
+    def describe(self):
+        if self.tag is None:
+            return self.text
+        return self.tag, sorted(self.attributes.items()), [child.describe() for child in self.child_nodes]
+
+
+class DomBuilder(HTMLParser):
+    """
+    parses HTML into the child nodes of a root DomNode
+    """
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.open_nodes = [DomNode('root')]
+
+    def add_node(self, node):
+        parent = self.open_nodes[-1]
+        if node.tag is None and parent.child_nodes and parent.child_nodes[-1].tag is None:
+            parent.child_nodes[-1].text += node.text
+        else:
+            parent.child_nodes.append(node)
+
+    def handle_starttag(self, tag, attrs):
+        node = DomNode(tag, ((name, value or u'') for name, value in attrs))
+        self.add_node(node)
+        if tag not in VOID_TAGS:
+            self.open_nodes.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self.add_node(DomNode(tag, ((name, value or u'') for name, value in attrs)))
+
+    def handle_endtag(self, tag):
+        if tag not in VOID_TAGS:
+            self.assertEqual(self.open_nodes.pop().tag, tag)
+
+    def assertEqual(self, first, second):
+        if first != second:
+            raise AssertionError("unbalanced HTML: %r closed by %r" % (first, second))
+
+    def handle_data(self, data):
+        self.add_node(DomNode(None, text=data))
+
+    def handle_entityref(self, name):
+        self.add_node(DomNode(None, text=self.unescape('&%s;' % name)))
+
+    def handle_charref(self, name):
+        self.add_node(DomNode(None, text=self.unescape('&#%s;' % name)))
+
+    @classmethod
+    def parse(cls, html):
+        """
+        @return: root DomNode, with the nodes of html as its children
+        """
+        builder = cls()
+        builder.feed(html.decode('utf-8'))
+        builder.close()
+        return builder.open_nodes[0]
+
+
+def apply_patches(root, patches):
+    """
+    python version of PATCH_CLIENT_SCRIPT's applyPatches
+    """
+    for patch in patches:
+        parent = root
+        for index in patch['path'][:-1]:
+            parent = parent.child_nodes[index]
+        index = patch['path'][-1]
+
+        if patch['op'] == 'insert':
+            parent.child_nodes[index:index] = DomBuilder.parse(patch['html'].encode('utf-8')).child_nodes
+        elif patch['op'] == 'remove':
+            del parent.child_nodes[index]
+        elif patch['op'] == 'text':
+            parent.child_nodes[index].text = patch['text']
+        elif patch['op'] == 'attributes':
+            parent.child_nodes[index].attributes.update(patch['set'])
+            for name in patch['remove']:
+                del parent.child_nodes[index].attributes[name]
+        else:
+            raise AssertionError("unknown patch: %r" % patch)
+
+
+class TreeDiffTest(unittest.TestCase):
+    def build(self, source):
+        """
+        @return: the verified ElementTree for source, and its HTML
+        """
+        compiler = Compiler()
+        context = compiler.new_context('<source>')
+        elementTree = compiler.build_element_tree(context, compiler.build_som(context, source.splitlines(True))
+                                                  .get_contents())
+        return elementTree, compiler.render(elementTree, OutputSink(), context).getvalue()
+
+    def assertPatches(self, old_source, new_source):
+        """
+        asserts that the patches from old_source to new_source turn the old HTML into the new
+        @return: the patches
+        """
+        old_tree, old_html = self.build(old_source)
+        new_tree, new_html = self.build(new_source)
+
+        patches = diff_trees(old_tree.root, new_tree.root)
+        dom = DomBuilder.parse(old_html)
+        apply_patches(dom, patches)
+
+        self.assertEqual(dom.describe(), DomBuilder.parse(new_html).describe())
+        return patches
+
+    def test_unchanged(self):
+        self.assertEqual(self.assertPatches(DOCUMENT, DOCUMENT), [])
+
+    def test_text(self):
+        patches = self.assertPatches(DOCUMENT, DOCUMENT.replace('"Home"', '"Start & <end>"'))
+        self.assertEqual([patch['op'] for patch in patches], ['text'])
+
+    def test_adjacent_strings(self):
+        self.assertPatches('navbar { menuitem [a.html] { "a"; "b"; img [x.png] } }',
+                           'navbar { menuitem [a.html] { "a"; ""; "c"; img [x.png] } }')
+
+    def test_attributes(self):
+        self.assertPatches(DOCUMENT, DOCUMENT.replace('(#home active) [index.html]', '(#home) [start.html]')
+                                             .replace('[title: "About us"]', '')
+                                             .replace('(#last)', '(#last active) [title: "Last"]'))
+
+    def test_classes_of_the_element_type(self):
+        self.assertPatches(DOCUMENT, DOCUMENT.replace('"Site";', '"Site"; img (rounded) [images/other.png];')
+                                             .replace('img [images/brand.png]', 'img (wide) [images/brand.png]'))
+
+    def test_component_arguments(self):
+        self.assertPatches(DOCUMENT, DOCUMENT.replace('label: "Go"', 'label: "Find"', 1)
+                                             .replace('placeholder: "Search"', 'placeholder: "Look"'))
+
+    def test_insert_and_remove(self):
+        self.assertPatches(DOCUMENT, DOCUMENT.replace('divider;', 'divider; link [new.html] { "New" } divider;')
+                                             .replace('menuitem [http://some.link.com] { "SomeLink" }', ''))
+
+    def test_reorder_and_retype(self):
+        self.assertPatches(DOCUMENT, DOCUMENT.replace('link (#home active) [index.html] { "Home" }\n        divider;',
+                                                      'divider;\n        menuitem [index.html] { "Home" }'))
+
+    def test_from_and_to_nothing(self):
+        self.assertPatches('navbar { menu { } }', DOCUMENT)
+        self.assertPatches(DOCUMENT, 'navbar { menu { } }')
+
+
+if __name__ == '__main__':
+    unittest.main()
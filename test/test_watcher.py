@@ -0,0 +1,144 @@
+# Copyright (c) 2016 Shreyas Kulkarni (shyran@gmail.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+#
+# watch mode tests - the sources are edited between polls by a script, keyed by the
+# number of the poll, so that no test depends on timing
+#
+
+import os
+import json
+import unittest
+from StringIO import StringIO
+
+from support import TempDirTestCase
+from Orchestrator.Watcher import SourceWatcher, PATCH_SUFFIX
+
+
+class ScriptedWatcher(SourceWatcher):
+    """
+    runs edits[n] just before the nth scan, and keeps the names of the jobs of every compile
+    """
+    def __init__(self, inputs, output_dir, edits, patches=False):
+        super(ScriptedWatcher, self).__init__(inputs, output_dir, interval=0, debounce=0, stream=StringIO(),
+                                              patches=patches)
+        self.edits = edits
+        self.scans = 0
+        self.compiled = []
+
+    def scan(self):
+        self.scans += 1
+        if self.scans in self.edits:
+            self.edits[self.scans]()
+        return super(ScriptedWatcher, self).scan()
+
+    def compile(self, jobs):
+        self.compiled.append(sorted(job.name for job in jobs))
+        return super(ScriptedWatcher, self).compile(jobs)
+
+
+class SourceWatcherTest(TempDirTestCase):
+    def setUp(self):
+        super(SourceWatcherTest, self).setUp()
+
+        self.write_file('src/home.swalpa', 'navbar { menu { link [index.html] { "Home" } } }')
+        self.write_file('src/about.swalpa', 'navbar { include [shared.swalpa]; }')
+        self.write_file('src/shared.swalpa', 'menuitem [about.html] { "About" }')
+        self.edits = 0
+
+    def edit(self, name, content):
+        """
+        @return: an edit writing content to name, with an mtime that's sure to differ
+        """
+        def edit():
+            path = self.write_file(name, content)
+            self.edits += 1
+            stamp = os.stat(path).st_mtime + 10 * self.edits
+            os.utime(path, (stamp, stamp))
+
+        return edit
+
+    def watch(self, edits, cycles, patches=False):
+        watcher = ScriptedWatcher([self.path('src')], self.path('out'), edits, patches)
+        watcher.run(cycles)
+        return watcher
+
+    def test_everything_compiled_at_start(self):
+        watcher = self.watch({}, cycles=2)
+
+        #nothing changed in the polls after
+        self.assertEqual(watcher.compiled, [['about.swalpa', 'home.swalpa', 'shared.swalpa']])
+        self.assertEqual(watcher.scans, 3)
+        self.assertEqual(self.read_file('out/about.html'), b'<nav><li href="about.html">About</li></nav>')
+
+    def test_changed_file_is_compiled(self):
+        watcher = self.watch({2: self.edit('src/home.swalpa', 'navbar { menu { link [index.html] { "Start" } } }')},
+                             cycles=1)
+
+        self.assertEqual(watcher.compiled[1:], [['home.swalpa']])
+        self.assertEqual(self.read_file('out/home.html'), b'<nav><ul><a href="index.html">Start</a></ul></nav>')
+
+    def test_includers_are_compiled(self):
+        watcher = self.watch({2: self.edit('src/shared.swalpa', 'menuitem [about.html] { "About us" }')}, cycles=1)
+
+        self.assertEqual(watcher.compiled[1:], [['about.swalpa', 'shared.swalpa']])
+        self.assertEqual(self.read_file('out/about.html'), b'<nav><li href="about.html">About us</li></nav>')
+
+    def test_burst_is_compiled_once(self):
+        #the second edit comes in while waiting for things to quiet down
+        watcher = self.watch({2: self.edit('src/home.swalpa', 'navbar { }'),
+                              3: self.edit('src/about.swalpa', 'navbar { divider; }')}, cycles=1)
+
+        self.assertEqual(watcher.compiled[1:], [['about.swalpa', 'home.swalpa']])
+        self.assertEqual(watcher.scans, 4)
+        self.assertEqual(self.read_file('out/about.html'), b'<nav><li class="divider"></li></nav>')
+
+    def test_failed_compile_is_reported_and_retried(self):
+        watcher = self.watch({2: self.edit('src/home.swalpa', 'navbar { nonsense; }'),
+                              4: self.edit('src/home.swalpa', 'navbar { }')}, cycles=2)
+
+        self.assertEqual(watcher.compiled[1:], [['home.swalpa'], ['home.swalpa']])
+        self.assertIn('error: %s' % self.path('src', 'home.swalpa'), watcher.stream.getvalue())
+        self.assertEqual(self.read_file('out/home.html'), b'<nav></nav>')
+
+    def test_patches(self):
+        patch_file = self.path('out', 'home.html' + PATCH_SUFFIX)
+
+        watcher = self.watch({2: self.edit('src/home.swalpa', 'navbar { menu { link [index.html] { "Start" } } }')},
+                             cycles=1, patches=True)
+
+        self.assertEqual(len(watcher.compiled), 2)
+        self.assertEqual(json.loads(self.read_file(patch_file).decode('utf-8')),
+                         [{'op': 'text', 'path': [0, 0, 0, 0], 'text': 'Start'}])
+
+    def test_no_patches_from_first_compile(self):
+        patch_file = self.path('out', 'home.html' + PATCH_SUFFIX)
+        self.write_file('out/home.html' + PATCH_SUFFIX, '[]')
+
+        self.watch({}, cycles=0, patches=True)
+
+        #one left from an earlier run would patch the wrong HTML
+        self.assertFalse(os.path.exists(patch_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -21,8 +21,13 @@ from __future__ import print_function
 # SOFTWARE.
 
 
+import os
 import sys
 import inspect
+import unittest
+
+#the Parser package has to come in first - Elements and Parser import each other
+import Parser
 from Elements import *
 
 
@@ -36,3 +41,9 @@ for mod in filter(lambda x: x.startswith('Elements.'), sys.modules):
             ElementsCache[name] = obj
 
 map(lambda x: print(x, ElementsCache[x]()), ElementsCache.keys())
+
+#and the unit tests, from the test directory
+test_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test')
+suite = unittest.defaultTestLoader.discover(test_dir, top_level_dir=test_dir)
+result = unittest.TextTestRunner(verbosity=1).run(suite)
+sys.exit(0 if result.wasSuccessful() else 1)